@@ -0,0 +1,202 @@
+"""
+Pre-aggregated activity counters for the admin growth charts.
+
+Charting signups, job postings, applications or chat volume over time used
+to mean scanning every node's ``created_at`` (stored as an ISO string by
+some writers and as ``datetime()`` by others). Instead each of those writes
+bumps two counters, one for its hour and one for its day, in a small SQLite
+table under ``instance/``:
+
+    stat_buckets(metric, interval, bucket_start, count)
+
+keyed on ``(metric, interval, bucket_start)``, with ``bucket_start`` in epoch
+seconds. A range query is one primary key range scan that reads at most one
+row per interval; intervals with no activity have no row and come back as
+zero. Days start at midnight ``ACTIVITY_STATS_UTC_OFFSET`` hours from UTC
+(Philippine time by default).
+
+Counters are best effort: ``record`` never raises, so a stats failure cannot
+fail the write it counts. ``backfill`` rebuilds every metric from the
+graph and the chat store (``scripts/backfill_activity_stats.py``); run it
+once after deploying and whenever the counters are suspect.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv(
+    'ACTIVITY_STATS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'activity_stats.db')
+)
+UTC_OFFSET = float(os.getenv('ACTIVITY_STATS_UTC_OFFSET', 8))
+# Longest series one request may ask for
+MAX_POINTS = int(os.getenv('ACTIVITY_STATS_MAX_POINTS', 2000))
+
+METRICS = ('signups', 'jobs', 'applications', 'chat_messages')
+INTERVALS = {'hour': 3600, 'day': 24 * 3600}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stat_buckets (
+    metric TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (metric, interval, bucket_start)
+) WITHOUT ROWID;
+"""
+
+# Where backfill finds each metric's timestamps in the graph
+# (analytics_export table -> its created_at column)
+GRAPH_SOURCES = {
+    'signups': 'users',
+    'jobs': 'jobs',
+    'applications': 'applications',
+}
+
+
+def bucket_start(ts: float, interval: str) -> int:
+    """Start, in epoch seconds, of the ``interval`` bucket holding ``ts``."""
+    size = INTERVALS[interval]
+    offset = int(UTC_OFFSET * 3600)
+    return int((ts + offset) // size * size - offset)
+
+
+class ActivityStats:
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, as in chat_store
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode = WAL')
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    conn.commit()
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def record(self, metric: str, ts: float = None, count: int = 1):
+        """Add ``count`` to the hour and day buckets of ``metric`` at ``ts`` (default now)."""
+        ts = time.time() if ts is None else ts
+        conn = self._connection()
+        with conn:
+            conn.executemany("""
+                INSERT INTO stat_buckets (metric, interval, bucket_start, count) VALUES (?, ?, ?, ?)
+                ON CONFLICT (metric, interval, bucket_start) DO UPDATE SET count = count + excluded.count
+            """, [(metric, interval, bucket_start(ts, interval), count) for interval in INTERVALS])
+
+    def series(self, metric: str, start: float, end: float, interval: str = 'day'):
+        """``[(bucket_start, count)]`` for every ``interval`` from the one holding
+        ``start`` up to ``end`` (exclusive), zeros included. Raises ``ValueError``
+        for an unknown metric or interval, or a range over ``MAX_POINTS`` long."""
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric!r}')
+        if interval not in INTERVALS:
+            raise ValueError(f'Unknown interval {interval!r}')
+        size = INTERVALS[interval]
+        first = bucket_start(start, interval)
+        points = max(0, math.ceil((end - first) / size))
+        if points > MAX_POINTS:
+            raise ValueError(f'Range is {points} {interval}s long; the limit is {MAX_POINTS}')
+        rows = self._connection().execute("""
+            SELECT bucket_start, count FROM stat_buckets
+            WHERE metric = ? AND interval = ? AND bucket_start >= ? AND bucket_start < ?
+        """, (metric, interval, first, first + points * size)).fetchall()
+        counts = dict(rows)
+        return [(first + n * size, counts.get(first + n * size, 0)) for n in range(points)]
+
+    def replace(self, metric: str, timestamps) -> int:
+        """Rebuild every bucket of ``metric`` from its event timestamps; returns
+        how many were counted (NaN ones are skipped)."""
+        buckets = {interval: Counter() for interval in INTERVALS}
+        total = 0
+        for ts in timestamps:
+            if ts is None or math.isnan(ts):
+                continue
+            total += 1
+            for interval, counter in buckets.items():
+                counter[bucket_start(ts, interval)] += 1
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM stat_buckets WHERE metric = ?", (metric,))
+            conn.executemany(
+                "INSERT INTO stat_buckets (metric, interval, bucket_start, count) VALUES (?, ?, ?, ?)",
+                [(metric, interval, start, count)
+                 for interval, counter in buckets.items() for start, count in counter.items()])
+        return total
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_activity_stats() -> ActivityStats:
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = ActivityStats()
+    return _stats
+
+
+def record(metric: str, ts: float = None, count: int = 1):
+    """Count one event; never raises."""
+    try:
+        get_activity_stats().record(metric, ts, count)
+    except Exception as e:
+        logger.error(f"Error recording {metric} activity: {str(e)}")
+
+
+def _graph_timestamps(driver, database, table: str):
+    import analytics_export
+
+    with driver.session(database=database) as session:
+        for batch in analytics_export.iter_batches(session, analytics_export.TABLES[table]):
+            yield from batch['created_at'].tolist()
+
+
+def _chat_timestamps():
+    from analytics_export import to_epoch
+    from chat_store import get_chat_store
+
+    for sent_at in get_chat_store().sent_times(role='user'):
+        yield to_epoch(sent_at)
+
+
+def backfill(driver, database, stats: ActivityStats = None, metrics=METRICS) -> dict:
+    """Rebuild the counters from the stored timestamps; returns counts per metric.
+
+    Events written while a metric is being rebuilt may be counted twice or
+    not at all, so run it when the site is quiet.
+    """
+    stats = stats or get_activity_stats()
+    totals = {}
+    for metric in metrics:
+        if metric == 'chat_messages':
+            timestamps = _chat_timestamps()
+        else:
+            timestamps = _graph_timestamps(driver, database, GRAPH_SOURCES[metric])
+        totals[metric] = stats.replace(metric, timestamps)
+        logger.info(f"Backfilled {totals[metric]} {metric}")
+    return totals
+
+
+def isoformat(ts: float) -> str:
+    """A bucket start as ISO 8601 in the stats' UTC offset."""
+    return datetime.fromtimestamp(ts, timezone(timedelta(hours=UTC_OFFSET))).isoformat()
@@ -0,0 +1,248 @@
+"""
+Change events for the admin dashboard, pushed over Server-Sent Events.
+
+Admin pages used to poll: every open tab re-read the whole user table and
+recounted every stat twice a minute. Now the write paths publish small
+change events and ``GET /admin/events`` streams them to open tabs, which
+apply them in place:
+
+- ``user_registered``: a new account (the user row to add)
+- ``document_submitted``: a verification document uploaded or re-uploaded
+- ``verification_decided``: an admin verified or rejected a user
+- ``user_deleted``: an account was removed
+- ``stats``: deltas for the dashboard counters, e.g. ``{"total_users": 1}``
+
+Every event gets an increasing id and the last ``ADMIN_EVENTS_HISTORY``
+are kept, so a reconnecting ``EventSource`` (which sends ``Last-Event-ID``)
+receives what it missed. Ids are ``<boot>-<n>``, where ``boot`` is new on
+every process start (worker recycling included), because the counter and
+history start over then. A client that fell further behind, whose queue
+overflowed, or that holds an id from another boot, gets a ``reset`` event
+and reloads its data once.
+
+The bus lives in process memory, which with ``--workers=1`` is the whole
+app. Each open stream holds one of the four gunicorn threads for up to
+``ADMIN_EVENTS_MAX_AGE`` seconds, and the browser then reconnects on its
+own and resumes from its last id. Streams therefore cost the same threads
+as chat:
+
+- At most ``ADMIN_EVENTS_MAX_STREAMS`` are open (1 by default).
+- Each one also takes a slot of the chat concurrency cap
+  (``rate_limit.chat_limiter``). Chat replies and admin streams together
+  never exceed ``CHAT_MAX_CONCURRENT``, so a thread is always left for page
+  requests.
+
+The trade-off: a second admin tab, or any tab while chat is at its cap,
+gets a 503. Its ``EventSource`` retries a minute later, and until then the
+page shows what it loaded. An open admin tab also leaves chat one slot
+fewer.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+HISTORY = int(os.getenv('ADMIN_EVENTS_HISTORY', 200))
+QUEUE_SIZE = int(os.getenv('ADMIN_EVENTS_QUEUE_SIZE', 100))
+MAX_STREAMS = int(os.getenv('ADMIN_EVENTS_MAX_STREAMS', 1))
+MAX_AGE = float(os.getenv('ADMIN_EVENTS_MAX_AGE', 300))
+HEARTBEAT = float(os.getenv('ADMIN_EVENTS_HEARTBEAT', 15))
+# Reconnect delay suggested to the browser, in milliseconds
+RETRY_MS = 3000
+
+USER_FIELDS = ('id', 'email', 'first_name', 'last_name', 'role', 'verification_status',
+               'resume_path', 'permit_path', 'id_front_path', 'id_back_path', 'created_at')
+ROLE_STATS = {'job_seeker': 'job_seekers', 'business_owner': 'business_owners', 'client': 'clients'}
+PENDING = 'pending_verification'
+
+
+def format_event(event_id, event: str, data) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+
+class EventBus:
+    """Fan-out of change events to SSE subscribers, with a short replay buffer."""
+
+    def __init__(self, history: int = HISTORY, queue_size: int = QUEUE_SIZE, max_streams: int = MAX_STREAMS):
+        self.queue_size = queue_size
+        self.max_streams = max_streams
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._next_id = 1
+        # Tells this process's event ids from those of an earlier one
+        self.boot = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event: str, data: dict) -> int:
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            item = (event_id, event, data)
+            self._history.append(item)
+            self.published += 1
+            for subscription in self._subscribers:
+                if subscription.overflowed:
+                    continue
+                try:
+                    subscription.queue.put_nowait(item)
+                except queue.Full:
+                    # A stalled client: stop feeding it and let it reload
+                    subscription.overflowed = True
+                    self.dropped += 1
+        return event_id
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber, or return None when ``max_streams`` are open.
+
+        ``last_event_id`` is the wire id (``<boot>-<n>``) the client saw last.
+        Events after it still in the history are queued first. If some of
+        them have already been dropped from the history, or the id comes from
+        another boot or is ahead of this bus, the subscription starts with a
+        ``reset``.
+        """
+        boot, _, number = str(last_event_id or '').rpartition('-')
+        with self._lock:
+            if len(self._subscribers) >= self.max_streams:
+                return None
+            subscription = Subscription(self.queue_size)
+            if last_event_id:
+                if boot != self.boot or not number.isdigit() or int(number) >= self._next_id:
+                    subscription.overflowed = True
+                    self._subscribers.add(subscription)
+                    return subscription
+                last = int(number)
+                missed = [item for item in self._history if item[0] > last]
+                oldest = self._history[0][0] if self._history else self._next_id
+                if last < oldest - 1 or len(missed) > self.queue_size:
+                    subscription.overflowed = True
+                else:
+                    for item in missed:
+                        subscription.queue.put_nowait(item)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stream(self, subscription, heartbeat: float = HEARTBEAT, max_age: float = MAX_AGE):
+        """SSE text for ``subscription`` until ``max_age`` runs out; unsubscribes when done."""
+        deadline = time.monotonic() + max_age
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                if subscription.overflowed and subscription.queue.empty():
+                    yield format_event(self.event_id(self.last_id()), 'reset', {})
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event_id, event, data = subscription.queue.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(self.event_id(event_id), event, data)
+        finally:
+            self.unsubscribe(subscription)
+
+    def event_id(self, number: int) -> str:
+        """The wire id for event ``number`` of this boot."""
+        return f"{self.boot}-{number}"
+
+    def last_id(self) -> int:
+        with self._lock:
+            return self._next_id - 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'streams': len(self._subscribers),
+                'last_id': self._next_id - 1,
+                'published': self.published,
+                'dropped': self.dropped,
+            }
+
+
+bus = EventBus()
+
+
+def publish(event: str, data: dict):
+    """Publish an admin event. Never raises: a failed push must not fail the write."""
+    try:
+        return bus.publish(event, data)
+    except Exception as e:
+        logger.error(f"Error publishing admin event {event}: {str(e)}")
+        return None
+
+
+def user_payload(user) -> dict:
+    """The user fields the admin tables show, from a ``User`` or a node dict."""
+    get = user.get if isinstance(user, dict) else lambda key: getattr(user, key, None)
+    return {field: get(field) for field in USER_FIELDS}
+
+
+def user_stats_delta(role, status, sign: int = 1) -> dict:
+    """Counter changes for adding (``sign=1``) or removing (``-1``) a user."""
+    delta = {'total_users': sign}
+    if role in ROLE_STATS:
+        delta[ROLE_STATS[role]] = sign
+    if status == PENDING:
+        delta['pending_verifications'] = sign
+    return delta
+
+
+def publish_stats(delta: dict):
+    delta = {key: value for key, value in delta.items() if value}
+    if delta:
+        publish('stats', delta)
+
+
+def user_registered(user):
+    payload = user_payload(user)
+    publish('user_registered', {'user': payload})
+    publish_stats(user_stats_delta(payload['role'], payload['verification_status']))
+    if payload['resume_path'] or payload['permit_path'] or payload['id_front_path']:
+        publish('document_submitted', {'user': payload})
+
+
+def document_submitted(user, previous_status=None):
+    """A document was uploaded or re-uploaded for ``user``."""
+    payload = user_payload(user)
+    publish('document_submitted', {'user': payload})
+    if payload['verification_status'] == PENDING and previous_status != PENDING:
+        publish_stats({'pending_verifications': 1})
+
+
+def verification_decided(user, status: str, previous_status=None, decided_by=None):
+    payload = dict(user_payload(user), verification_status=status)
+    publish('verification_decided', {'user': payload, 'status': status, 'decided_by': decided_by})
+    if previous_status != status:
+        publish_stats({
+            'pending_verifications': (status == PENDING) - (previous_status == PENDING),
+        })
+
+
+def user_deleted(user):
+    payload = user_payload(user)
+    publish('user_deleted', {'user': payload})
+    publish_stats(user_stats_delta(payload['role'], payload['verification_status'], sign=-1))
@@ -9,6 +9,10 @@ import uuid
 import logging
 
 from database import driver, DATABASE, get_neo4j_driver
+from geo.listings import listing_removed
+import admin_events
+import admin_sync
+import admin_users
 
 # Ensure we have a driver
 if driver is None:
@@ -208,15 +212,19 @@ def verify_user(user_id):
         new_status = 'verified' if action == 'verify' else 'rejected'
         
         with driver.session(database=DATABASE) as session:
-            result = session.run("""
+            record = session.run("""
                 MATCH (u:User {id: $user_id})
-                SET u.verification_status = $status
-                RETURN u
-            """, user_id=user_id, status=new_status)
+                WITH u, u.verification_status AS previous
+                SET u.verification_status = $status,
+                    u.updated_at = timestamp()
+                RETURN u, previous
+            """, user_id=user_id, status=new_status).single()
             
-            if not result.single():
+            if not record:
                 flash('User not found.', 'danger')
                 return redirect(url_for('admin.verify_users_list'))
+            admin_events.verification_decided(dict(record['u']), new_status, record['previous'],
+                                              decided_by=current_user.email)
 
             # Log the activity
             Activity(
@@ -236,11 +244,77 @@ def verify_user(user_id):
         flash("Error processing verification.", "danger")
         return redirect(url_for('admin.verify_users_list'))
 
+# Query parameters that select the paginated /users/list response
+PAGE_ARGS = ('page_size', 'cursor', 'sort', 'order', 'role', 'status', 'q')
+
+def _user_row(user_data, businesses):
+    """JSON row of the admin users table."""
+    # Create User object to ensure proper name formatting
+    user = User(
+        id=user_data.get('id'),
+        email=user_data.get('email'),
+        first_name=user_data.get('first_name'),
+        last_name=user_data.get('last_name'),
+        middle_name=user_data.get('middle_name'),
+        suffix=user_data.get('suffix'),
+        role=user_data.get('role'),
+        phone=user_data.get('phone'),
+        address=user_data.get('address'),
+        verification_status=user_data.get('verification_status'),
+        resume_path=user_data.get('resume_path'),
+        permit_path=user_data.get('permit_path')
+    )
+
+    user_dict = user.to_dict()
+    user_dict['businesses'] = businesses
+    return user_dict
+
 @admin.route('/users/list')
 @login_required
 @admin_required
 def users_list():
-    """API endpoint for getting user list."""
+    """API endpoint for getting user list.
+
+    With ``?since=<token>`` only the users changed since that sync are
+    returned, with the ids deleted since then (see ``admin_sync``).
+    With any of ``page_size``, ``cursor``, ``sort``, ``order``, ``role``,
+    ``status`` or ``q``, one filtered page is returned with the cursor of
+    the next (see ``admin_users``).
+    """
+    try:
+        since = admin_sync.parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({"error": "Invalid since token"}), 400
+
+    if since is None and any(name in request.args for name in PAGE_ARGS):
+        try:
+            with driver.session(database=DATABASE) as session:
+                rows, next_cursor = admin_users.list_users(
+                    session,
+                    role=request.args.get('role'),
+                    status=request.args.get('status'),
+                    q=request.args.get('q'),
+                    sort=request.args.get('sort', admin_users.DEFAULT_SORT),
+                    descending=request.args.get('order') == 'desc',
+                    cursor=request.args.get('cursor'),
+                    page_size=request.args.get('page_size', admin_users.PAGE_SIZE, type=int),
+                )
+                owned = session.run("""
+                    MATCH (u:User)-[:OWNS]->(b:Business)
+                    WHERE u.id IN $ids
+                    RETURN u.id AS id, collect(b.name) AS businesses
+                """, ids=[row.get('id') for row in rows])
+                businesses = {record["id"]: record["businesses"] for record in owned}
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching users page: {str(e)}")
+            return jsonify({"error": f"Error fetching users: {str(e)}"}), 500
+        return jsonify({
+            "users": [_user_row(row, businesses.get(row.get('id'), [])) for row in rows],
+            "next_cursor": next_cursor
+        })
+
     try:
         # Test Neo4j connection first
         try:
@@ -250,40 +324,32 @@ def users_list():
             return jsonify({"error": "Database connection error"}), 500
 
         with driver.session(database=DATABASE) as session:
-            result = session.run("""
+            if since is None:
+                result = session.run("""
+                    MATCH (u:User)
+                    OPTIONAL MATCH (u)-[:OWNS]->(b:Business)
+                    WITH u, collect(b.name) as businesses
+                    RETURN u, businesses
+                    ORDER BY u.role, u.last_name
+                """)
+                return jsonify([_user_row(dict(record["u"]), record["businesses"]) for record in result])
+
+            now = admin_sync.database_now(session)
+            after, full = admin_sync.window(since, now)
+            # A separate WHERE so the planner can seek the user_updated_at index
+            changed = "" if full else "WHERE u.updated_at > $after"
+            result = session.run(f"""
                 MATCH (u:User)
+                {changed}
                 OPTIONAL MATCH (u)-[:OWNS]->(b:Business)
                 WITH u, collect(b.name) as businesses
                 RETURN u, businesses
                 ORDER BY u.role, u.last_name
-            """)
-            
-            users = []
-            for record in result:
-                user_data = dict(record["u"])
-                businesses = record["businesses"]
-                
-                # Create User object to ensure proper name formatting
-                user = User(
-                    id=user_data.get('id'),
-                    email=user_data.get('email'),
-                    first_name=user_data.get('first_name'),
-                    last_name=user_data.get('last_name'),
-                    middle_name=user_data.get('middle_name'),
-                    suffix=user_data.get('suffix'),
-                    role=user_data.get('role'),
-                    phone=user_data.get('phone'),
-                    address=user_data.get('address'),
-                    verification_status=user_data.get('verification_status'),
-                    resume_path=user_data.get('resume_path'),
-                    permit_path=user_data.get('permit_path')
-                )
-                
-                user_dict = user.to_dict()
-                user_dict['businesses'] = businesses
-                users.append(user_dict)
-            
-            return jsonify(users)
+            """, after=after)
+            users = [_user_row(dict(record["u"]), record["businesses"]) for record in result]
+            deleted = [] if full else admin_sync.deleted_since(session, 'User', after)
+
+            return jsonify({"users": users, "deleted": deleted, "full": full, "token": str(now)})
             
     except Exception as e:
         logger.error(f"Error fetching users: {str(e)}")
@@ -302,7 +368,7 @@ def delete_user(user_id):
             # First check if user exists
             result = session.run("""
                 MATCH (u:User {id: $user_id})
-                RETURN u.role as role
+                RETURN u.role as role, u
             """, {"user_id": user_id})
             
             user = result.single()
@@ -324,6 +390,8 @@ def delete_user(user_id):
                 MATCH (u:User {id: $user_id})
                 DELETE u
             """, {"user_id": user_id})
+            admin_sync.record_tombstone(session, 'User', user_id)
+            admin_events.user_deleted(dict(user["u"]))
             
             # Log the activity
             activity = Activity(
@@ -342,59 +410,97 @@ def delete_user(user_id):
         logger.error(f"Error deleting user: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def _user_documents(user_data):
+    """Rows of the pending documents table for one user (resume and/or permit)."""
+    user = User(
+        id=user_data.get('id'),
+        email=user_data.get('email'),
+        first_name=user_data.get('first_name'),
+        last_name=user_data.get('last_name'),
+        middle_name=user_data.get('middle_name'),
+        suffix=user_data.get('suffix'),
+        role=user_data.get('role'),
+        resume_path=user_data.get('resume_path'),
+        permit_path=user_data.get('permit_path'),
+        verification_status=user_data.get('verification_status')
+    )
+    user_dict = user.to_dict()
+
+    documents = []
+    if user.resume_path:
+        documents.append({
+            "id": f"{user.id}_resume",
+            "user_id": user.id,
+            "user_name": user_dict['name'],
+            "type": "Resume",
+            "path": user.resume_path,
+            "submitted_date": user_data.get('resume_submitted_date', datetime.now().isoformat())
+        })
+
+    if user.permit_path:
+        documents.append({
+            "id": f"{user.id}_permit",
+            "user_id": user.id,
+            "user_name": user_dict['name'],
+            "type": "Business Permit",
+            "path": user.permit_path,
+            "submitted_date": user_data.get('permit_submitted_date', datetime.now().isoformat())
+        })
+    return documents
+
 @admin.route('/documents/pending')
 @login_required
 @admin_required
 def get_pending_documents():
-    """Get all pending documents (resumes and permits)."""
+    """Get all pending documents (resumes and permits).
+
+    With ``?since=<token>``, returns the documents of users changed since that
+    sync and, under ``removed``, the ids of documents that left the queue
+    (decided, or their user deleted).
+    """
+    try:
+        since = admin_sync.parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({"error": "Invalid since token"}), 400
+
     try:
         with driver.session(database=DATABASE) as session:
-            result = session.run("""
+            if since is None:
+                result = session.run("""
+                    MATCH (u:User)
+                    WHERE (u.resume_path IS NOT NULL OR u.permit_path IS NOT NULL)
+                      AND u.verification_status = 'pending'
+                    RETURN u
+                    ORDER BY u.role, u.last_name
+                """)
+                documents = []
+                for record in result:
+                    documents.extend(_user_documents(dict(record["u"])))
+                return jsonify(documents)
+
+            now = admin_sync.database_now(session)
+            after, full = admin_sync.window(since, now)
+            changed = "u.verification_status = 'pending'" if full else "u.updated_at > $after"
+            result = session.run(f"""
                 MATCH (u:User)
-                WHERE (u.resume_path IS NOT NULL OR u.permit_path IS NOT NULL)
-                  AND u.verification_status = 'pending'
+                WHERE {changed}
+                  AND (u.resume_path IS NOT NULL OR u.permit_path IS NOT NULL)
                 RETURN u
                 ORDER BY u.role, u.last_name
-            """)
-            
-            documents = []
+            """, after=after)
+
+            documents, removed = [], []
             for record in result:
                 user_data = dict(record["u"])
-                user = User(
-                    id=user_data.get('id'),
-                    email=user_data.get('email'),
-                    first_name=user_data.get('first_name'),
-                    last_name=user_data.get('last_name'),
-                    middle_name=user_data.get('middle_name'),
-                    suffix=user_data.get('suffix'),
-                    role=user_data.get('role'),
-                    resume_path=user_data.get('resume_path'),
-                    permit_path=user_data.get('permit_path'),
-                    verification_status=user_data.get('verification_status')
-                )
-                user_dict = user.to_dict()
-                
-                if user.resume_path:
-                    documents.append({
-                        "id": f"{user.id}_resume",
-                        "user_id": user.id,
-                        "user_name": user_dict['name'],
-                        "type": "Resume",
-                        "path": user.resume_path,
-                        "submitted_date": user_data.get('resume_submitted_date', datetime.now().isoformat())
-                    })
-                    
-                if user.permit_path:
-                    documents.append({
-                        "id": f"{user.id}_permit",
-                        "user_id": user.id,
-                        "user_name": user_dict['name'],
-                        "type": "Business Permit",
-                        "path": user.permit_path,
-                        "submitted_date": user_data.get('permit_submitted_date', datetime.now().isoformat())
-                    })
-            
-            return jsonify(documents)
+                if user_data.get('verification_status') == 'pending':
+                    documents.extend(_user_documents(user_data))
+                else:
+                    removed.extend(doc["id"] for doc in _user_documents(user_data))
+            if not full:
+                for user_id in admin_sync.deleted_since(session, 'User', after):
+                    removed.extend([f"{user_id}_resume", f"{user_id}_permit"])
+
+            return jsonify({"documents": documents, "removed": removed, "full": full, "token": str(now)})
             
     except Exception as e:
         logger.error(f"Error fetching pending documents: {str(e)}")
@@ -442,11 +548,16 @@ def approve_document(doc_id):
         
         with driver.session(database=DATABASE) as session:
             # Update user's verification status
-            session.run("""
+            record = session.run("""
                 MATCH (u:User {id: $user_id})
-                SET u.verification_status = 'verified'
-                RETURN u
-            """, {"user_id": user_id})
+                WITH u, u.verification_status AS previous
+                SET u.verification_status = 'verified',
+                    u.updated_at = timestamp()
+                RETURN u, previous
+            """, {"user_id": user_id}).single()
+            if record:
+                admin_events.verification_decided(dict(record["u"]), 'verified', record["previous"],
+                                                  decided_by=current_user.email)
             
             # Log the activity
             activity = Activity(
@@ -482,12 +593,17 @@ def reject_document(doc_id):
         
         with driver.session(database=DATABASE) as session:
             # Update user's verification status
-            session.run("""
+            record = session.run("""
                 MATCH (u:User {id: $user_id})
-                SET u.verification_status = 'rejected'
-                SET u.rejection_reason = $reason
-                RETURN u
-            """, {"user_id": user_id, "reason": data['reason']})
+                WITH u, u.verification_status AS previous
+                SET u.verification_status = 'rejected',
+                    u.rejection_reason = $reason,
+                    u.updated_at = timestamp()
+                RETURN u, previous
+            """, {"user_id": user_id, "reason": data['reason']}).single()
+            if record:
+                admin_events.verification_decided(dict(record["u"]), 'rejected', record["previous"],
+                                                  decided_by=current_user.email)
             
             # Log the activity
             activity = Activity(
@@ -527,7 +643,8 @@ def manage_users():
                 if action == 'deactivate':
                     session.run("""
                         MATCH (u:User {id: $user_id})
-                        SET u.is_active = false
+                        SET u.is_active = false,
+                            u.updated_at = timestamp()
                         RETURN u
                     """, {'user_id': user_id})
                     
@@ -543,10 +660,15 @@ def manage_users():
                     return jsonify({'success': True, 'message': 'User deactivated'})
                     
                 elif action == 'delete':
-                    session.run("""
+                    record = session.run("""
                         MATCH (u:User {id: $user_id})
+                        WITH u, properties(u) AS props
                         DETACH DELETE u
-                    """, {'user_id': user_id})
+                        RETURN props
+                    """, {'user_id': user_id}).single()
+                    if record:
+                        admin_sync.record_tombstone(session, 'User', user_id)
+                        admin_events.user_deleted(record['props'])
                     
                     # Log activity
                     Activity(
@@ -654,6 +776,7 @@ def manage_content():
                         """, {'content_id': content_id})
                     else:
                         return jsonify({'error': 'Invalid content type'}), 400
+                    listing_removed(content_type, content_id)
                         
                     # Log activity
                     Activity(
@@ -0,0 +1,151 @@
+"""
+Paginated, sortable and filterable user listing for the admin pages.
+
+The admin user views used to load every user sorted on ``toLower(u.email)``.
+That key is computed per row, so no index can serve it, and the search was
+``toLower(...) CONTAINS`` over every node. Users now carry stored,
+normalized sort keys, written by ``User.save`` and registration:
+
+- ``email_key``: the trimmed, lowercased email
+- ``name_key``: "last first", lowercased, accents stripped and whitespace
+  collapsed (so "Peña" sorts and matches as "pena")
+
+Pages are ordered by ``(<sort key>, id)`` and continued with an opaque
+cursor holding the last pair, the same scheme as ``geo.nearby_jobs``. A
+page then costs an index seek plus ``page_size`` rows, however deep it is.
+Role and status filters use the composite ``user_role_status`` index. The
+search matches the start of the stored email or name keys (``STARTS WITH``
+can use their range indexes), or their text-indexed contents for longer
+terms.
+
+``backfill_sort_keys`` fills the keys on existing users; ``init_neo4j``
+runs it after creating the indexes.
+"""
+
+import base64
+import json
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Search terms at least this long also match inside emails and names
+CONTAINS_MIN_CHARS = 3
+BACKFILL_BATCH = 1000
+
+# Sort option -> stored property
+SORT_KEYS = {
+    'email': 'email_key',
+    'name': 'name_key',
+}
+DEFAULT_SORT = 'email'
+
+
+def normalize(text) -> str:
+    """Lowercase, strip accents and collapse whitespace."""
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', stripped).strip().lower()
+
+
+def sort_keys(email=None, first_name=None, last_name=None) -> dict:
+    """The stored sort and search keys for a user."""
+    return {
+        'email_key': normalize(email),
+        'name_key': normalize(f"{last_name or ''} {first_name or ''}"),
+    }
+
+
+def encode_cursor(sort: str, key: str, user_id: str) -> str:
+    raw = json.dumps([sort, key, user_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str):
+    """Return ``(key, id)`` from a cursor. Raises ``ValueError`` if it is malformed
+    or was made for another sort."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, key, user_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort:
+        raise ValueError('Cursor does not match the sort order')
+    return str(key), str(user_id)
+
+
+def list_users(session, role=None, status=None, q=None, sort=DEFAULT_SORT, descending=False,
+               cursor=None, page_size=PAGE_SIZE):
+    """Return ``(users, next_cursor)`` for one page of users as node dicts.
+
+    ``next_cursor`` is ``None`` on the last page. Raises ``ValueError`` for
+    an unknown sort or a bad cursor.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f'Unknown sort {sort!r}')
+    key = SORT_KEYS[sort]
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    conditions = []
+    params = {'limit': page_size + 1}
+    if role:
+        conditions.append("u.role = $role")
+        params['role'] = role
+    if status:
+        conditions.append("u.verification_status = $status")
+        params['status'] = status
+    term = normalize(q)
+    if term:
+        params['q'] = term
+        if len(term) >= CONTAINS_MIN_CHARS:
+            conditions.append("(u.email_key CONTAINS $q OR u.name_key CONTAINS $q)")
+        else:
+            conditions.append("(u.email_key STARTS WITH $q OR u.name_key STARTS WITH $q)")
+    if cursor:
+        params['after_key'], params['after_id'] = decode_cursor(cursor, sort)
+        op = '<' if descending else '>'
+        conditions.append(f"(u.{key} {op} $after_key OR (u.{key} = $after_key AND u.id {op} $after_id))")
+    else:
+        # Keeps the order on an indexed property and skips un-backfilled nodes
+        conditions.append(f"u.{key} IS NOT NULL")
+
+    direction = 'DESC' if descending else 'ASC'
+    result = session.run(f"""
+        MATCH (u:User)
+        WHERE {' AND '.join(conditions)}
+        RETURN u
+        ORDER BY u.{key} {direction}, u.id {direction}
+        LIMIT $limit
+    """, **params)
+    rows = [dict(record['u']) for record in result]
+
+    page = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = page[-1]
+        next_cursor = encode_cursor(sort, last.get(key) or '', last.get('id'))
+    return page, next_cursor
+
+
+def backfill_sort_keys(session, batch_size: int = BACKFILL_BATCH) -> int:
+    """Set the sort keys on users that lack them. Returns how many were updated."""
+    updated = 0
+    while True:
+        rows = session.run("""
+            MATCH (u:User)
+            WHERE u.id IS NOT NULL AND (u.email_key IS NULL OR u.name_key IS NULL)
+            RETURN u.id AS id, u.email AS email, u.first_name AS first_name, u.last_name AS last_name
+            LIMIT $limit
+        """, limit=batch_size).data()
+        if not rows:
+            return updated
+        session.run("""
+            UNWIND $rows AS row
+            MATCH (u:User {id: row.id})
+            SET u.email_key = row.email_key, u.name_key = row.name_key
+        """, rows=[dict(sort_keys(r['email'], r['first_name'], r['last_name']), id=r['id']) for r in rows])
+        updated += len(rows)
+        logger.info(f"Backfilled sort keys on {updated} users")
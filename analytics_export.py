@@ -0,0 +1,386 @@
+"""
+Columnar analytics export for the admin reports.
+
+Richer reports (jobs per municipality, the application funnel, signups per
+week) would need heavy Cypher on the production database every time the
+page is opened. Instead, ``export_all`` streams Users, Businesses, Jobs,
+Applications, Reviews and ServiceRequests out of Neo4j in keyset batches
+(``WHERE n.id > $after ORDER BY n.id LIMIT n``, served by the id
+constraints). Some older writers created Businesses and ServiceRequests
+without an ``id``; ``backfill_ids`` gives those one first, so no row is
+left out. It writes one columnar file per table under
+``instance/analytics/`` and a ``manifest.json`` with the row counts and
+export time:
+
+- Parquet, one row group per batch, when ``pyarrow`` is installed
+- otherwise compressed NumPy ``.npz``, one array per column
+
+Timestamps are exported as float epoch seconds, whatever their stored form
+(ISO string, ``datetime()``, epoch ms); unknown ones become NaN. Files are
+written next to their target and renamed into place, so readers never see
+a half-written export.
+
+``report`` computes the reports page aggregates from the files with
+vectorized NumPy operations and caches them until the next export. Run
+``scripts/export_analytics.py`` from cron. The reports page also starts a
+background export when the files are older than ``ANALYTICS_MAX_AGE``.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv(
+    'ANALYTICS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'analytics')
+)
+# 'auto' writes Parquet when pyarrow is installed, else npz
+EXPORT_FORMAT = os.getenv('ANALYTICS_FORMAT', 'auto')
+BATCH_SIZE = int(os.getenv('ANALYTICS_BATCH_SIZE', 5000))
+# Seconds before the reports page refreshes the export in the background
+MAX_AGE = float(os.getenv('ANALYTICS_MAX_AGE', 24 * 3600))
+MANIFEST = 'manifest.json'
+
+STR, NUM, TIME = 'str', 'num', 'time'
+
+Table = namedtuple('Table', 'label query columns')
+
+# Each query returns one batch of rows after id $after, in id order
+TABLES = {
+    'users': Table('User', """
+        MATCH (n:User) WHERE n.id > $after
+        WITH n ORDER BY n.id LIMIT $limit
+        RETURN n.id AS id, n.role AS role, n.verification_status AS verification_status,
+               n.municipality_id AS municipality_id, n.created_at AS created_at
+    """, {'id': STR, 'role': STR, 'verification_status': STR, 'municipality_id': STR, 'created_at': TIME}),
+    'businesses': Table('Business', """
+        MATCH (n:Business) WHERE n.id > $after
+        WITH n ORDER BY n.id LIMIT $limit
+        OPTIONAL MATCH (owner:User)-[:OWNS]->(n)
+        RETURN n.id AS id, n.category AS category, n.municipality_id AS municipality_id,
+               head(collect(owner.id)) AS owner_id, n.created_at AS created_at
+    """, {'id': STR, 'category': STR, 'municipality_id': STR, 'owner_id': STR, 'created_at': TIME}),
+    'jobs': Table('Job', """
+        MATCH (n:Job) WHERE n.id > $after
+        WITH n ORDER BY n.id LIMIT $limit
+        OPTIONAL MATCH (b:Business)-[:POSTED]->(n)
+        RETURN n.id AS id, n.status AS status, n.job_type AS job_type, n.category AS category,
+               n.municipality_id AS municipality_id, head(collect(b.id)) AS business_id,
+               n.created_at AS created_at
+    """, {'id': STR, 'status': STR, 'job_type': STR, 'category': STR, 'municipality_id': STR,
+          'business_id': STR, 'created_at': TIME}),
+    'applications': Table('Application', """
+        MATCH (n:Application) WHERE n.id > $after
+        WITH n ORDER BY n.id LIMIT $limit
+        OPTIONAL MATCH (a:User)-[:APPLIED_TO]->(n)
+        OPTIONAL MATCH (n)-[:FOR_JOB]->(j:Job)
+        RETURN n.id AS id, n.status AS status, head(collect(a.id)) AS applicant_id,
+               head(collect(j.id)) AS job_id, n.date_applied AS created_at
+    """, {'id': STR, 'status': STR, 'applicant_id': STR, 'job_id': STR, 'created_at': TIME}),
+    'reviews': Table('Review', """
+        MATCH (n:Review) WHERE n.id > $after
+        WITH n ORDER BY n.id LIMIT $limit
+        OPTIONAL MATCH (n)-[:FOR]->(b:Business)
+        RETURN n.id AS id, n.rating AS rating, head(collect(b.id)) AS business_id,
+               n.created_at AS created_at
+    """, {'id': STR, 'rating': NUM, 'business_id': STR, 'created_at': TIME}),
+    'service_requests': Table('ServiceRequest', """
+        MATCH (n:ServiceRequest) WHERE n.id > $after
+        WITH n ORDER BY n.id LIMIT $limit
+        RETURN n.id AS id, n.status AS status, n.category AS category,
+               n.municipality_id AS municipality_id, n.created_at AS created_at
+    """, {'id': STR, 'status': STR, 'category': STR, 'municipality_id': STR, 'created_at': TIME}),
+}
+
+# Application statuses in funnel order; anything else is reported after them
+FUNNEL = ('pending', 'reviewed', 'shortlisted', 'accepted', 'hired', 'rejected')
+WEEK = 7 * 24 * 3600
+SIGNUP_WEEKS = 12
+TOP_MUNICIPALITIES = 10
+
+
+def to_epoch(value) -> float:
+    """Epoch seconds for a stored timestamp of any of the forms in the graph; NaN if unknown."""
+    if value is None:
+        return math.nan
+    if hasattr(value, 'to_native'):
+        value = value.to_native()
+    if isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        # timestamp() is milliseconds
+        return float(value) / 1000.0 if value > 1e11 else float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        except ValueError:
+            return math.nan
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp()
+    return math.nan
+
+
+def _column(kind: str, values) -> np.ndarray:
+    if kind == TIME:
+        return np.array([to_epoch(v) for v in values], dtype=np.float64)
+    if kind == NUM:
+        out = []
+        for v in values:
+            try:
+                out.append(float(v))
+            except (TypeError, ValueError):
+                out.append(math.nan)
+        return np.array(out, dtype=np.float64)
+    return np.array(['' if v is None else str(v) for v in values], dtype=np.str_)
+
+
+def _pyarrow():
+    """``(pyarrow, pyarrow.parquet)`` or ``None`` when not installed."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow, pyarrow.parquet
+    except ImportError:
+        return None
+
+
+def export_format(requested: str = EXPORT_FORMAT) -> str:
+    if requested == 'auto':
+        return 'parquet' if _pyarrow() else 'npz'
+    if requested == 'parquet' and not _pyarrow():
+        raise ValueError('ANALYTICS_FORMAT=parquet needs pyarrow installed')
+    return requested
+
+
+def iter_batches(session, table: Table, batch_size: int = BATCH_SIZE):
+    """Yield one table as dicts of column arrays, ``batch_size`` rows at a time."""
+    after = ''
+    while True:
+        rows = session.run(table.query, after=after, limit=batch_size).data()
+        if not rows:
+            return
+        yield {name: _column(kind, [row.get(name) for row in rows]) for name, kind in table.columns.items()}
+        if len(rows) < batch_size:
+            return
+        after = rows[-1]['id']
+
+
+def export_table(session, name: str, directory: str, fmt: str, batch_size: int = BATCH_SIZE) -> int:
+    """Stream one table to ``<directory>/<name>.<fmt>``; returns the row count."""
+    table = TABLES[name]
+    path = os.path.join(directory, f'{name}.{fmt}')
+    tmp_path = path + '.tmp'
+    rows = 0
+    if fmt == 'parquet':
+        pa, pq = _pyarrow()
+        schema = pa.schema([(col, pa.string() if kind == STR else pa.float64())
+                            for col, kind in table.columns.items()])
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for batch in iter_batches(session, table, batch_size):
+                writer.write_table(pa.table(batch, schema=schema))
+                rows += len(batch['id'])
+            if not rows:
+                writer.write_table(schema.empty_table())
+    else:
+        chunks = {col: [] for col in table.columns}
+        for batch in iter_batches(session, table, batch_size):
+            for col, values in batch.items():
+                chunks[col].append(values)
+            rows += len(batch['id'])
+        columns = {col: np.concatenate(parts) if parts else _column(table.columns[col], [])
+                   for col, parts in chunks.items()}
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **columns)
+    os.replace(tmp_path, path)
+    return rows
+
+
+def backfill_ids(session, label: str, batch_size: int = BATCH_SIZE) -> int:
+    """Give every ``label`` node without an ``id`` a random one; returns how many.
+
+    The export pages on the indexed ``id``, so nodes without one would be
+    skipped.
+    """
+    assigned = 0
+    while True:
+        updated = session.run(f"""
+            MATCH (n:{label}) WHERE n.id IS NULL
+            WITH n LIMIT $limit
+            SET n.id = randomUUID()
+            RETURN count(n) AS updated
+        """, limit=batch_size).single()['updated']
+        assigned += updated
+        if updated < batch_size:
+            if assigned:
+                logger.info(f"Assigned ids to {assigned} {label} nodes")
+            return assigned
+
+
+def export_all(driver, database, directory: str = EXPORT_DIR, fmt: str = EXPORT_FORMAT,
+               batch_size: int = BATCH_SIZE) -> dict:
+    """Export every table and write the manifest. Returns the manifest."""
+    fmt = export_format(fmt)
+    os.makedirs(directory, exist_ok=True)
+    start = time.time()
+    counts = {}
+    with driver.session(database=database) as session:
+        for name, table in TABLES.items():
+            backfill_ids(session, table.label, batch_size)
+            counts[name] = export_table(session, name, directory, fmt, batch_size)
+            logger.info(f"Exported {counts[name]} {name} to {directory}")
+    manifest = {
+        'format': fmt,
+        'exported_at': time.time(),
+        'seconds': round(time.time() - start, 2),
+        'rows': counts,
+    }
+    tmp_path = os.path.join(directory, MANIFEST + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def read_manifest(directory: str = EXPORT_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_table(name: str, directory: str = EXPORT_DIR, fmt: str = None) -> dict:
+    """The exported columns of ``name`` as ``{column: ndarray}``."""
+    fmt = fmt or (read_manifest(directory) or {}).get('format', 'npz')
+    path = os.path.join(directory, f'{name}.{fmt}')
+    if fmt == 'parquet':
+        _, pq = _pyarrow()
+        table = pq.read_table(path)
+        return {col: np.asarray(table.column(col).to_numpy(zero_copy_only=False),
+                                dtype=np.float64 if kind != STR else np.str_)
+                for col, kind in TABLES[name].columns.items()}
+    with np.load(path) as data:
+        return {col: data[col] for col in data.files}
+
+
+# ---------------------------------------------------------------------------
+# Aggregates
+# ---------------------------------------------------------------------------
+
+def value_counts(values: np.ndarray, order=None) -> list:
+    """``[(value, count)]``, most common first or in ``order`` (others after)."""
+    if not len(values):
+        return []
+    labels, counts = np.unique(values, return_counts=True)
+    pairs = [(str(label) or 'unknown', int(count)) for label, count in zip(labels, counts)]
+    if order is None:
+        return sorted(pairs, key=lambda pair: (-pair[1], pair[0]))
+    rank = {value: i for i, value in enumerate(order)}
+    return sorted(pairs, key=lambda pair: (rank.get(pair[0], len(rank)), -pair[1]))
+
+
+def weekly_counts(times: np.ndarray, weeks: int = SIGNUP_WEEKS, now: float = None) -> list:
+    """``[(week_start_iso, count)]`` for the last ``weeks`` weeks (Monday starts)."""
+    now = time.time() if now is None else now
+    # The epoch was a Thursday; shift so weeks start on Monday
+    offset = 3 * 24 * 3600
+    current = int((now + offset) // WEEK)
+    known = times[~np.isnan(times)]
+    index = ((known + offset) // WEEK).astype(np.int64) - (current - weeks + 1)
+    counts = np.bincount(index[(index >= 0) & (index < weeks)], minlength=weeks)
+    return [(datetime.fromtimestamp((current - weeks + 1 + i) * WEEK - offset, tz=timezone.utc).date().isoformat(),
+             int(count)) for i, count in enumerate(counts)]
+
+
+def compute_report(directory: str = EXPORT_DIR, now: float = None) -> dict:
+    from geo.gazetteer import municipalities
+
+    names = dict(municipalities())
+    users = load_table('users', directory)
+    jobs = load_table('jobs', directory)
+    applications = load_table('applications', directory)
+    reviews = load_table('reviews', directory)
+    services = load_table('service_requests', directory)
+    businesses = load_table('businesses', directory)
+
+    status = users['verification_status']
+    job_places = value_counts(jobs['municipality_id'][jobs['municipality_id'] != ''])
+    ratings = reviews['rating'][~np.isnan(reviews['rating'])]
+    return {
+        'verified_users': int(np.count_nonzero(status == 'verified')),
+        'pending_users': int(np.count_nonzero(status == 'pending_verification')),
+        'active_jobs': len(jobs['id']),
+        'active_services': len(services['id']),
+        'users_by_role': value_counts(users['role']),
+        'businesses': len(businesses['id']),
+        'jobs_per_municipality': [(names.get(mid, mid), count) for mid, count in job_places[:TOP_MUNICIPALITIES]],
+        'jobs_without_municipality': int(np.count_nonzero(jobs['municipality_id'] == '')),
+        'application_funnel': value_counts(applications['status'], order=FUNNEL),
+        'applications': len(applications['id']),
+        'signups_per_week': weekly_counts(users['created_at'], now=now),
+        'users_without_signup_date': int(np.count_nonzero(np.isnan(users['created_at']))),
+        'services_by_status': value_counts(services['status']),
+        'reviews': len(ratings),
+        'average_rating': round(float(ratings.mean()), 2) if len(ratings) else None,
+    }
+
+
+_report_cache = {}
+_report_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='analytics-export')
+_export_running = threading.Event()
+
+
+def report(directory: str = EXPORT_DIR):
+    """Aggregates of the latest export, or ``None`` if there is none yet.
+
+    Recomputed only when a newer export has been written.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    with _report_lock:
+        cached = _report_cache.get(directory)
+        if cached and cached[0] == manifest['exported_at']:
+            return cached[1]
+    data = compute_report(directory)
+    data['exported_at'] = datetime.fromtimestamp(manifest['exported_at'], tz=timezone.utc)
+    with _report_lock:
+        _report_cache[directory] = (manifest['exported_at'], data)
+    return data
+
+
+def refresh_in_background(driver, database, directory: str = EXPORT_DIR, max_age: float = MAX_AGE) -> bool:
+    """Start an export when the last one is older than ``max_age``. Returns True if started."""
+    manifest = read_manifest(directory)
+    if manifest and time.time() - manifest['exported_at'] < max_age:
+        return False
+    with _report_lock:
+        if _export_running.is_set():
+            return False
+        _export_running.set()
+
+    def run():
+        try:
+            export_all(driver, database, directory)
+        except Exception as e:
+            logger.error(f"Analytics export failed: {str(e)}")
+        finally:
+            _export_running.clear()
+
+    _executor.submit(run)
+    return True
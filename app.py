@@ -31,12 +31,15 @@ from models import (
     JobOffer, ServiceRequest
 )
 from decorators import admin_required
+import activity_stats
+import admin_events
 from routes.admin import admin as new_admin
 from chatbot_routes import bp as chatbot_bp
 from routes.dashboard_routes import dashboard
 from routes.job_routes import bp as jobs_bp
 from routes.service_routes import bp as services_bp
 from routes.business_routes import bp as business_bp
+from routes.tile_routes import bp as tiles_bp
 from routes.businesses_routes import businesses_bp
 from routes.guest.routes import guest_bp
 from routes.job_seeker.routes import job_seeker_bp
@@ -120,10 +123,27 @@ app.register_blueprint(jobs_bp)
 app.register_blueprint(services_bp)
 app.register_blueprint(businesses_bp, url_prefix="/businesses")
 app.register_blueprint(guest_bp)  # Guest routes are now top-level and public
+app.register_blueprint(tiles_bp)
 app.register_blueprint(job_seeker_bp, url_prefix="/job-seeker")
 app.register_blueprint(service_client_bp, url_prefix="/service-client")
 app.register_blueprint(business_owner_bp, url_prefix="/business-owner")
 
+# Load the local chatbot model at boot when CHATBOT_WARMUP is set. With
+# gunicorn --preload this runs once in the master and workers share the weights.
+import chatbot as local_chatbot
+local_chatbot.start_warmup()
+
+@app.route('/healthz/chatbot')
+def chatbot_readiness():
+    """Readiness probe for the local chatbot model, with per-tier, queue and cache counters."""
+    ready = local_chatbot.is_ready()
+    return jsonify({
+        'ready': ready,
+        'tiers': local_chatbot.pipeline_stats(),
+        'queue': local_chatbot.inference_stats(),
+        'cache': local_chatbot.cache_stats(),
+    }), (200 if ready else 503)
+
 # Custom template filters
 @app.template_filter('datetime')
 def format_datetime(value):
@@ -551,6 +571,8 @@ def signup():
                 logger.error('Failed to save user to database')
                 flash('Error creating account. Please try again.', 'danger')
                 return redirect(url_for('signup'))
+            admin_events.user_registered(user)
+            activity_stats.record('signups')
                 
             login_user(user)
             flash('Account created successfully!', 'success')
@@ -1134,6 +1156,7 @@ def system_design():
 def edit_profile():
     if request.method == 'POST':
         try:
+            resume_uploaded = False
             # Only update allowed fields, never role
             current_user.name = request.form.get('name')
             current_user.phone = request.form.get('phone')
@@ -1156,8 +1179,10 @@ def edit_profile():
                         resume.save(resume_path)
                         # store relative path under static/ for templates
                         current_user.resume_path = f"uploads/resumes/{filename}"
+                        resume_uploaded = True
             
-            current_user.save()
+            if current_user.save() and resume_uploaded:
+                admin_events.document_submitted(current_user, current_user.verification_status)
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('profile'))
         except Exception as e:
@@ -9,6 +9,9 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User
+import activity_stats
+import admin_events
+from admin_users import sort_keys
 from werkzeug.utils import secure_filename
 from oauth import get_google_auth_flow_from_config, get_google_user_info
 from pathlib import Path
@@ -135,7 +138,11 @@ def complete_registration():
                         permit_path: $permit_path,
                         id_front_path: $id_front_path,
                         id_back_path: $id_back_path,
-                        verification_status: 'pending_verification'
+                        verification_status: 'pending_verification',
+                        created_at: $created_at,
+                        updated_at: timestamp(),
+                        email_key: $email_key,
+                        name_key: $name_key
                     })
                 """, {
                     'id': new_id,
@@ -148,10 +155,15 @@ def complete_registration():
                     'resume_path': user.resume_path,
                     'permit_path': user.permit_path,
                     'id_front_path': user.id_front_path,
-                    'id_back_path': user.id_back_path
+                    'id_back_path': user.id_back_path,
+                    'created_at': datetime.now().isoformat(),
+                    **sort_keys(user.email, user.first_name, user.last_name)
                 })
 
                 user = User.get_by_email(google_user['email'])
+                if user:
+                    admin_events.user_registered(user)
+                    activity_stats.record('signups')
                 # Notify admins for any document submission
                 if user and role in ['job_seeker', 'business_owner', 'client']:
                     try:
@@ -263,7 +275,9 @@ def signup():
         )
 
         try:
-            new_user.save()
+            if new_user.save():
+                admin_events.user_registered(new_user)
+                activity_stats.record('signups')
             flash("Successfully registered! Please log in.", "success")
             return redirect(url_for("auth.login"))
         except Exception as e:
@@ -0,0 +1,222 @@
+"""
+Retrieval for the Gemini chat: one pass per message.
+
+An ``/api/chat`` request used to search twice. ``get_relevant_data`` ran
+three ``search_by_keywords`` scans, then ``GeminiChat.send_message`` ran
+``search_jobs`` / ``search_businesses`` / ``search_services`` again, against
+other labels and with other matching rules. Now the route calls
+``retrieve(message)`` once. The documents it returns are formatted into the
+context that goes to the prompt builder, and ``GeminiChat`` does no searching
+of its own.
+
+Retrievers are pluggable. A retriever has a ``name`` and
+``retrieve(query, limit)``, which returns ``[(record, score)]`` where each
+record is a dict with ``type`` and ``id``. ``CHAT_RETRIEVER`` picks one from
+``RETRIEVERS``, and ``set_retriever`` swaps it at runtime. Every call records
+a trace: the retriever, its latency and the documents it chose.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+CHAT_RETRIEVER = os.getenv('CHAT_RETRIEVER', 'embedding')
+# Listings of each kind put in the Gemini context
+CONTEXT_LISTINGS = 3
+DESCRIPTION_CHARS = 200
+
+KIND_ORDER = ('job', 'service', 'business')
+
+Retrieval = namedtuple('Retrieval', 'documents context trace')
+
+
+class EmbeddingRetriever:
+    """Cosine top-k over the in-memory listing embedding index; no Neo4j queries."""
+
+    name = 'embedding'
+
+    def __init__(self, index=None):
+        # Defaults to the process-wide index; benchmarks pass their own
+        self.index = index
+
+    def retrieve(self, query: str, limit: int):
+        from listing_embeddings import get_embedding_index
+        index = self.index if self.index is not None else get_embedding_index()
+        return index.search(query, k=limit)
+
+
+def extract_search_params(message: str) -> Dict[str, str]:
+    """Extract category, location and free-text query from the user's message."""
+    params = {}
+
+    # Look for category in the message
+    category_patterns = [
+        r"category[:\s]+(\w+)",
+        r"in the (\w+) category",
+        r"related to (\w+)",
+        r"about (\w+)"
+    ]
+    for pattern in category_patterns:
+        match = re.search(pattern, message.lower())
+        if match:
+            params["category"] = match.group(1)
+            break
+
+    # Look for location in the message
+    location_patterns = [
+        r"in\s+(\w+(?:\s+\w+)*(?:\s+City)?)",
+        r"at\s+(\w+(?:\s+\w+)*(?:\s+City)?)",
+        r"near\s+(\w+(?:\s+\w+)*(?:\s+City)?)",
+        r"around\s+(\w+(?:\s+\w+)*(?:\s+City)?)"
+    ]
+    for pattern in location_patterns:
+        match = re.search(pattern, message)
+        if match:
+            params["location"] = match.group(1)
+            break
+
+    # Use the rest as a general search query
+    # Remove found category and location if any
+    query = message
+    if "category" in params:
+        query = re.sub(r"category[:\s]+" + params["category"], "", query, flags=re.IGNORECASE)
+    if "location" in params:
+        query = re.sub(r"in\s+" + params["location"], "", query, flags=re.IGNORECASE)
+
+    query = query.strip()
+    if query and not all(word in ["show", "find", "get", "list", "me", "please", "can", "you", "tell", "about"] for word in query.lower().split()):
+        params["query"] = query
+
+    return params
+
+
+class KeywordRetriever:
+    """The old ``GeminiChat`` keyword searches (``database_queries``), one kind per message."""
+
+    name = 'keyword'
+
+    KIND_WORDS = {
+        'job': ("job", "work", "career", "position", "employment", "hiring"),
+        'business': ("business", "company", "store", "shop"),
+        'service': ("service", "provider"),
+    }
+
+    def retrieve(self, query: str, limit: int):
+        import database_queries
+        searches = {
+            'job': database_queries.search_jobs,
+            'business': database_queries.search_businesses,
+            'service': database_queries.search_services,
+        }
+        lowered = query.lower()
+        for kind, words in self.KIND_WORDS.items():
+            if any(word in lowered for word in words):
+                rows = searches[kind](limit=limit, **extract_search_params(query))
+                return [(self._record(kind, row), None) for row in rows]
+        return []
+
+    @staticmethod
+    def _record(kind: str, row) -> dict:
+        data = row if isinstance(row, dict) else dict(getattr(row, '__dict__', {}))
+        return dict(data, type=kind, id=str(data.get('id')),
+                    title=data.get('title') or data.get('name'))
+
+
+RETRIEVERS = {
+    EmbeddingRetriever.name: EmbeddingRetriever,
+    KeywordRetriever.name: KeywordRetriever,
+}
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever():
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                factory = RETRIEVERS.get(CHAT_RETRIEVER)
+                if factory is None:
+                    logger.error(f"Unknown CHAT_RETRIEVER {CHAT_RETRIEVER!r}; using embedding")
+                    factory = EmbeddingRetriever
+                _retriever = factory()
+    return _retriever
+
+
+def set_retriever(retriever):
+    """Use ``retriever`` for every chat message from now on (``None`` restores the default)."""
+    global _retriever
+    with _retriever_lock:
+        _retriever = retriever
+
+
+def format_context(documents) -> str:
+    """Format retrieved listings for the Gemini prompt; ``None`` if there are none."""
+    by_kind = {kind: [r for r, _ in documents if r.get('type') == kind][:CONTEXT_LISTINGS]
+               for kind in KIND_ORDER}
+    context_parts = []
+
+    jobs = by_kind['job']
+    if jobs:
+        context_parts.append("Relevant Jobs:")
+        for job in jobs:
+            context_parts.append(f"- {job.get('title')} at {job.get('business_name') or 'N/A'}")
+            context_parts.append(f"  Location: {job.get('location') or 'N/A'}")
+            context_parts.append(f"  Salary: ₱{job.get('salary') or 'N/A'}")
+            context_parts.append(f"  Description: {(job.get('description') or '')[:DESCRIPTION_CHARS]}...")
+
+    services = by_kind['service']
+    if services:
+        context_parts.append("\nRelevant Services:")
+        for service in services:
+            context_parts.append(f"- {service.get('title')}")
+            context_parts.append(f"  Location: {service.get('location') or 'N/A'}")
+            context_parts.append(f"  Payment: ₱{service.get('payment_offer') or 'N/A'}")
+            context_parts.append(f"  Description: {(service.get('description') or '')[:DESCRIPTION_CHARS]}...")
+
+    businesses = by_kind['business']
+    if businesses:
+        context_parts.append("\nRelevant Businesses:")
+        for business in businesses:
+            context_parts.append(f"- {business.get('title')}")
+            context_parts.append(f"  Location: {business.get('location') or 'N/A'}")
+            context_parts.append(f"  Category: {business.get('category') or 'N/A'}")
+            if business.get('description'):
+                context_parts.append(f"  Description: {business['description'][:DESCRIPTION_CHARS]}...")
+
+    return "\n".join(context_parts) if context_parts else None
+
+
+def retrieve(query: str, limit: int = CONTEXT_LISTINGS * len(KIND_ORDER), retriever=None) -> Retrieval:
+    """Run the retriever once for ``query``. Never raises: a failed search means no context."""
+    retriever = retriever or get_retriever()
+    start = time.perf_counter()
+    try:
+        documents = list(retriever.retrieve(query, limit))
+        error = None
+    except Exception as e:
+        logger.error(f"Error retrieving chat context with {retriever.name}: {str(e)}")
+        documents, error = [], str(e)
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+    trace = {
+        'retriever': retriever.name,
+        'ms': round(elapsed_ms, 2),
+        'documents': [
+            {'type': r.get('type'), 'id': r.get('id'), 'title': r.get('title'),
+             'score': round(score, 3) if score is not None else None}
+            for r, score in documents
+        ],
+    }
+    if error:
+        trace['error'] = error
+    logger.info(f"Retrieved {len(documents)} documents with {retriever.name} in {elapsed_ms:.1f} ms: "
+                + ', '.join(f"{d['type']}:{d['id']}" for d in trace['documents']))
+    return Retrieval(documents, format_context(documents), trace)
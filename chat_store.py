@@ -0,0 +1,238 @@
+"""
+Server-side store for chatbot conversations.
+
+Chat history used to live in the Flask cookie session: up to 10 full
+messages, re-signed on every response and sent back in every request header.
+Conversations now live in a SQLite file under ``instance/`` and the session
+only carries the conversation id.
+
+The tables follow the ``Conversation`` / ``Message`` shape of
+``models.base.Chat``: a conversation has an id, an optional owner and
+timestamps, and its messages are ordered by an autoincrement id. Reads are
+always bounded. ``recent_messages`` feeds the prompt and ``get_messages``
+pages backwards with a ``before`` cursor.
+
+Conversations idle for more than ``CHAT_RETENTION_DAYS`` are deleted. The
+prune runs from ``create_conversation``, at most once per
+``CHAT_PRUNE_INTERVAL`` seconds per process, so no scheduler is needed.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv(
+    'CHAT_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'chat_history.db')
+)
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+RETENTION_DAYS = float(os.getenv('CHAT_RETENTION_DAYS', 30))
+PRUNE_INTERVAL = float(os.getenv('CHAT_PRUNE_INTERVAL', 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    summary TEXT,
+    summary_upto INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    sent_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, id);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated_at);
+"""
+
+# Columns added after the first release, for databases created before them
+_MIGRATIONS = {
+    'summary': "ALTER TABLE conversations ADD COLUMN summary TEXT",
+    'summary_upto': "ALTER TABLE conversations ADD COLUMN summary_upto INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class ChatStore:
+    def __init__(self, path: str = DB_PATH, retention_days: float = RETENTION_DAYS, clock=time.time):
+        self.path = path
+        self.retention_days = retention_days
+        self.clock = clock
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._prune_lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute('PRAGMA journal_mode = WAL')
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    columns = {row['name'] for row in conn.execute("PRAGMA table_info(conversations)")}
+                    for column, statement in _MIGRATIONS.items():
+                        if column not in columns:
+                            conn.execute(statement)
+                    conn.commit()
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Conversations
+    # ------------------------------------------------------------------
+    def create_conversation(self, user_id: str = None) -> str:
+        conversation_id = uuid.uuid4().hex
+        now = _now()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO conversations (id, user_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (conversation_id, user_id, now, now))
+        self._maybe_prune()
+        return conversation_id
+
+    def get_conversation(self, conversation_id: str):
+        if not conversation_id:
+            return None
+        row = self._connection().execute(
+            "SELECT id, user_id, created_at, updated_at FROM conversations WHERE id = ?",
+            (conversation_id,)).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, conversation_id: str, user_id: str):
+        """Attach an anonymous conversation to a user who has since logged in."""
+        conn = self._connection()
+        with conn:
+            conn.execute("UPDATE conversations SET user_id = ? WHERE id = ? AND user_id IS NULL",
+                         (user_id, conversation_id))
+
+    def delete_conversation(self, conversation_id: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def prune(self, older_than_days: float = None) -> int:
+        """Delete conversations idle for longer than ``older_than_days`` (default
+        ``retention_days``); returns the count."""
+        if older_than_days is None:
+            older_than_days = self.retention_days
+        cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,))
+        return cursor.rowcount
+
+    def _maybe_prune(self):
+        with self._prune_lock:
+            now = self.clock()
+            if now < self._next_prune:
+                return
+            self._next_prune = now + PRUNE_INTERVAL
+        try:
+            pruned = self.prune()
+            if pruned:
+                logger.info(f"Pruned {pruned} idle chat conversations")
+        except sqlite3.Error as e:
+            logger.error(f"Error pruning chat conversations: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # Messages
+    # ------------------------------------------------------------------
+    def append(self, conversation_id: str, *messages):
+        """Append ``{"role", "content"}`` messages in order."""
+        now = _now()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO messages (conversation_id, role, content, sent_at) VALUES (?, ?, ?, ?)",
+                [(conversation_id, m['role'], m['content'], now) for m in messages])
+            conn.execute("UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id))
+
+    def clear(self, conversation_id: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            conn.execute("UPDATE conversations SET summary = NULL WHERE id = ?", (conversation_id,))
+
+    def messages_after(self, conversation_id: str, after: int = 0, limit: int = MAX_PAGE_SIZE):
+        """Messages with an id above ``after``, oldest first, as ``{"id", "role", "content"}``."""
+        rows = self._connection().execute(
+            "SELECT id, role, content FROM messages WHERE conversation_id = ? AND id > ? "
+            "ORDER BY id DESC LIMIT ?", (conversation_id, int(after), int(limit))).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def get_summary(self, conversation_id: str):
+        """``(summary, summary_upto)``: the rolling summary and the last message id it covers."""
+        row = self._connection().execute(
+            "SELECT summary, summary_upto FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        return (row['summary'], row['summary_upto']) if row else (None, 0)
+
+    def set_summary(self, conversation_id: str, summary: str, upto: int):
+        """Replace the summary, only moving ``summary_upto`` forward."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE conversations SET summary = ?, summary_upto = ? WHERE id = ? AND summary_upto < ?",
+                (summary, int(upto), conversation_id, int(upto)))
+
+    def sent_times(self, role: str = 'user'):
+        """Iterate over the ``sent_at`` of every message from ``role``, for backfills."""
+        for row in self._connection().execute("SELECT sent_at FROM messages WHERE role = ?", (role,)):
+            yield row['sent_at']
+
+    def get_messages(self, conversation_id: str, limit: int = PAGE_SIZE, before: int = None):
+        """Return ``(messages, next_before)``: up to ``limit`` messages older than
+        ``before`` (a message id), oldest first. ``next_before`` is the cursor for
+        the next older page, or ``None`` when there are no older messages."""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        query = "SELECT id, role, content, sent_at FROM messages WHERE conversation_id = ?"
+        params = [conversation_id]
+        if before is not None:
+            query += " AND id < ?"
+            params.append(int(before))
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = self._connection().execute(query, params).fetchall()
+        page = [dict(row) for row in rows[:limit]][::-1]
+        next_before = page[0]['id'] if len(rows) > limit and page else None
+        return page, next_before
+
+    def recent_messages(self, conversation_id: str, limit: int = 10):
+        """The last ``limit`` messages as ``{"role", "content"}`` dicts, for prompts."""
+        messages, _ = self.get_messages(conversation_id, limit=limit)
+        return [{'role': m['role'], 'content': m['content']} for m in messages]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store() -> ChatStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChatStore()
+    return _store
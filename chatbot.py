@@ -1,19 +1,34 @@
 ﻿"""
 Memory-optimized chatbot for Flask + Hugging Face transformers.
-- Lazy loads model/tokenizer on first request (not at import time).
+- Answers through a tiered pipeline (rules, listings retrieval, model; see
+  chatbot_pipeline). The model only loads when a message reaches its tier.
+- Lazy loads model/tokenizer on first use (not at import time), or warms
+  them up at boot when CHATBOT_WARMUP is set (see start_warmup).
 - Always tries local ./model first (with use_fast=False).
 - Falls back to Hugging Face "google/flan-t5-small" (with use_fast=True) if local model is missing/incomplete.
 - Returns safe error messages if model loading fails.
-- Optimized for Railway free tier (≤ 3 GB RAM, CPU only).
+- Optimized for Railway free tier (≤ 3 GB RAM, CPU only). CHATBOT_BACKEND
+  selects float32, int8 or ONNX Runtime inference (see chatbot_backends).
 """
 
+import gc
 import os
 import logging
+import threading
+
+from chatbot_backends import BACKEND, load_model
+from chatbot_pipeline import (
+    Pipeline, Tier, answer_from_listings, answer_from_rules, RETRIEVAL_THRESHOLD, RULE_THRESHOLD,
+)
+from inference_queue import InferenceQueue, QueueFull, QueueTimeout
+from prompt_builder import PromptBuilder
+from response_cache import ResponseCache
 
 # Error messages
 ERROR_EMPTY_INPUT = "Please provide a message"
 ERROR_PROCESSING = "Error processing your request"
 ERROR_MODEL_LOADING = "The model is not available right now, please try again later"
+ERROR_WARMING_UP = "The assistant is starting up, please try again in a moment"
 
 # Model config
 DEFAULT_MODEL = "google/flan-t5-small"
@@ -23,6 +38,23 @@ TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", 0.2))
 NUM_BEAMS = int(os.getenv("MODEL_NUM_BEAMS", 4))
 REPETITION_PENALTY = float(os.getenv("MODEL_REPETITION_PENALTY", 1.2))
 NO_REPEAT_NGRAM_SIZE = int(os.getenv("MODEL_NO_REPEAT_NGRAM_SIZE", 3))
+# Input token budget for system prompt + question (see prompt_builder)
+PROMPT_BUDGET = int(os.getenv("MODEL_PROMPT_BUDGET", 256))
+
+# Warmup mode:
+# - "off" (default): load on the first request
+# - "preload": load in the importing process. Under gunicorn --preload that is
+#   the master, so forked workers share the weights copy-on-write; each worker
+#   then runs its warmup generation in a background thread after the fork.
+# - "background": load and warm up in a background thread of each process
+WARMUP_MODE = os.getenv("CHATBOT_WARMUP", "off").strip().lower()
+WARMUP_PROMPT = "Hello"
+
+# Micro-batching of concurrent model calls (see inference_queue). CHATBOT_BATCH_MAX=1 disables it.
+BATCH_MAX = int(os.getenv("CHATBOT_BATCH_MAX", 4))
+BATCH_WINDOW_MS = float(os.getenv("CHATBOT_BATCH_WINDOW_MS", 20))
+QUEUE_MAX_DEPTH = int(os.getenv("CHATBOT_QUEUE_MAX_DEPTH", 32))
+REQUEST_TIMEOUT = float(os.getenv("CHATBOT_REQUEST_TIMEOUT", 30))
 
 # System prompt to guide the assistant's behaviour and keep replies focused/deterministic
 SYSTEM_PROMPT = """
@@ -47,42 +79,22 @@ You are Catanduanes Connect Assistant, an AI chatbot integrated into the Catandu
 """
 
 
-def _route_prompt(text: str) -> str | None:
-    """
-    Simple deterministic router for common app-specific requests.
-    Returns a short direct response string when it matches, otherwise None.
-    """
-    if not text:
-        return None
-    t = text.lower()
-
-    # Jobs-related
-    if any(k in t for k in ("job", "jobs", "job portal", "job listing", "hiring", "vacancy", "vacancies")):
-        return (
-            "For job listings, please visit the Job Portal in the app (Jobs section). "
-            "You can also search or filter jobs from the Jobs page to find openings."
-        )
-
-    # Businesses / directory
-    if any(k in t for k in ("business", "businesses", "directory", "company", "companies", "business listing")):
-        return (
-            "To find businesses, please use the Directory in the app or the Business Search page. "
-            "You can also view businesses on the Map for location details."
-        )
-
-    # Map / GIS
-    if any(k in t for k in ("map", "location", "gis", "coordinates", "where is", "address", "find")):
-        return (
-            "Use the Map page or the GIS map in the Directory to find locations and coordinates. "
-            "Open the Map from the main menu to see business and place pins."
-        )
-
-    return None
-
 # Globals for lazy loading
 tokenizer = None
 model = None
+backend = None
 load_failed = False
+_queue = None
+_prompt_builder = None
+_load_lock = threading.Lock()
+
+# Readiness: set once the model is loaded and one generation has run in this process
+_ready = threading.Event()
+_warmup_thread = None
+# The mode start_warmup ran with, and for "preload" the process that loaded
+_warmup_mode = "off"
+_preload_pid = None
+_warmup_lock = threading.Lock()
 
 def _is_local_model_available():
     # Must be a directory and contain spiece.model (for T5 tokenizer)
@@ -95,36 +107,33 @@ def _is_local_model_available():
     return True
 
 def _lazy_load():
-    global tokenizer, model, load_failed
     if tokenizer is not None and model is not None:
         return True
     if load_failed:
         return False
+    with _load_lock:
+        if tokenizer is not None and model is not None:
+            return True
+        if load_failed:
+            return False
+        return _load()
 
+def _load():
+    global tokenizer, model, load_failed, backend
     try:
         # Import transformers/torch only when needed
-        import torch
-        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+        from transformers import AutoTokenizer
 
         if _is_local_model_available():
-            logging.info("Loading local model from ./model (use_fast=False)...")
+            logging.info(f"Loading local model from ./model (use_fast=False, backend={BACKEND})...")
             tokenizer = AutoTokenizer.from_pretrained(LOCAL_MODEL_DIR, use_fast=False)
-            model = AutoModelForSeq2SeqLM.from_pretrained(
-                LOCAL_MODEL_DIR,
-                torch_dtype=torch.float32,
-                device_map="cpu",
-                low_cpu_mem_usage=True
-            )
-            logging.info("✓ Local model loaded successfully")
+            model, backend = load_model(LOCAL_MODEL_DIR, BACKEND)
+            logging.info(f"✓ Local model loaded successfully ({backend})")
         else:
             logging.info("Local model not found or incomplete, falling back to Hugging Face Hub...")
             tokenizer = AutoTokenizer.from_pretrained(DEFAULT_MODEL, use_fast=True)
-            model = AutoModelForSeq2SeqLM.from_pretrained(
-                DEFAULT_MODEL,
-                torch_dtype=torch.float32,
-                device_map="cpu"
-            )
-            logging.info("✓ Fallback model loaded successfully")
+            model, backend = load_model(DEFAULT_MODEL, BACKEND, low_cpu_mem_usage=False)
+            logging.info(f"✓ Fallback model loaded successfully ({backend})")
         return True
     except Exception as e:
         logging.exception(f"Failed to load model/tokenizer: {e}")
@@ -132,66 +141,223 @@ def _lazy_load():
         load_failed = True
         return False
 
+def _freeze_heap():
+    """Move every object allocated so far into the permanent GC generation.
+
+    The collector then never walks (and writes refcount/GC headers into) the
+    model's Python objects, so pages inherited from the master stay shared
+    copy-on-write between forked workers.
+    """
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+def _warm_generate():
+    """Run one short generation so kernels and caches are initialised."""
+    try:
+        _generate(WARMUP_PROMPT, max_new_tokens=4)
+        _ready.set()
+        logging.info("✓ Chatbot warmup finished")
+    except Exception:
+        logging.exception("Chatbot warmup generation failed")
+        # The model loaded; let traffic through rather than blocking forever
+        _ready.set()
+
+def _background_warmup(load=True):
+    if load and not _lazy_load():
+        _ready.set()  # get_response reports ERROR_MODEL_LOADING from here on
+        return
+    _warm_generate()
+
+def _start_thread(load):
+    global _warmup_thread
+    _warmup_thread = threading.Thread(target=_background_warmup, args=(load,),
+                                      name="chatbot-warmup", daemon=True)
+    _warmup_thread.start()
+
+def _after_fork_in_child():
+    """Warm the worker's own caches; the weights were inherited from the master."""
+    global _load_lock, _warmup_lock, _ready, _queue, _warmup_thread
+    _load_lock = threading.Lock()
+    _warmup_lock = threading.Lock()
+    _ready = threading.Event()
+    _queue = None
+    _warmup_thread = None
+    if model is not None:
+        _start_thread(load=False)
+    elif _warmup_mode == "background":
+        _start_thread(load=True)
+    else:
+        _ready.set()
+
+def start_warmup(mode: str = None):
+    """Start the configured warmup. Safe to call more than once."""
+    global _warmup_mode, _preload_pid
+    mode = (mode or WARMUP_MODE).lower()
+    if mode not in ("preload", "background") or _warmup_mode != "off":
+        return
+    _warmup_mode = mode
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+    if mode == "preload":
+        # Load and freeze only. No torch kernel may run in the master before
+        # fork: its thread pool can be unusable in the children, and a fork in
+        # the middle of generate can deadlock a worker on torch/OpenMP locks.
+        # Each worker runs its own warmup generation after fork.
+        _preload_pid = os.getpid()
+        if _lazy_load():
+            _freeze_heap()
+        else:
+            _ready.set()  # get_response reports ERROR_MODEL_LOADING from here on
+    else:
+        _start_thread(load=True)
+
+def is_ready() -> bool:
+    """True when chat traffic can be served without waiting for a model load."""
+    if _warmup_mode not in ("preload", "background"):
+        return True
+    if (_warmup_mode == "preload" and _warmup_thread is None and not _ready.is_set()
+            and os.getpid() == _preload_pid):
+        # Serving from the process that preloaded, so no fork is coming
+        with _warmup_lock:
+            if _warmup_thread is None:
+                _start_thread(load=False)
+    return _ready.is_set()
+
+def _get_prompt_builder():
+    global _prompt_builder
+    if _prompt_builder is None:
+        _prompt_builder = PromptBuilder.for_tokenizer(tokenizer, PROMPT_BUDGET)
+    return _prompt_builder
+
+def _generate_batch(texts, max_new_tokens: int = MAX_LENGTH):
+    """Run the model on several user messages in one padded generate call."""
+    import torch
+    # The builder reuses the system prompt's token ids and trims the system
+    # prompt, not the question, when the two don't fit PROMPT_BUDGET.
+    builder = _get_prompt_builder()
+    prompts = [builder.build(text.strip(), system=SYSTEM_PROMPT.strip()) for text in texts]
+    inputs = tokenizer.pad(
+        {"input_ids": [prompt.input_ids for prompt in prompts]},
+        return_tensors="pt"
+    ).to(model.device)
+
+    with torch.inference_mode():
+        # Determine sampling behavior: when temperature > 0 use sampling for more variety;
+        # when temperature == 0 prefer beam search / deterministic generation.
+        do_sample = bool(TEMPERATURE and float(TEMPERATURE) > 0.0)
+        gen_kwargs = dict(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_new_tokens=max_new_tokens,
+            num_beams=NUM_BEAMS if not do_sample else 1,
+            repetition_penalty=REPETITION_PENALTY,
+            no_repeat_ngram_size=NO_REPEAT_NGRAM_SIZE,
+            early_stopping=not do_sample,
+            do_sample=do_sample,
+        )
+        if do_sample:
+            gen_kwargs.update({
+                "temperature": float(TEMPERATURE),
+                "top_p": 0.95,
+            })
+
+        outputs = model.generate(**gen_kwargs)
+
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+def _generate(text: str, max_new_tokens: int = MAX_LENGTH) -> str:
+    """Run the model on one user message and decode the reply."""
+    return _generate_batch([text], max_new_tokens)[0]
+
+def _get_queue():
+    """The process's micro-batching queue, or None when batching is disabled."""
+    global _queue
+    if BATCH_MAX <= 1:
+        return None
+    if _queue is None:
+        with _load_lock:
+            if _queue is None:
+                _queue = InferenceQueue(_generate_batch, max_batch=BATCH_MAX, window_ms=BATCH_WINDOW_MS,
+                                        max_depth=QUEUE_MAX_DEPTH, default_timeout=REQUEST_TIMEOUT)
+    return _queue
+
+def inference_stats():
+    """Queue depth and batching counters, or None when batching is disabled."""
+    return _queue.stats() if _queue is not None else None
+
+def _answer_with_model(text: str):
+    """Last pipeline tier. Returns None when the model can't be used right now."""
+    if not is_ready() or not _lazy_load():
+        return None
+    queue = _get_queue()
+    if queue is None:
+        response = _generate(text)
+    else:
+        try:
+            response = queue.submit(text)
+        except (QueueFull, QueueTimeout) as e:
+            logging.warning(f"Model tier skipped: {e}")
+            return None
+    return (response.strip(), 1.0) if response and response.strip() else None
+
+pipeline = Pipeline([
+    Tier("rules", answer_from_rules, RULE_THRESHOLD),
+    Tier("retrieval", answer_from_listings, RETRIEVAL_THRESHOLD),
+    Tier("model", _answer_with_model, 0.0),
+])
+
+# Answers to repeated questions, keyed by the listing index version
+response_cache = ResponseCache()
+
+def pipeline_stats() -> dict:
+    """Per-tier attempt, hit and latency counters."""
+    return pipeline.stats()
+
+def cache_stats() -> dict:
+    return response_cache.stats()
+
+def _listings_version() -> str:
+    # Retrieval answers change whenever a listing is written or the index reloads
+    from geo.spatial_index import get_spatial_index
+    index = get_spatial_index(refresh=False)
+    return f"{index.generation}.{index.version}"
+
+def answer_prompt(prompt: str):
+    """Return ``(answer, tier)`` like ``pipeline.answer``; tier is ``"cache"`` for cached answers."""
+    version = _listings_version()
+    cached = response_cache.get(prompt, version)
+    if cached:
+        return cached, "cache"
+    answer, tier, confident = pipeline.resolve(prompt)
+    # Fallbacks are only the best of a degraded moment; ask again next time
+    if answer and confident:
+        response_cache.set(prompt, answer, version)
+    return answer, tier
+
 def get_response(prompt: str) -> str:
     """
-    Generate a response using the chatbot model.
-    Returns safe error messages if model/tokenizer are unavailable.
+    Generate a response using the chatbot pipeline (rules, retrieval, model).
+    Returns safe error messages if no tier could answer.
     """
     if not prompt or not prompt.strip():
         logging.warning("Empty prompt received")
         return ERROR_EMPTY_INPUT
 
-    if not _lazy_load():
-        return ERROR_MODEL_LOADING
-
     try:
-        # First, check deterministic router for app-specific intents (jobs, businesses, map)
-        routed = _route_prompt(prompt)
-        if routed:
-            return routed
-
-        # Build the prompt for the model using the system prompt provided above.
-        # This keeps the assistant on-topic and instructs it to refuse unrelated requests.
-        formatted_prompt = (
-            SYSTEM_PROMPT.strip() + "\n\n"
-            + f"User: {prompt.strip()}\nAssistant:"
-        )
-
-        import torch
-        inputs = tokenizer(
-            formatted_prompt,
-            return_tensors="pt",
-            max_length=MAX_LENGTH,
-            truncation=True
-        ).to(model.device)
-
-        with torch.inference_mode():
-            # Determine sampling behavior: when temperature > 0 use sampling for more variety;
-            # when temperature == 0 prefer beam search / deterministic generation.
-            do_sample = bool(TEMPERATURE and float(TEMPERATURE) > 0.0)
-            gen_kwargs = dict(
-                input_ids=inputs["input_ids"],
-                attention_mask=inputs["attention_mask"],
-                max_new_tokens=MAX_LENGTH,
-                num_beams=NUM_BEAMS if not do_sample else 1,
-                repetition_penalty=REPETITION_PENALTY,
-                no_repeat_ngram_size=NO_REPEAT_NGRAM_SIZE,
-                early_stopping=not do_sample,
-                do_sample=do_sample,
-            )
-            if do_sample:
-                gen_kwargs.update({
-                    "temperature": float(TEMPERATURE),
-                    "top_p": 0.95,
-                })
-
-            outputs = model.generate(**gen_kwargs)
-
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return response.strip() if response else ERROR_PROCESSING
-    except Exception as e:
+        answer, tier = answer_prompt(prompt)
+    except Exception:
         logging.exception("Error generating response:")
         return ERROR_PROCESSING
+    if answer:
+        return answer
+
+    # Nothing matched cheaply and the model couldn't answer
+    if not is_ready():
+        return ERROR_WARMING_UP
+    if load_failed:
+        return ERROR_MODEL_LOADING
+    return ERROR_PROCESSING
 
 # Optional: Logging filter to skip empty request bodies
 class SkipEmptyBodyFilter(logging.Filter):
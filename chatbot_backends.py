@@ -0,0 +1,97 @@
+"""
+Inference backends for the local seq2seq model.
+
+Selected with ``CHATBOT_BACKEND``:
+
+- ``float32`` (default): the PyTorch model as stored in ``model/``
+- ``int8``: PyTorch dynamic quantization of the Linear layers. Roughly a
+  quarter of the weight memory and faster matmuls on CPU, at a small quality
+  cost
+- ``onnx``: ONNX Runtime through ``optimum``. The export (encoder, decoder and
+  decoder-with-past sessions) is written once to ``ONNX_MODEL_DIR`` and reused
+  on later boots
+
+All backends expose the same ``generate`` API, so ``chatbot._generate`` does
+not need to know which one is loaded. torch, transformers and optimum are
+imported only when a model is loaded.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('float32', 'int8', 'onnx')
+DEFAULT_BACKEND = 'float32'
+BACKEND = os.getenv('CHATBOT_BACKEND', DEFAULT_BACKEND).strip().lower()
+ONNX_MODEL_DIR = os.getenv(
+    'ONNX_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model', 'onnx')
+)
+
+
+def resolve_backend(name: str = None) -> str:
+    name = (name or BACKEND).strip().lower()
+    if name not in BACKENDS:
+        logger.warning(f"Unknown chatbot backend {name!r}, using {DEFAULT_BACKEND}")
+        return DEFAULT_BACKEND
+    return name
+
+
+def _load_torch(source: str, low_cpu_mem_usage: bool):
+    import torch
+    from transformers import AutoModelForSeq2SeqLM
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(
+        source,
+        torch_dtype=torch.float32,
+        device_map="cpu",
+        low_cpu_mem_usage=low_cpu_mem_usage
+    )
+    model.eval()
+    return model
+
+
+def _quantize_int8(model):
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_onnx(source: str, export_dir: str = None):
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    export_dir = export_dir or ONNX_MODEL_DIR
+    if os.path.isfile(os.path.join(export_dir, 'config.json')):
+        return ORTModelForSeq2SeqLM.from_pretrained(export_dir, use_cache=True)
+
+    logger.info(f"Exporting {source} to ONNX in {export_dir} (first boot only)...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(source, export=True, use_cache=True)
+    try:
+        model.save_pretrained(export_dir)
+    except Exception as e:
+        # Still usable for this process; the export is simply redone next boot
+        logger.error(f"Could not cache ONNX export in {export_dir}: {str(e)}")
+    return model
+
+
+def load_model(source: str, backend: str = None, low_cpu_mem_usage: bool = True):
+    """Load the seq2seq model from ``source`` (a directory or hub id) with a backend.
+
+    Returns ``(model, backend_name)``. Falls back to float32 when the requested
+    backend can't be built (e.g. optimum is not installed).
+    """
+    backend = resolve_backend(backend)
+    if backend == 'onnx':
+        try:
+            return _load_onnx(source), 'onnx'
+        except Exception as e:
+            logger.error(f"ONNX backend unavailable, falling back to float32: {str(e)}")
+            backend = DEFAULT_BACKEND
+
+    model = _load_torch(source, low_cpu_mem_usage)
+    if backend == 'int8':
+        try:
+            return _quantize_int8(model), 'int8'
+        except Exception as e:
+            logger.error(f"int8 quantization failed, using float32: {str(e)}")
+    return model, DEFAULT_BACKEND
@@ -0,0 +1,261 @@
+"""
+Tiered answer pipeline for the local chatbot.
+
+Messages go through the tiers cheapest first:
+
+1. ``rules``: greetings, FAQ entries and app navigation, scored by keyword
+   overlap with no I/O
+2. ``retrieval``: matching listings from the in-memory spatial index
+3. ``model``: the local T5 model, which is only loaded when a message gets
+   this far
+
+Each tier returns ``(answer, confidence)`` or ``None``. The first tier whose
+confidence reaches its threshold answers. Lower-confidence answers are kept
+and used when no tier clears its threshold (e.g. the model is unavailable).
+Every tier counts attempts, hits, fallbacks, errors and latency.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from geo.gazetteer import geocode, normalize
+
+logger = logging.getLogger(__name__)
+
+RULE_THRESHOLD = float(os.getenv("CHATBOT_RULE_THRESHOLD", 0.6))
+RETRIEVAL_THRESHOLD = float(os.getenv("CHATBOT_RETRIEVAL_THRESHOLD", 0.6))
+RETRIEVAL_LIMIT = 3
+
+# Words that carry no intent of their own
+STOP_WORDS = {
+    "a", "an", "the", "i", "im", "me", "my", "we", "our", "you", "your", "it", "this", "that",
+    "is", "are", "am", "be", "was", "do", "does", "did", "can", "could", "would", "will", "should",
+    "how", "what", "where", "which", "who", "when", "why", "please", "pls", "thanks",
+    "to", "in", "on", "of", "for", "at", "from", "with", "about", "and", "or", "near",
+    "show", "find", "list", "see", "any", "there", "some", "get", "give", "tell", "want", "need",
+    "looking", "look", "search", "available", "catanduanes", "catanduanesconnect", "app", "site",
+}
+
+
+def _stem(word: str) -> str:
+    if word.endswith("sses"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text: str) -> set:
+    """Normalized, stemmed content words of ``text``."""
+    return {_stem(w) for w in normalize(text).split() if w not in STOP_WORDS}
+
+
+# ---------------------------------------------------------------------------
+# Tier 1: rules and FAQ
+# ---------------------------------------------------------------------------
+
+# (keywords, answer). Keywords are matched after stemming.
+RULES = [
+    # Navigation (formerly the keyword router in chatbot.py). Listed first so a
+    # bare "jobs" gets directions rather than an FAQ entry.
+    ({"job", "portal", "listing", "hiring", "vacancy", "opening", "work"},
+     "For job listings, please visit the Job Portal in the app (Jobs section). "
+     "You can also search or filter jobs from the Jobs page to find openings."),
+    ({"business", "directory", "company", "shop", "store", "listing"},
+     "To find businesses, please use the Directory in the app or the Business Search page. "
+     "You can also view businesses on the Map for location details."),
+    ({"map", "location", "gis", "coordinate", "address", "direction", "locate"},
+     "Use the Map page or the GIS map in the Directory to find locations and coordinates. "
+     "Open the Map from the main menu to see business and place pins."),
+    ({"hi", "hello", "hey", "good", "morning", "afternoon", "evening", "kumusta"},
+     "Hello! I can help you find jobs, businesses and services in Catanduanes. What are you looking for?"),
+    ({"register", "sign", "signup", "up", "account", "create"},
+     "To create an account, click Register on the top menu, choose your role "
+     "(job seeker, business owner or client) and verify your email."),
+    ({"password", "forgot", "reset", "login", "log"},
+     "If you forgot your password, use the Forgot Password link on the login page "
+     "and follow the email we send you."),
+    ({"post", "job", "hire", "hiring", "vacancy", "create"},
+     "Business owners can post a job from their dashboard: open Jobs, then Post a Job."),
+    ({"apply", "application", "job", "resume", "cv"},
+     "Open a job from the Jobs page and click Apply. You can track your applications "
+     "from your job seeker dashboard."),
+    ({"verify", "verification", "business", "permit", "document"},
+     "Upload your business permit from the business owner dashboard. An admin reviews "
+     "it before your business is marked verified."),
+    ({"contact", "support", "help", "admin", "report", "problem"},
+     "You can reach the team from the Support page in the main menu."),
+]
+
+
+def answer_from_rules(text: str):
+    """Best rule for ``text``; confidence is the share of its content words the rule explains."""
+    words = terms(text)
+    if not words:
+        return None
+    best = None
+    for keywords, answer in RULES:
+        matched = len(words & keywords)
+        if matched and (best is None or matched > best[0]):
+            best = (matched, answer)
+    if best is None:
+        return None
+    return best[1], best[0] / len(words)
+
+
+# ---------------------------------------------------------------------------
+# Tier 2: retrieval from listings
+# ---------------------------------------------------------------------------
+
+KIND_WORDS = {
+    "job": {"job", "work", "hiring", "vacancy", "opening", "employment", "career"},
+    "business": {"business", "shop", "store", "company", "establishment"},
+    "service": {"service", "provider", "repair", "helper", "gig"},
+}
+KIND_NAMES = {"job": "jobs", "business": "businesses", "service": "services"}
+
+
+def _format_listing(record) -> str:
+    line = f"- {record.get('title') or 'Untitled'}"
+    if record.get("business_name"):
+        line += f" at {record['business_name']}"
+    if record.get("location"):
+        line += f" ({record['location']})"
+    return line
+
+
+def answer_from_listings(text: str, index=None):
+    """Answer with indexed listings matching the message's kind, municipality and words.
+
+    Confidence is the share of the message's content words that are explained
+    by the listing kind, the municipality and the best listing's title/category.
+    """
+    words = terms(text)
+    if not words:
+        return None
+    if index is None:
+        from geo.spatial_index import get_spatial_index
+        index = get_spatial_index()
+
+    kinds = [kind for kind, keywords in KIND_WORDS.items() if words & keywords]
+    explained = set().union(*(words & KIND_WORDS[kind] for kind in kinds)) if kinds else set()
+
+    place = geocode(text)
+    if place is not None:
+        explained |= words & terms(place.municipality)
+    wanted = words - explained - {"job", "business", "service"}
+
+    def matches(record):
+        return place is None or record.get("municipality_id") == place.municipality_id
+
+    scored = []
+    for record in index.listings(kinds=kinds or None, predicate=matches):
+        overlap = wanted & terms(f"{record.get('title') or ''} {record.get('category') or ''}")
+        if overlap or not wanted:
+            scored.append((len(overlap), record.get("title") or "", record, overlap))
+    if not scored or (not kinds and place is None and not any(s[0] for s in scored)):
+        return None
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    top = scored[:RETRIEVAL_LIMIT]
+
+    explained |= top[0][3]
+    confidence = len(explained) / len(words)
+
+    what = " and ".join(KIND_NAMES[k] for k in kinds) if kinds else "listings"
+    where = f" in {place.municipality}" if place is not None else ""
+    lines = [f"Here are some {what}{where} I found:"]
+    lines += [_format_listing(item[2]) for item in top]
+    lines.append("Open the Map or the listing pages for details and contact information.")
+    return "\n".join(lines), confidence
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+class Tier:
+    """One stage of the pipeline with its threshold and counters."""
+
+    def __init__(self, name: str, handler, threshold: float):
+        self.name = name
+        self.handler = handler
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.attempts = self.hits = self.fallbacks = self.errors = 0
+            self.total_ms = self.max_ms = 0.0
+
+    def run(self, text: str):
+        start = time.perf_counter()
+        try:
+            return self.handler(text)
+        except Exception:
+            logger.exception(f"Chatbot tier {self.name} failed")
+            with self._lock:
+                self.errors += 1
+            return None
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.attempts += 1
+                self.total_ms += elapsed
+                self.max_ms = max(self.max_ms, elapsed)
+
+    def count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "errors": self.errors,
+                "avg_ms": round(self.total_ms / self.attempts, 2) if self.attempts else 0.0,
+                "max_ms": round(self.max_ms, 2),
+            }
+
+
+class Pipeline:
+    def __init__(self, tiers):
+        self.tiers = list(tiers)
+
+    def answer(self, text: str):
+        """Return ``(answer, tier_name)``, or ``(None, None)`` when no tier produced anything."""
+        answer, tier, _ = self.resolve(text)
+        return answer, tier
+
+    def resolve(self, text: str):
+        """Like ``answer`` but returns ``(answer, tier_name, confident)``.
+
+        ``confident`` is False for a below-threshold fallback, e.g. while the
+        model tier is warming up or its queue is full; such answers should
+        not be cached.
+        """
+        best = None
+        for tier in self.tiers:
+            result = tier.run(text)
+            if not result or not result[0]:
+                continue
+            answer, confidence = result
+            if confidence >= tier.threshold:
+                tier.count("hits")
+                return answer, tier.name, True
+            if best is None or confidence > best[1]:
+                best = (answer, confidence, tier)
+        if best is not None:
+            best[2].count("fallbacks")
+            return best[0], best[2].name, False
+        return None, None, False
+
+    def stats(self) -> dict:
+        return {tier.name: tier.stats() for tier in self.tiers}
@@ -1,10 +1,15 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, session
+from flask import Blueprint, render_template, request, jsonify, current_app, session, Response
 from flask_login import login_required, current_user
 from datetime import datetime
+import json
 import logging
 import os
-from typing import List, Dict, Optional
+import activity_stats
+from chat_store import get_chat_store
+from conversation_memory import ConversationMemory
+from chat_retrieval import retrieve
 from gemini_client import GeminiChat
+from rate_limit import chat_rate_limited
 
 # System prompt for CatanduanesConnect context
 SYSTEM_PROMPT = """You are an AI assistant for CatanduanesConnect, a platform connecting job seekers, businesses, 
@@ -41,7 +46,10 @@ try:
 except Exception as e:
     logger.error(f"Failed to initialize Gemini chat client: {str(e)}", exc_info=True)
     chatbot = None
-from models.search_methods import JobOffer, ServiceRequest, Business
+
+# Summary of older turns + the latest turns, instead of the whole history
+memory = ConversationMemory(chatbot.summarize) if chatbot else None
+
 from database import get_neo4j_driver
 
 # Set up logging
@@ -52,60 +60,49 @@ ERROR_PROCESSING = 'error_processing'
 ERROR_EMPTY_INPUT = 'error_empty_input'
 ERROR_UNAUTHORIZED = 'error_unauthorized'
 
+# Include the retrieval trace in chat responses
+CHAT_TRACE = os.getenv('CHAT_TRACE', '').lower() in ('1', 'true', 'yes')
+
 bp = Blueprint('chatbot', __name__)
 
-def get_relevant_data(query: str) -> Optional[str]:
-    """
-    Retrieve relevant data from Neo4j based on user query.
-    Returns formatted context string or None if no relevant data found.
+def _conversation_id(create: bool = True):
+    """The session's conversation id, starting a conversation when needed.
+
+    Only this id lives in the cookie; the messages are in ``chat_store``.
     """
-    try:
-        context_parts = []
-        
-        # Search for relevant jobs
-        jobs = JobOffer.search_by_keywords(query)
-        if jobs:
-            context_parts.append("Relevant Jobs:")
-            for job in jobs[:3]:  # Limit to top 3 matches
-                context_parts.append(f"- {job.title} at {job.company_name}")
-                context_parts.append(f"  Location: {job.location}")
-                context_parts.append(f"  Salary: ₱{job.salary}")
-                context_parts.append(f"  Description: {job.description[:200]}...")
-                
-        # Search for relevant services
-        services = ServiceRequest.search_by_keywords(query)
-        if services:
-            context_parts.append("\nRelevant Services:")
-            for service in services[:3]:
-                context_parts.append(f"- {service.title}")
-                context_parts.append(f"  Location: {service.location}")
-                context_parts.append(f"  Payment: ₱{service.payment_offer}")
-                context_parts.append(f"  Description: {service.description[:200]}...")
-                
-        # Search for relevant businesses
-        businesses = Business.search_by_keywords(query)
-        if businesses:
-            context_parts.append("\nRelevant Businesses:")
-            for business in businesses[:3]:
-                context_parts.append(f"- {business.name}")
-                context_parts.append(f"  Location: {business.location}")
-                context_parts.append(f"  Category: {business.category}")
-                if business.description:
-                    context_parts.append(f"  Description: {business.description[:200]}...")
-                    
-        return "\n".join(context_parts) if context_parts else None
-        
-    except Exception as e:
-        logger.error(f"Error retrieving relevant data: {str(e)}")
+    store = get_chat_store()
+    # Drop history left in cookies by older versions
+    session.pop('chat_history', None)
+    user_id = current_user.id if current_user.is_authenticated else None
+
+    conversation = store.get_conversation(session.get('conversation_id'))
+    if conversation and conversation['user_id'] not in (None, user_id):
+        # Someone else's conversation (e.g. shared browser after logout)
+        conversation = None
+    if conversation:
+        if user_id and conversation['user_id'] is None:
+            store.claim(conversation['id'], user_id)
+        return conversation['id']
+    if not create:
         return None
+    session['conversation_id'] = store.create_conversation(user_id)
+    return session['conversation_id']
+
+
+def _format_reply(text: str) -> str:
+    return text.strip().replace("**", "").replace("*", "• ")
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @bp.route('/chat')
 def chat():
     """Render the chat interface."""
     return render_template('chatbot/chat.html')
 
 @bp.route('/api/chat', methods=['POST'])
+@chat_rate_limited
 def chat_api():
     """
     Handle chat API requests.
@@ -131,11 +128,7 @@ def chat_api():
                 'message': 'Message cannot be empty'
             }), 400
 
-        # Get chat history from session
-        chat_history = session.get('chat_history', [])
-
-        # Get relevant context from database
-        context = get_relevant_data(user_message)
+        conversation_id = _conversation_id()
 
         # Check if Gemini is initialized
         if chatbot is None:
@@ -145,9 +138,15 @@ def chat_api():
                 'message': 'Chatbot service is not available'
             }), 503
 
+        # The one retrieval pass for this message
+        retrieval = retrieve(user_message)
+
         try:
+            # Summary of earlier turns plus the most recent ones
+            chat_history = memory.history(conversation_id)
+
             # Format the context
-            formatted_context = context if context else "No specific context available."
+            formatted_context = retrieval.context or "No specific context available."
             
             # Send the message with context and get response
             response = chatbot.send_message(
@@ -157,8 +156,7 @@ def chat_api():
             )
 
             # Format response
-            formatted_response = response.strip()
-            formatted_response = formatted_response.replace("**", "").replace("*", "• ")
+            formatted_response = _format_reply(response)
 
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
@@ -168,22 +166,24 @@ def chat_api():
                 'message': 'Error while generating response'
             }), 500
 
-        # Update chat history in session
-        chat_history.append({"role": "user", "content": user_message})
-        chat_history.append({"role": "assistant", "content": formatted_response})
-
-        # Keep only the last 10 messages
-        if len(chat_history) > 10:
-            chat_history = chat_history[-10:]
-
-        session['chat_history'] = chat_history
+        # Save the exchange
+        get_chat_store().append(
+            conversation_id,
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": formatted_response}
+        )
+        memory.maybe_compact(conversation_id)
+        activity_stats.record('chat_messages')
 
         # Return successful response
-        return jsonify({
+        result = {
             'status': 'success',
             'message': formatted_response,
             'timestamp': datetime.utcnow().isoformat()
-        })
+        }
+        if CHAT_TRACE:
+            result['trace'] = retrieval.trace
+        return jsonify(result)
 
     except Exception as e:
         logger.error(f"Error in chat API: {str(e)}")
@@ -194,15 +194,101 @@ def chat_api():
         }), 500
 
 
+@bp.route('/api/chat/stream', methods=['POST'])
+@chat_rate_limited
+def chat_stream():
+    """
+    Stream a chat reply as server-sent events.
+
+    Expects JSON: {"message": "user message"}. Emits ``chunk`` events with
+    ``{"text": ...}`` as Gemini produces them, then one ``done`` event with the
+    full formatted reply (or an ``error`` event). If the client disconnects,
+    the upstream Gemini stream is cancelled.
+    """
+    data = request.get_json(silent=True)
+    user_message = (data or {}).get('message', '').strip() if isinstance(data, dict) else ''
+    if not user_message:
+        return jsonify({
+            'status': 'error',
+            'error': ERROR_EMPTY_INPUT,
+            'message': 'Message cannot be empty'
+        }), 400
+
+    if chatbot is None:
+        return jsonify({
+            'status': 'error',
+            'error': ERROR_PROCESSING,
+            'message': 'Chatbot service is not available'
+        }), 503
+
+    conversation_id = _conversation_id()
+    chat_history = memory.history(conversation_id)
+    retrieval = retrieve(user_message)
+    chunks = chatbot.stream_message(
+        message=user_message,
+        context=retrieval.context or "No specific context available.",
+        history=chat_history
+    )
+
+    def events():
+        parts = []
+        finished = False
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield _sse('chunk', {'text': chunk})
+            reply = _format_reply(''.join(parts))
+            # Written from the generator: the session cookie is long gone, but
+            # the conversation id is all we need
+            get_chat_store().append(
+                conversation_id,
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": reply}
+            )
+            memory.maybe_compact(conversation_id)
+            activity_stats.record('chat_messages')
+            finished = True
+            done = {'message': reply, 'timestamp': datetime.utcnow().isoformat()}
+            if CHAT_TRACE:
+                done['trace'] = retrieval.trace
+            yield _sse('done', done)
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            yield _sse('error', {'error': ERROR_PROCESSING, 'message': 'Error while generating response'})
+        finally:
+            if not finished:
+                logger.info(f"Chat stream ended early after {len(parts)} chunks")
+            # Cancels the upstream request when the client went away mid-stream
+            chunks.close()
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @bp.route('/api/chat/history', methods=['GET'])
 @login_required
 def get_chat_history():
-    """Get the current user's chat history."""
+    """
+    Get the current conversation's history, newest page first.
+
+    Query params: ``limit`` (default 20, max 100) and ``before`` (the
+    ``next_before`` cursor from the previous page) to load older messages.
+    """
     try:
-        chat_history = session.get('chat_history', [])
+        conversation_id = _conversation_id(create=False)
+        if conversation_id is None:
+            return jsonify({'status': 'success', 'history': [], 'next_before': None})
+        messages, next_before = get_chat_store().get_messages(
+            conversation_id,
+            limit=request.args.get('limit', 20, type=int),
+            before=request.args.get('before', type=int)
+        )
         return jsonify({
             'status': 'success',
-            'history': chat_history
+            'history': messages,
+            'next_before': next_before
         })
     except Exception as e:
         logger.error(f"Error retrieving chat history: {str(e)}")
@@ -217,7 +303,9 @@ def get_chat_history():
 def clear_chat_history():
     """Clear the current user's chat history."""
     try:
-        session['chat_history'] = []
+        conversation_id = _conversation_id(create=False)
+        if conversation_id:
+            get_chat_store().clear(conversation_id)
         return jsonify({
             'status': 'success',
             'message': 'Chat history cleared'
@@ -0,0 +1,120 @@
+"""
+Rolling summaries that keep chat prompts bounded.
+
+Every turn used to resend the last ``MAX_HISTORY`` messages in full, so the
+prompt grew with the conversation. Here a conversation's history is a
+compact summary plus the messages that came after it. Once those messages
+go over ``SUMMARY_THRESHOLD`` tokens, everything except the last
+``KEEP_TURNS`` turns is folded into the summary in a background thread. The
+reply is not held up, and if summarizing fails it is tried again on the next
+turn.
+
+The summary lives on the conversation in ``chat_store`` (``summary`` and
+``summary_upto``, the last message id it covers), so it survives restarts
+and is shared by all workers.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from chat_store import get_chat_store
+from prompt_builder import ApproxTokenizer
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_THRESHOLD = int(os.getenv("CHAT_SUMMARY_THRESHOLD", 1200))
+KEEP_TURNS = int(os.getenv("CHAT_SUMMARY_KEEP_TURNS", 3))
+# Hard cap on unsummarized messages read per turn, in case summaries keep failing
+MAX_UNSUMMARIZED = 40
+
+SUMMARY_PREFIX = "Summary of the conversation so far: "
+
+
+class ConversationMemory:
+    def __init__(self, summarize, store=None, tokenizer=None, threshold: int = SUMMARY_THRESHOLD,
+                 keep_turns: int = KEEP_TURNS, executor=None):
+        """
+        Args:
+            summarize: ``summarize(messages, previous_summary) -> str or None``
+            store: a ``ChatStore``; defaults to the process-wide one
+            tokenizer: anything with ``encode(text)``; defaults to ``ApproxTokenizer``
+            executor: where compaction runs; defaults to one background thread
+        """
+        self.summarize = summarize
+        self.store = store or get_chat_store()
+        self.tokenizer = tokenizer or ApproxTokenizer()
+        self.threshold = threshold
+        self.keep_messages = keep_turns * 2
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-summary')
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stats = {'compactions': 0, 'failures': 0, 'tokens_saved_per_turn': 0}
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
+
+    def history(self, conversation_id: str):
+        """The history to send with the next message: the summary, then the newer messages."""
+        summary, upto = self.store.get_summary(conversation_id)
+        messages = self.store.messages_after(conversation_id, upto, limit=MAX_UNSUMMARIZED)
+        history = [{'role': m['role'], 'content': m['content']} for m in messages]
+        if summary:
+            history.insert(0, {'role': 'user', 'content': SUMMARY_PREFIX + summary})
+        return history
+
+    def maybe_compact(self, conversation_id: str):
+        """Schedule a compaction if the unsummarized messages are over the threshold."""
+        _, upto = self.store.get_summary(conversation_id)
+        messages = self.store.messages_after(conversation_id, upto, limit=MAX_UNSUMMARIZED)
+        if len(messages) <= self.keep_messages:
+            return None
+        if sum(self.count(m['content']) for m in messages) <= self.threshold:
+            return None
+        with self._lock:
+            if conversation_id in self._pending:
+                return None
+            self._pending.add(conversation_id)
+        return self.executor.submit(self._compact, conversation_id)
+
+    def compact(self, conversation_id: str) -> bool:
+        """Fold all but the last ``KEEP_TURNS`` turns into the summary. Returns True on success."""
+        summary, upto = self.store.get_summary(conversation_id)
+        messages = self.store.messages_after(conversation_id, upto, limit=MAX_UNSUMMARIZED)
+        older = messages[:-self.keep_messages] if self.keep_messages else messages
+        if not older:
+            return False
+
+        new_summary = self.summarize(older, summary)
+        if not new_summary:
+            with self._lock:
+                self._stats['failures'] += 1
+            return False
+        self.store.set_summary(conversation_id, new_summary, older[-1]['id'])
+
+        # Tokens no longer resent on every turn from now on
+        before = self.count(SUMMARY_PREFIX + summary if summary else '') + \
+            sum(self.count(m['content']) for m in older)
+        after = self.count(SUMMARY_PREFIX + new_summary)
+        saved = before - after
+        with self._lock:
+            self._stats['compactions'] += 1
+            self._stats['tokens_saved_per_turn'] += saved
+        logger.info(f"Compacted conversation {conversation_id}: {len(older)} messages, "
+                    f"{before} -> {after} tokens ({saved} saved per turn)")
+        return True
+
+    def _compact(self, conversation_id: str):
+        try:
+            return self.compact(conversation_id)
+        except Exception as e:
+            logger.error(f"Error compacting conversation {conversation_id}: {str(e)}")
+            return False
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
@@ -170,7 +170,7 @@ def get_map_services():
                 MATCH (u:User {id: $user_id})
                 SET u.verification_status = 'pending_verification',
                     u.document_path = $document_path,
-                    u.updated_at = datetime()
+                    u.updated_at = timestamp()
                 RETURN u
             """, {
                 'user_id': current_user.id,
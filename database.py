@@ -4,6 +4,10 @@ import time
 from neo4j import GraphDatabase, exceptions as neo4j_exceptions
 from dotenv import load_dotenv
 
+from geo.gazetteer import location_condition, municipality_id_for
+from geo.listings import listing_saved
+from geo.points import position_cypher, nearby_params, bbox_predicate
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -73,19 +77,22 @@ def create_business(name: str, description: str, category: str, location: str, l
     """Create a new business node in Neo4j."""
     with get_neo4j_driver().session(database=DATABASE) as session:
         result = session.run(
-            """
-            CREATE (b:Business {
+            f"""
+            CREATE (b:Business {{
+                id: randomUUID(),
                 name: $name,
                 description: $description,
                 category: $category,
                 location: $location,
                 latitude: $latitude,
                 longitude: $longitude,
+                position: {position_cypher()},
+                municipality_id: $municipality_id,
                 email: $email,
                 phone: $phone,
                 website: $website,
                 created_at: datetime()
-            })
+            }})
             RETURN b
             """,
             name=name,
@@ -94,11 +101,15 @@ def create_business(name: str, description: str, category: str, location: str, l
             location=location,
             latitude=latitude,
             longitude=longitude,
+            municipality_id=municipality_id_for(location),
             email=email,
             phone=phone,
             website=website
         )
-        return result.single()
+        record = result.single()
+        if record:
+            listing_saved('business', record['b'])
+        return record
 
 def get_business(business_id: str):
     """Get a business by ID."""
@@ -124,8 +135,7 @@ def search_businesses(query: str = None, category: str = None, location: str = N
             params["category"] = category
 
         if location:
-            conditions.append("b.location = $location")
-            params["location"] = location
+            conditions.append(location_condition('b', location, params))
 
         where_clause = " AND ".join(conditions) if conditions else "true"
 
@@ -144,20 +154,17 @@ def search_businesses(query: str = None, category: str = None, location: str = N
 def get_nearby_businesses(latitude: float, longitude: float, radius: float = 5.0):
     """Get businesses within a radius (in km) of a point."""
     with get_neo4j_driver().session(database=DATABASE) as session:
-        # Haversine formula in Cypher
+        # Bounding box is served by the point index; exact distance only for the candidates
         result = session.run(
-            """
-          MATCH (b:Business)
-          WITH b, point({latitude: b.latitude, longitude: b.longitude}) AS p1, 
-                 point({latitude: $lat, longitude: $lng}) AS p2
-            WITH b, distance(p1, p2) / 1000 AS distance
+            f"""
+            MATCH (b:Business)
+            WHERE {bbox_predicate('b')}
+            WITH b, point.distance(b.position, point({{latitude: $lat, longitude: $lng}})) / 1000 AS distance
             WHERE distance <= $radius
             RETURN b, distance
             ORDER BY distance
             """,
-            lat=latitude,
-            lng=longitude,
-            radius=radius
+            **nearby_params(latitude, longitude, radius)
         )
         return [(record["b"], record["distance"]) for record in result]
 
@@ -166,20 +173,23 @@ def create_service_request(type: str, description: str, category: str, location:
     """Create a new service request."""
     with get_neo4j_driver().session(database=DATABASE) as session:
         result = session.run(
-            """
+            f"""
             MATCH (u:User) WHERE ID(u) = $user_id
-            CREATE (s:ServiceRequest {
+            CREATE (s:ServiceRequest {{
+                id: randomUUID(),
                 type: $type,
                 description: $description,
                 category: $category,
                 location: $location,
                 latitude: $latitude,
                 longitude: $longitude,
+                position: {position_cypher()},
+                municipality_id: $municipality_id,
                 payment: $payment,
                 skills_required: $skills_required,
                 status: 'open',
                 created_at: datetime()
-            })-[:POSTED_BY]->(u)
+            }})-[:POSTED_BY]->(u)
             RETURN s
             """,
             type=type,
@@ -188,11 +198,15 @@ def create_service_request(type: str, description: str, category: str, location:
             location=location,
             latitude=latitude,
             longitude=longitude,
+            municipality_id=municipality_id_for(location),
             payment=payment,
             user_id=int(user_id),
             skills_required=skills_required or []
         )
-        return result.single()
+        record = result.single()
+        if record:
+            listing_saved('service', record['s'])
+        return record
 
 def search_services(query: str = None, type: str = None, category: str = None, 
                    location: str = None, status: str = "open", limit: int = 10):
@@ -214,8 +228,7 @@ def search_services(query: str = None, type: str = None, category: str = None,
             params["category"] = category
 
         if location:
-            conditions.append("s.location = $location")
-            params["location"] = location
+            conditions.append(location_condition('s', location, params))
 
         where_clause = " AND ".join(conditions)
 
@@ -235,20 +248,16 @@ def get_nearby_services(latitude: float, longitude: float, radius: float = 5.0,
     """Get service requests within a radius (in km) of a point."""
     with get_neo4j_driver().session(database=DATABASE) as session:
         result = session.run(
-            """
-          MATCH (s:ServiceRequest)-[:POSTED_BY]->(u:User)
-          WHERE s.status = $status
-          WITH s, u, point({latitude: s.latitude, longitude: s.longitude}) AS p1, 
-                 point({latitude: $lat, longitude: $lng}) AS p2
-            WITH s, u, distance(p1, p2) / 1000 AS distance
+            f"""
+            MATCH (s:ServiceRequest)-[:POSTED_BY]->(u:User)
+            WHERE {bbox_predicate('s')} AND s.status = $status
+            WITH s, u, point.distance(s.position, point({{latitude: $lat, longitude: $lng}})) / 1000 AS distance
             WHERE distance <= $radius
             RETURN s, u, distance
             ORDER BY distance
             """,
-            lat=latitude,
-            lng=longitude,
-            radius=radius,
-            status=status
+            status=status,
+            **nearby_params(latitude, longitude, radius)
         )
         return [(record["s"], record["u"], record["distance"]) for record in result]
 
@@ -1,6 +1,7 @@
 import logging
 from models.business_service import Business
 from database import driver, DATABASE
+from geo.gazetteer import location_condition
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +29,7 @@ def search_jobs(query: str = None, category: str = None, location: str = None, l
                 params["category"] = category
                 
             if location:
-                conditions.append("j.location = $location")
-                params["location"] = location
+                conditions.append(location_condition('j', location, params))
                 
             where_clause = " AND ".join(conditions) if conditions else "TRUE"
             
@@ -63,8 +63,7 @@ def search_services(query: str = None, category: str = None, location: str = Non
                 params["category"] = category
                 
             if location:
-                conditions.append("s.location = $location")
-                params["location"] = location
+                conditions.append(location_condition('s', location, params))
                 
             where_clause = " AND ".join(conditions) if conditions else "TRUE"
             
@@ -0,0 +1,135 @@
+"""
+Local fake of the Gemini REST API, for tests and offline development.
+
+Serves ``generateContent`` and ``streamGenerateContent?alt=sse`` on
+``127.0.0.1``. By default it echoes the last user message. Tests can queue
+scripted responses to simulate rate limits, outages and slow replies:
+
+    with FakeGeminiServer() as server:
+        server.script(429, 503, 'hello')  # two failures, then a reply
+        transport = GeminiTransport('key', base_url=server.url)
+
+Run it standalone and point the app at it with ``GEMINI_BASE_URL``:
+
+    python fake_gemini.py --port 8765
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _payload(text: str) -> dict:
+    return {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # keep test output quiet
+        pass
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        fake.requests.append({'path': self.path, 'body': body, 'api_key': self.headers.get('x-goog-api-key')})
+
+        step = fake.next_step()
+        if step.get('delay', fake.delay):
+            time.sleep(step.get('delay', fake.delay))
+        if step.get('status', 200) >= 400:
+            self.send_response(step['status'])
+            if step.get('retry_after') is not None:
+                self.send_header('Retry-After', str(step['retry_after']))
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': {'code': step['status'], 'message': 'scripted failure'}}).encode())
+            return
+
+        text = step.get('text')
+        if text is None:
+            contents = body.get('contents') or [{}]
+            text = 'echo: ' + ''.join(p.get('text', '') for p in contents[-1].get('parts', []))
+
+        if ':streamGenerateContent' in self.path:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            words = text.split(' ')
+            try:
+                for i, word in enumerate(words):
+                    chunk = word + (' ' if i < len(words) - 1 else '')
+                    self.wfile.write(f"data: {json.dumps(_payload(chunk))}\r\n\r\n".encode())
+                    self.wfile.flush()
+                    if step.get('chunk_delay'):
+                        time.sleep(step['chunk_delay'])
+            except (BrokenPipeError, ConnectionResetError):
+                fake.cancelled += 1
+            return
+
+        data = json.dumps(_payload(text)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeGeminiServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.requests = []
+        self.cancelled = 0
+        # Seconds every unscripted reply waits, to model API latency
+        self.delay = delay
+        self._steps = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def script(self, *steps):
+        """Queue responses: an int status, a reply string, or a dict with
+        ``status``, ``text``, ``delay``, ``chunk_delay`` and ``retry_after``."""
+        with self._lock:
+            for step in steps:
+                if isinstance(step, int):
+                    step = {'status': step}
+                elif isinstance(step, str):
+                    step = {'text': step}
+                self._steps.append(step)
+
+    def next_step(self) -> dict:
+        with self._lock:
+            return self._steps.popleft() if self._steps else {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a fake Gemini REST API.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before each reply')
+    args = parser.parse_args()
+    server = FakeGeminiServer(port=args.port, delay=args.delay)
+    print(f"Fake Gemini listening on {server.url} (set GEMINI_BASE_URL to use it)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
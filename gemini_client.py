@@ -1,12 +1,12 @@
 import os
 import logging
-import re
-import time
 from typing import List, Dict, Optional, Any, Iterator
 from datetime import datetime
-import google.generativeai as genai
-from google.api_core import retry
-from database_queries import search_businesses, search_jobs, search_services
+from gemini_transport import (
+    GeminiError, GeminiRateLimited, GeminiUnavailable, get_transport,
+)
+from prompt_builder import PromptBuilder
+from response_cache import ResponseCache, context_version
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
@@ -15,10 +15,40 @@ load_dotenv()
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Rate limiting settings
-MAX_RETRIES = 3
-INITIAL_RETRY_DELAY = 1.0
-MAX_RETRY_DELAY = 60.0
+# Approximate token budget for system context + history + message
+PROMPT_BUDGET = int(os.getenv("GEMINI_PROMPT_BUDGET", 6000))
+_prompt_builder = PromptBuilder.approximate(PROMPT_BUDGET)
+
+# Replies to repeated questions, keyed by the retrieved context they were built from
+response_cache = ResponseCache()
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "candidateCount": 1,
+    "maxOutputTokens": 2048,
+    "topP": 0.95,
+    "topK": 40,
+}
+
+# Rolling summaries of long conversations (see conversation_memory)
+SUMMARY_CONFIG = {
+    "temperature": 0.2,
+    "candidateCount": 1,
+    "maxOutputTokens": int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", 300)),
+}
+
+SUMMARY_TEMPLATE = """Summarize this conversation between a user and the CatanduanesConnect assistant
+so it can continue without the full transcript. Keep what the user is looking for (jobs, businesses,
+services), places, names, preferences and any answers they still rely on. Write at most {words} words
+of plain notes, no greetings.
+
+{previous}Conversation:
+{transcript}"""
+
+# Replies shown to the user when Gemini can't answer
+BUSY_REPLY = "I apologize, but I'm currently experiencing heavy traffic. Please try again in a minute."
+UNAVAILABLE_REPLY = "I apologize, but the assistant is temporarily unavailable. Please try again in a few minutes."
+ERROR_REPLY = "I apologize, but I encountered an error processing your request. Please try again later."
 
 SYSTEM_TEMPLATE = """You are a helpful AI assistant for CatanduanesConnect, a platform connecting job seekers, 
 businesses, and service providers in Catanduanes. Your role is to help users find jobs, businesses, and services, 
@@ -34,12 +64,13 @@ For any other questions, provide helpful general information about Catanduanes o
 class GeminiChat:
     """Client for interacting with Google's Gemini API."""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, base_url: str = None):
         """
         Initialize the Gemini client.
         
         Args:
             api_key: Google Gemini API key. If None, will try to get from environment.
+            base_url: API endpoint; defaults to GEMINI_BASE_URL or Google's (see fake_gemini for tests)
         """
         if api_key is None:
             api_key = os.getenv("GEMINI_API_KEY")
@@ -52,7 +83,8 @@ class GeminiChat:
             # Initialize the Gemini client
             logger.debug("Initializing Gemini client...")
             
-            genai.configure(api_key=api_key)
+            # Shared per process: pooled connections, breaker and concurrency cap
+            self.transport = get_transport(api_key, base_url)
             self.model = "models/gemini-pro-latest"
             
             logger.info("Successfully initialized Gemini client")
@@ -61,49 +93,48 @@ class GeminiChat:
             logger.error(f"Failed to initialize Gemini client: {str(e)}")
             raise
             
-    def extract_search_params(self, message: str) -> Dict[str, str]:
-        """Extract search parameters from the user's message."""
-        params = {}
-        
-        # Look for category in the message
-        category_patterns = [
-            r"category[:\s]+(\w+)",
-            r"in the (\w+) category",
-            r"related to (\w+)",
-            r"about (\w+)"
-        ]
-        for pattern in category_patterns:
-            match = re.search(pattern, message.lower())
-            if match:
-                params["category"] = match.group(1)
-                break
+    def _build_parts(
+        self,
+        message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        context: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Build the Gemini chat parts (system context, history, message) within
+        PROMPT_BUDGET tokens: the oldest history goes first, then the context.
+        """
+        prompt = _prompt_builder.build(
+            message,
+            system=SYSTEM_TEMPLATE + "\n" if context else '',
+            context=context or '',
+            history=history or [],
+            system_format='{}', context_format='{}',
+            turn_format='{content}', question_format='{}'
+        )
 
-        # Look for location in the message
-        location_patterns = [
-            r"in\s+(\w+(?:\s+\w+)*(?:\s+City)?)",
-            r"at\s+(\w+(?:\s+\w+)*(?:\s+City)?)",
-            r"near\s+(\w+(?:\s+\w+)*(?:\s+City)?)",
-            r"around\s+(\w+(?:\s+\w+)*(?:\s+City)?)"
-        ]
-        for pattern in location_patterns:
-            match = re.search(pattern, message)
-            if match:
-                params["location"] = match.group(1)
-                break
-                
-        # Use the rest as a general search query
-        # Remove found category and location if any
-        query = message
-        if "category" in params:
-            query = re.sub(r"category[:\s]+" + params["category"], "", query, flags=re.IGNORECASE)
-        if "location" in params:
-            query = re.sub(r"in\s+" + params["location"], "", query, flags=re.IGNORECASE)
+        parts = []
         
-        query = query.strip()
-        if query and not all(word in ["show", "find", "get", "list", "me", "please", "can", "you", "tell", "about"] for word in query.lower().split()):
-            params["query"] = query
-            
-        return params
+        # Add system context if provided
+        if context:
+            parts.append({
+                "role": "user",
+                "parts": [{"text": prompt.system + prompt.context}]
+            })
+        
+        # Add message history
+        for msg in prompt.history:
+            role = "model" if msg["role"] == "assistant" else "user"
+            parts.append({
+                "role": role,
+                "parts": [{"text": msg["content"]}]
+            })
+        
+        # Add current message
+        parts.append({
+            "role": "user",
+            "parts": [{"text": prompt.question}]
+        })
+        return parts
 
     def send_message(
         self,
@@ -117,7 +148,8 @@ class GeminiChat:
         Args:
             message: The user's message
             history: Optional list of previous messages [{"role": "user|assistant", "content": "..."}]
-            context: Optional context string (e.g., relevant business/job data)
+            context: Optional context string. Listings come from the route's
+                single ``chat_retrieval.retrieve`` pass; no searching happens here.
             
         Returns:
             String containing the assistant's response
@@ -125,144 +157,60 @@ class GeminiChat:
         if not message or not message.strip():
             raise ValueError("Message cannot be empty")
             
-        # Check if the message is about jobs, businesses, or services
-        message_lower = message.lower()
-        search_params = self.extract_search_params(message)
-        
-        # Prepare database results if relevant
-        db_results = []
-        if any(word in message_lower for word in ["job", "work", "career", "position", "employment", "hiring"]):
-            db_results = search_jobs(**search_params)
-            if db_results:
-                context = f"Here are some relevant jobs I found in our database:\n\n" + \
-                         "\n\n".join([f"- {job.get('title', 'Untitled Position')}\n  " + \
-                                    f"Description: {job.get('description', 'No description available')}\n  " + \
-                                    f"Location: {job.get('location', 'Location not specified')}\n  " + \
-                                    f"Category: {job.get('category', 'Category not specified')}" 
-                                    for job in db_results])
-                         
-        elif any(word in message_lower for word in ["business", "company", "store", "shop"]):
-            db_results = search_businesses(**search_params)
-            if db_results:
-                context = f"Here are some relevant businesses I found in our database:\n\n" + \
-                         "\n\n".join([f"- {business.get('name', 'Unnamed Business')}\n  " + \
-                                    f"Description: {business.get('description', 'No description available')}\n  " + \
-                                    f"Location: {business.get('location', 'Location not specified')}\n  " + \
-                                    f"Category: {business.get('category', 'Category not specified')}" 
-                                    for business in db_results])
-                         
-        elif any(word in message_lower for word in ["service", "provider"]):
-            db_results = search_services(**search_params)
-            if db_results:
-                context = f"Here are some relevant services I found in our database:\n\n" + \
-                         "\n\n".join([f"- {service.get('name', 'Unnamed Service')}\n  " + \
-                                    f"Description: {service.get('description', 'No description available')}\n  " + \
-                                    f"Location: {service.get('location', 'Location not specified')}\n  " + \
-                                    f"Category: {service.get('category', 'Category not specified')}" 
-                                    for service in db_results])
-        
-        if db_results:
-            message = f"{message}\n\nPlease provide a helpful response based on the database results I've provided."
-            
+        version = context_version(context)
+        cached = response_cache.get(message, version)
+        if cached:
+            return cached
+
+        parts = self._build_parts(message, history, context)
         try:
-            # Build chat history as list of parts
-            parts = []
-            
-            # Add system context if provided
-            if context:
-                parts.append({
-                    "role": "user",
-                    "parts": [{"text": SYSTEM_TEMPLATE + "\n" + context}]
-                })
-            
-            # Add message history
-            if history:
-                for msg in history:
-                    role = "model" if msg["role"] == "assistant" else "user"
-                    parts.append({
-                        "role": role,
-                        "parts": [{"text": msg["content"]}]
-                    })
-            
-            # Add current message
-            parts.append({
-                "role": "user",
-                "parts": [{"text": message}]
+            text = self.transport.generate(self.model, {
+                "contents": parts,
+                "generationConfig": GENERATION_CONFIG,
             })
-            
-            # Get model response with retries
-            retry_count = 0
-            last_error = None
-            delay = INITIAL_RETRY_DELAY
-            
-            while retry_count < MAX_RETRIES:
-                try:
-                    model = genai.GenerativeModel(self.model)
-                    chat = model.start_chat(
-                        history=[
-                            {"role": part["role"], "parts": part["parts"]}
-                            for part in parts[:-1]
-                        ] if len(parts) > 1 else None)
-                    break
-                except Exception as e:
-                    if "429" in str(e):  # Rate limit error
-                        retry_count += 1
-                        if retry_count == MAX_RETRIES:
-                            logger.error(f"Max retries ({MAX_RETRIES}) exceeded for rate limit")
-                            return "I apologize, but I'm currently experiencing heavy traffic. Please try again in a minute."
-                        
-                        logger.warning(f"Rate limit hit, attempt {retry_count}/{MAX_RETRIES}. Waiting {delay}s")
-                        time.sleep(delay)
-                        delay = min(delay * 2, MAX_RETRY_DELAY)  # Exponential backoff
-                        last_error = e
-                        continue
-                    else:
-                        logger.error(f"Error creating chat: {str(e)}")
-                        raise
-            
-            # Send message with retries
-            retry_count = 0
-            delay = INITIAL_RETRY_DELAY
-            
-            while retry_count < MAX_RETRIES:
-                try:
-                    response = chat.send_message(
-                        parts[-1]["parts"][0]["text"],
-                        generation_config=genai.types.GenerationConfig(
-                            temperature=0.7,
-                            candidate_count=1,
-                            max_output_tokens=2048,
-                            top_p=0.95,
-                            top_k=40,
-                        )
-                    )
-                    
-                    # Extract and clean response
-                    if not response.text:
-                        raise ValueError("No response generated")
-                        
-                    text = response.text.strip()
-                    return text
-                    
-                except Exception as e:
-                    if "429" in str(e):  # Rate limit error
-                        retry_count += 1
-                        if retry_count == MAX_RETRIES:
-                            logger.error(f"Max retries ({MAX_RETRIES}) exceeded for rate limit")
-                            return "I apologize, but I'm currently experiencing heavy traffic. Please try again in a minute."
-                        
-                        logger.warning(f"Rate limit hit, attempt {retry_count}/{MAX_RETRIES}. Waiting {delay}s")
-                        time.sleep(delay)
-                        delay = min(delay * 2, MAX_RETRY_DELAY)  # Exponential backoff
-                        continue
-                    else:
-                        logger.error(f"Error sending message: {str(e)}")
-                        return "I apologize, but I encountered an error processing your request. Please try again later."
-            
+            if not text:
+                raise GeminiError("No response generated")
+            response_cache.set(message, text.strip(), version)
+            return text.strip()
+        except GeminiRateLimited:
+            logger.error("Gemini rate limit persisted until the deadline")
+            return BUSY_REPLY
+        except GeminiUnavailable as e:
+            logger.error(f"Gemini unavailable: {str(e)}")
+            return UNAVAILABLE_REPLY
+        except GeminiError as e:
+            logger.error(f"Error sending message: {str(e)}")
+            return ERROR_REPLY
         except Exception as e:
             logger.error(f"Error processing message with Gemini: {str(e)}")
             return "I apologize, but I encountered an unexpected error. Please try again later."
             
+    def summarize(
+        self,
+        messages: List[Dict[str, str]],
+        previous_summary: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Fold ``messages`` (and the summary of what came before them) into one
+        short summary. Returns None if Gemini could not produce one.
+        """
+        transcript = "\n".join(
+            f"{'Assistant' if m['role'] == 'assistant' else 'User'}: {m['content']}" for m in messages
+        )
+        previous = f"Summary so far:\n{previous_summary}\n\n" if previous_summary else ""
+        prompt = SUMMARY_TEMPLATE.format(
+            words=SUMMARY_CONFIG["maxOutputTokens"] * 3 // 4, previous=previous, transcript=transcript
+        )
+        try:
+            text = self.transport.generate(self.model, {
+                "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                "generationConfig": SUMMARY_CONFIG,
+            })
+        except GeminiError as e:
+            logger.warning(f"Could not summarize conversation: {str(e)}")
+            return None
+        return text.strip() or None
+
     def stream_message(
         self,
         message: str,
@@ -283,61 +231,41 @@ class GeminiChat:
         if not message or not message.strip():
             raise ValueError("Message cannot be empty")
             
+        version = context_version(context)
+        cached = response_cache.get(message, version)
+        if cached:
+            yield cached
+            return
+
+        parts = self._build_parts(message, history, context)
+        chunks = None
         try:
-            # Build chat history as list of parts
-            parts = []
-            
-            # Add system context if provided
-            if context:
-                parts.append({
-                    "role": "user",
-                    "parts": [{"text": SYSTEM_TEMPLATE + "\n" + context}]
-                })
-            
-            # Add message history
-            if history:
-                for msg in history:
-                    role = "model" if msg["role"] == "assistant" else "user"
-                    parts.append({
-                        "role": role,
-                        "parts": [{"text": msg["content"]}]
-                    })
-            
-            # Add current message
-            parts.append({
-                "role": "user",
-                "parts": [{"text": message}]
+            chunks = self.transport.stream(self.model, {
+                "contents": parts,
+                "generationConfig": GENERATION_CONFIG,
             })
-            
-            # Get model response stream
-            model = genai.GenerativeModel(self.model)
-            chat = model.start_chat(
-                history=[
-                    {"role": part["role"], "parts": part["parts"]}
-                    for part in parts[:-1]
-                ] if len(parts) > 1 else None
-            )
-            
-            response_stream = chat.send_message(
-                parts[-1]["parts"][0]["text"],
-                stream=True,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    candidate_count=1,
-                    max_output_tokens=2048,
-                    top_p=0.95,
-                    top_k=40,
-                )
-            )
-            
-            # Yield chunks as they arrive
-            for chunk in response_stream:
-                if chunk.text:
-                    yield chunk.text
-            
+            # Yield chunks as they arrive. If the consumer stops early (client
+            # disconnected), close() raises GeneratorExit here and the finally
+            # block closes the HTTP response, ending the upstream generation.
+            received = []
+            for chunk in chunks:
+                received.append(chunk)
+                yield chunk
+            # Only complete replies are cached
+            response_cache.set(message, ''.join(received).strip(), version)
+        except GeneratorExit:
+            raise
+        except GeminiRateLimited:
+            yield BUSY_REPLY
+        except GeminiUnavailable as e:
+            logger.error(f"Gemini unavailable: {str(e)}")
+            yield UNAVAILABLE_REPLY
         except Exception as e:
             logger.error(f"Error streaming message with Gemini: {str(e)}")
             yield "I apologize, but I'm having trouble processing your message. Please try again."
+        finally:
+            if chunks is not None:
+                chunks.close()
 
 
 # Global instance for easy access
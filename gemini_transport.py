@@ -0,0 +1,269 @@
+"""
+Pooled HTTP transport for the Gemini REST API.
+
+``GeminiChat`` used to build a new ``genai.GenerativeModel`` and chat for
+every message and retry 429s with ``time.sleep`` backoff of up to 60 s,
+holding one of the four gunicorn threads. This transport is shared by all
+requests in the process and provides:
+
+- a pooled ``requests.Session`` (keep-alive connections to the API)
+- a per-request deadline. Every attempt, and every backoff sleep, fits in
+  whatever time is left
+- full-jitter exponential backoff on 429/5xx/connection errors, honouring
+  ``Retry-After`` when it fits the deadline
+- a circuit breaker. After ``failure_threshold`` consecutive failures calls
+  fail fast for ``reset_timeout`` seconds, then a single trial call decides
+  whether to close it again
+- a semaphore capping concurrent calls to Gemini
+
+Errors are classified by HTTP status, not by matching text in exceptions.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+API_VERSION = "v1beta"
+
+DEADLINE = float(os.getenv("GEMINI_DEADLINE", 30))
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 4))
+FAILURE_THRESHOLD = int(os.getenv("GEMINI_BREAKER_FAILURES", 5))
+RESET_TIMEOUT = float(os.getenv("GEMINI_BREAKER_RESET", 30))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+CONNECT_TIMEOUT = 5.0
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    """Base class for transport errors."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class GeminiRateLimited(GeminiError):
+    """Gemini kept answering 429 until the deadline."""
+
+
+class GeminiDeadlineExceeded(GeminiError):
+    """The request's deadline passed."""
+
+
+class GeminiUnavailable(GeminiError):
+    """The circuit is open or every concurrency slot stayed busy."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed."""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go out now. In half-open state only one trial call is allowed."""
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Gemini circuit opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self._trial_in_flight = False
+
+
+class GeminiTransport:
+    def __init__(self, api_key: str, base_url: str = None, max_concurrency: int = MAX_CONCURRENCY,
+                 deadline: float = DEADLINE, breaker: CircuitBreaker = None):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv("GEMINI_BASE_URL") or DEFAULT_BASE_URL).rstrip('/')
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json', 'x-goog-api-key': api_key})
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def generate(self, model: str, body: dict, deadline: float = None) -> str:
+        """Call ``generateContent`` and return the reply text."""
+        expires = time.monotonic() + (deadline or self.deadline)
+        response = self._call(model, 'generateContent', body, expires)
+        try:
+            return _response_text(response.json())
+        finally:
+            response.close()
+
+    def stream(self, model: str, body: dict, deadline: float = None):
+        """Call ``streamGenerateContent`` and yield text chunks as they arrive.
+
+        Retries happen only before the first chunk. Closing the generator
+        closes the HTTP response, which ends the upstream generation.
+        """
+        expires = time.monotonic() + (deadline or self.deadline)
+        response = self._call(model, 'streamGenerateContent', body, expires, params={'alt': 'sse'}, stream=True)
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if time.monotonic() > expires:
+                    raise GeminiDeadlineExceeded("Gemini stream exceeded its deadline")
+                if not line or not line.startswith('data:'):
+                    continue
+                text = _response_text(json.loads(line[5:].strip()))
+                if text:
+                    yield text
+        finally:
+            response.close()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _call(self, model, method, body, expires, params=None, stream=False):
+        if not self.breaker.allow():
+            raise GeminiUnavailable("Gemini circuit is open")
+        if not self._slots.acquire(timeout=max(0.0, expires - time.monotonic())):
+            raise GeminiUnavailable("No free Gemini slot before the deadline")
+        try:
+            response = self._attempts(model, method, body, expires, params, stream)
+        except GeminiError as e:
+            # 4xx other than 429 are our own fault, not a sign Gemini is degraded
+            if e.status is None or e.status in RETRYABLE_STATUSES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._slots.release()
+            raise
+        self.breaker.record_success()
+        if not stream:
+            self._slots.release()
+            return response
+        return _ReleasingResponse(response, self._slots)
+
+    def _attempts(self, model, method, body, expires, params, stream):
+        url = f"{self.base_url}/{API_VERSION}/{model if model.startswith('models/') else 'models/' + model}:{method}"
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                raise GeminiDeadlineExceeded(f"Gemini {method} exceeded its deadline")
+            status = None
+            retry_after = None
+            try:
+                response = self.session.post(url, json=body, params=params, stream=stream,
+                                             timeout=(min(CONNECT_TIMEOUT, remaining), remaining))
+                if response.status_code < 400:
+                    return response
+                status = response.status_code
+                retry_after = _retry_after(response)
+                detail = response.text[:200]
+                response.close()
+                if status not in RETRYABLE_STATUSES:
+                    raise GeminiError(f"Gemini {method} failed with {status}: {detail}", status)
+                error = (GeminiRateLimited if status == 429 else GeminiError)(
+                    f"Gemini {method} failed with {status}", status)
+            except requests.Timeout:
+                raise GeminiDeadlineExceeded(f"Gemini {method} timed out")
+            except requests.RequestException as e:
+                error = GeminiError(f"Gemini {method} connection error: {str(e)}")
+
+            attempt += 1
+            # Full jitter, never sleeping past the deadline
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            remaining = expires - time.monotonic()
+            if delay >= remaining:
+                raise error
+            logger.warning(f"{error}; retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+class _ReleasingResponse:
+    """Streaming response that frees its concurrency slot once closed."""
+
+    def __init__(self, response, slots):
+        self._response = response
+        self._slots = slots
+        self._released = False
+
+    def iter_lines(self, **kwargs):
+        return self._response.iter_lines(**kwargs)
+
+    def close(self):
+        try:
+            self._response.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._slots.release()
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _response_text(payload: dict) -> str:
+    """Concatenate the text parts of the first candidate."""
+    for candidate in payload.get('candidates') or []:
+        parts = (candidate.get('content') or {}).get('parts') or []
+        return ''.join(part.get('text', '') for part in parts)
+    return ''
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(api_key: str, base_url: str = None) -> GeminiTransport:
+    """Process-wide transport per API key and endpoint, so connections and the breaker are shared."""
+    key = (api_key, base_url or os.getenv("GEMINI_BASE_URL") or DEFAULT_BASE_URL)
+    with _transports_lock:
+        if key not in _transports:
+            _transports[key] = GeminiTransport(api_key, base_url=key[1])
+        return _transports[key]
@@ -0,0 +1 @@
+"""Geospatial helpers shared by the listing models, map APIs and scripts."""
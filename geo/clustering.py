@@ -0,0 +1,69 @@
+"""
+Server-side marker clustering for the map endpoints.
+
+Points inside the requested viewport are projected to Web Mercator pixels at
+the requested zoom and bucketed into a fixed ``CLUSTER_RADIUS_PX`` grid. The
+grid is anchored to the world, not the viewport, so a cluster keeps its
+identity while the user pans. Buckets holding a single listing are returned
+as plain points; the rest become one cluster with a count and centroid.
+"""
+
+import os
+
+import numpy as np
+
+from geo.mercator import MAX_ZOOM, TILE_SIZE, project
+
+CLUSTER_RADIUS_PX = int(os.getenv('MAP_CLUSTER_RADIUS_PX', 60))
+# From this zoom on every listing is returned as its own point
+CLUSTER_MAX_ZOOM = int(os.getenv('MAP_CLUSTER_MAX_ZOOM', 16))
+
+
+def cluster_points(records, lats, lngs, zoom: int, radius_px: int = CLUSTER_RADIUS_PX,
+                   to_point=lambda record: record):
+    """Group records into clusters for ``zoom``.
+
+    ``records``, ``lats`` and ``lngs`` are parallel (see ``SpatialIndex.bbox_arrays``).
+    Returns a list of items: either ``to_point(record)`` or a cluster dict with
+    ``cluster: True``, ``count``, centroid ``latitude``/``longitude``, the members'
+    ``bbox`` and the ``expansion_zoom`` at which it splits.
+    """
+    if len(records) == 0:
+        return []
+    if zoom >= CLUSTER_MAX_ZOOM:
+        return [to_point(record) for record in records]
+
+    x, y = project(lats, lngs, zoom)
+    cell_x = np.floor(x / radius_px).astype(np.int64)
+    cell_y = np.floor(y / radius_px).astype(np.int64)
+    cells = cell_y * (TILE_SIZE * 2 ** zoom // radius_px + 1) + cell_x
+    unique, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+
+    sum_lat = np.bincount(inverse, weights=lats, minlength=len(unique))
+    sum_lng = np.bincount(inverse, weights=lngs, minlength=len(unique))
+    min_lat = np.full(len(unique), np.inf)
+    max_lat = np.full(len(unique), -np.inf)
+    min_lng = np.full(len(unique), np.inf)
+    max_lng = np.full(len(unique), -np.inf)
+    np.minimum.at(min_lat, inverse, lats)
+    np.maximum.at(max_lat, inverse, lats)
+    np.minimum.at(min_lng, inverse, lngs)
+    np.maximum.at(max_lng, inverse, lngs)
+
+    items = []
+    singles = np.nonzero(counts[inverse] == 1)[0]
+    for i in singles:
+        items.append(to_point(records[i]))
+    expansion_zoom = min(zoom + 2, CLUSTER_MAX_ZOOM, MAX_ZOOM)
+    for c in np.nonzero(counts > 1)[0]:
+        count = int(counts[c])
+        items.append({
+            'cluster': True,
+            'id': f'cluster-{zoom}-{int(unique[c])}',
+            'count': count,
+            'latitude': float(sum_lat[c] / count),
+            'longitude': float(sum_lng[c] / count),
+            'bbox': [float(min_lng[c]), float(min_lat[c]), float(max_lng[c]), float(max_lat[c])],
+            'expansion_zoom': expansion_zoom,
+        })
+    return items
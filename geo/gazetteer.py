@@ -0,0 +1,142 @@
+"""
+Offline gazetteer of Catanduanes municipalities and barangays.
+
+Locations are typed as free text ("Brgy. Rawis, Virac", "Calolbon",
+"San Andres, Catanduanes"). ``geocode`` maps such a string to a stable
+``municipality_id`` plus coordinates using the bundled ``geo/data`` file, so
+filters can match on an indexed id and maps get a sensible position when no
+pin was dropped.
+
+Municipal coordinates are approximate poblacion centroids. Barangay coverage
+is partial and barangays inherit their municipality's centroid.
+"""
+
+import json
+import os
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), 'data', 'catanduanes.json')
+
+# Coordinates update_coordinates.py used to assign to every unknown location
+LEGACY_DEFAULT_COORDINATES = (13.5, 124.3)
+
+GeocodeResult = namedtuple('GeocodeResult', 'municipality_id municipality latitude longitude barangay')
+
+# Noise removed before matching
+_STOP_WORDS = re.compile(
+    r'\b(catanduanes|philippines|province|of|municipality|town|city|brgy|barangay|bgy|poblacion|pob)\b'
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    text = re.sub(r'\bsta\b\.?', 'santa', text)
+    text = re.sub(r'\bsto\b\.?', 'santo', text)
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    return ' '.join(text.split())
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer(path: str = DATA_FILE):
+    """Return ``(municipalities_by_id, name_patterns, barangay_index)``.
+
+    ``name_patterns`` are the municipality names and aliases, longest first, so
+    "San Andres" wins over a barangay called "San Andres" elsewhere.
+    ``barangay_index`` maps a normalized barangay name to the municipality ids
+    that have it; names shared by several municipalities are ambiguous.
+    """
+    with open(path, encoding='utf-8') as fh:
+        data = json.load(fh)
+
+    municipalities = {}
+    patterns = []
+    barangays = {}
+    for municipality in data['municipalities']:
+        municipalities[municipality['id']] = municipality
+        for name in [municipality['name']] + municipality.get('aliases', []):
+            patterns.append((normalize(name), municipality['id']))
+        for barangay in municipality.get('barangays', []):
+            for name in [barangay['name']] + barangay.get('aliases', []):
+                barangays.setdefault(normalize(name), set()).add(municipality['id'])
+    patterns.sort(key=lambda item: len(item[0]), reverse=True)
+    return municipalities, patterns, barangays
+
+
+def municipalities():
+    """Return ``[(id, name)]`` sorted by name, for filter dropdowns."""
+    by_id = load_gazetteer()[0]
+    return sorted(((mid, m['name']) for mid, m in by_id.items()), key=lambda item: item[1])
+
+
+def _contains(haystack: str, needle: str) -> bool:
+    return re.search(rf'(^| ){re.escape(needle)}( |$)', haystack) is not None
+
+
+def geocode(*parts) -> GeocodeResult:
+    """Resolve free-text location parts (location, city, province...) to a municipality.
+
+    Municipality names and aliases win; otherwise a barangay name that belongs
+    to exactly one municipality is used. Returns ``None`` when nothing matches.
+    """
+    text = normalize(' '.join(part for part in parts if part))
+    if not text:
+        return None
+    by_id, patterns, barangays = load_gazetteer()
+
+    # Most specific barangay name that belongs to a single municipality
+    barangay_hit = None
+    for name, ids in barangays.items():
+        if len(ids) == 1 and _contains(text, name):
+            if barangay_hit is None or len(name) > len(barangay_hit[0]):
+                barangay_hit = (name, next(iter(ids)))
+
+    cleaned = _STOP_WORDS.sub(' ', text)
+    for name, municipality_id in patterns:
+        if _contains(cleaned, name):
+            municipality = by_id[municipality_id]
+            barangay = barangay_hit[0] if barangay_hit and barangay_hit[1] == municipality_id else None
+            return GeocodeResult(municipality_id, municipality['name'],
+                                 municipality['latitude'], municipality['longitude'], barangay)
+
+    if barangay_hit:
+        municipality = by_id[barangay_hit[1]]
+        return GeocodeResult(municipality['id'], municipality['name'],
+                             municipality['latitude'], municipality['longitude'], barangay_hit[0])
+    return None
+
+
+def municipality_id_for(*parts):
+    """Shortcut returning only the ``municipality_id`` (or ``None``)."""
+    result = geocode(*parts)
+    return result.municipality_id if result else None
+
+
+def needs_coordinates(latitude, longitude) -> bool:
+    """True when coordinates are missing or are the old hardcoded placeholder."""
+    if latitude is None or longitude is None:
+        return True
+    try:
+        return (round(float(latitude), 6), round(float(longitude), 6)) == LEGACY_DEFAULT_COORDINATES
+    except (TypeError, ValueError):
+        return True
+
+
+def location_condition(alias: str, location: str, params: dict, field: str = 'location') -> str:
+    """Return a Cypher condition filtering ``alias`` by a location string.
+
+    Locations that resolve to a municipality filter on the indexed
+    ``municipality_id``, with the exact string match on ``field`` kept for
+    nodes not geocoded yet (``scripts/geocode_locations.py``). Anything else
+    keeps the exact match only. Adds the needed parameters to ``params``.
+    """
+    municipality_id = municipality_id_for(location)
+    params['location'] = location
+    if municipality_id:
+        params['municipality_id'] = municipality_id
+        return (f"({alias}.municipality_id = $municipality_id OR "
+                f"({alias}.municipality_id IS NULL AND {alias}.{field} = $location))")
+    return f"{alias}.{field} = $location"
@@ -0,0 +1,89 @@
+"""
+Write hooks for listings.
+
+Every code path that creates, updates or deletes a Job, Business, Service or
+ServiceRequest calls ``listing_saved`` / ``listing_removed`` after its Cypher
+succeeds, so process-local derived state (the spatial index, the cached
+map tiles around the listing and the chatbot's embedding index) stays fresh
+without polling Neo4j. Hooks never raise: a failure here must not fail the
+write that already happened.
+"""
+
+import logging
+
+from geo.spatial_index import get_spatial_index, is_active
+from geo.tiles import invalidate_listing
+from listing_embeddings import loaded_embedding_index
+
+logger = logging.getLogger(__name__)
+
+# Node properties copied into the in-memory record
+_PROPS = ('title', 'name', 'location', 'category', 'status', 'salary',
+          'business_name', 'budget', 'payment', 'municipality_id')
+
+
+def _as_dict(data):
+    if data is None:
+        return {}
+    if isinstance(data, dict):
+        return data
+    try:
+        values = dict(data)
+    except Exception:
+        values = dict(getattr(data, '__dict__', {}))
+    element_id = getattr(data, 'element_id', None)
+    if element_id and not values.get('id'):
+        values['id'] = element_id
+    return values
+
+
+def _update_embeddings(kind: str, listing_id, values: dict):
+    # Only an index some request already loaded; a write never loads the encoder
+    embeddings = loaded_embedding_index()
+    if embeddings is None:
+        return
+    if not is_active(values.get('status')):
+        embeddings.remove(kind, listing_id)
+        return
+    record = dict(values, title=values.get('title') or values.get('name') or values.get('type'))
+    if kind == 'service':
+        record.setdefault('payment_offer', values.get('budget') or values.get('payment'))
+    embeddings.upsert(kind, listing_id, record)
+
+
+def listing_saved(kind: str, data):
+    """Record a created/updated listing. ``data`` may be a Neo4j node, dict or model object."""
+    try:
+        values = _as_dict(data)
+        listing_id = values.get('id')
+        if not listing_id:
+            return
+        props = {key: values.get(key) for key in _PROPS if values.get(key) is not None}
+        props.setdefault('title', values.get('name') or values.get('type'))
+        props['status'] = values.get('status')
+        if kind == 'service':
+            props.setdefault('payment_offer', values.get('budget') or values.get('payment'))
+        index = get_spatial_index(refresh=False)
+        previous = index.get(kind, listing_id)
+        index.upsert(kind, listing_id, values.get('latitude'), values.get('longitude'), **props)
+        if previous:
+            invalidate_listing(kind, previous['latitude'], previous['longitude'])
+        invalidate_listing(kind, values.get('latitude'), values.get('longitude'))
+        _update_embeddings(kind, listing_id, values)
+    except Exception as e:
+        logger.error(f'Error running listing_saved hook for {kind}: {str(e)}')
+
+
+def listing_removed(kind: str, listing_id: str):
+    """Forget a deleted or closed listing."""
+    try:
+        index = get_spatial_index(refresh=False)
+        previous = index.get(kind, listing_id)
+        index.remove(kind, listing_id)
+        if previous:
+            invalidate_listing(kind, previous['latitude'], previous['longitude'])
+        embeddings = loaded_embedding_index()
+        if embeddings is not None:
+            embeddings.remove(kind, listing_id)
+    except Exception as e:
+        logger.error(f'Error running listing_removed hook for {kind}: {str(e)}')
@@ -0,0 +1,84 @@
+"""
+Web Mercator helpers: pixel projection and slippy-map tile math.
+
+Uses the same 256px tile scheme as Leaflet and the OpenStreetMap tiles, so
+server-side clusters and tiles line up with what the browser renders.
+"""
+
+import math
+
+import numpy as np
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+MAX_ZOOM = 20
+
+
+def clamp_zoom(zoom) -> int:
+    return max(0, min(MAX_ZOOM, int(zoom)))
+
+
+def project(lats, lngs, zoom: int):
+    """Project degrees to global pixel coordinates ``(x, y)`` at ``zoom``. Accepts arrays."""
+    scale = TILE_SIZE * (2 ** zoom)
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    x = (lngs + 180.0) / 360.0 * scale
+    sin_lat = np.sin(np.radians(lats))
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def tile_for(latitude: float, longitude: float, zoom: int):
+    """Return the ``(x, y)`` tile containing a point."""
+    x, y = project(latitude, longitude, zoom)
+    last = 2 ** zoom - 1
+    return (min(last, max(0, int(x // TILE_SIZE))),
+            min(last, max(0, int(y // TILE_SIZE))))
+
+
+def tile_bounds(x: int, y: int, zoom: int):
+    """Return ``(min_lat, min_lng, max_lat, max_lng)`` of a tile."""
+    n = 2 ** zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_range(min_lat: float, min_lng: float, max_lat: float, max_lng: float, zoom: int):
+    """Return the inclusive tile range ``(x0, y0, x1, y1)`` covering a bounding box."""
+    x0, y1 = tile_for(min_lat, min_lng, zoom)
+    x1, y0 = tile_for(max_lat, max_lng, zoom)
+    return x0, y0, x1, y1
+
+
+def snap_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float, zoom: int):
+    """Grow a bounding box outward to whole tiles.
+
+    Returns ``(tiles, bbox)``. Every viewport inside the same tiles maps to the
+    same key, which is what makes map responses cacheable while panning.
+    """
+    tiles = tile_range(min_lat, min_lng, max_lat, max_lng, zoom)
+    x0, y0, x1, y1 = tiles
+    south = tile_bounds(x0, y1, zoom)[0]
+    west = tile_bounds(x0, y1, zoom)[1]
+    north = tile_bounds(x1, y0, zoom)[2]
+    east = tile_bounds(x1, y0, zoom)[3]
+    return tiles, (south, west, north, east)
+
+
+def parse_bbox(value: str):
+    """Parse Leaflet's ``west,south,east,north`` string into ``(min_lat, min_lng, max_lat, max_lng)``.
+
+    Raises ``ValueError`` on malformed input.
+    """
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must be west,south,east,north')
+    west, south, east, north = parts
+    if south > north or west > east:
+        raise ValueError('bbox corners are inverted')
+    return (max(-MAX_LATITUDE, south), max(-180.0, west),
+            min(MAX_LATITUDE, north), min(180.0, east))
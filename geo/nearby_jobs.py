@@ -0,0 +1,103 @@
+"""
+"Jobs near me" feed for job seekers.
+
+The user's free-text ``address`` is geocoded with the offline gazetteer once
+and cached on the User node as ``home_latitude`` / ``home_longitude``, along
+with the ``home_address`` it was computed from so an edited address is
+re-geocoded. Pages are served from the in-memory spatial index, ordered by
+``(distance, id)`` and continued with an opaque cursor holding the last pair,
+so a page costs one in-memory lookup no matter how deep the user scrolls.
+"""
+
+import base64
+import json
+import logging
+
+from geo.gazetteer import geocode
+from geo.spatial_index import get_spatial_index
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+# Starting search radius (km); doubled until a page is filled
+START_RADIUS_KM = 10.0
+# Beyond this every listing on the island has been considered
+MAX_RADIUS_KM = 200.0
+
+OPEN_STATUSES = (None, '', 'open')
+
+
+def encode_cursor(distance: float, listing_id: str) -> str:
+    raw = json.dumps([round(distance, 6), listing_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Return ``(distance, id)`` from a cursor. Raises ``ValueError`` if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        distance, listing_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return float(distance), str(listing_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def home_location(user, driver, database):
+    """Return ``(latitude, longitude)`` for the user's address, geocoding it at most once.
+
+    Returns ``None`` when the user has no address or it cannot be resolved.
+    """
+    address = getattr(user, 'address', None)
+    if not address:
+        return None
+    if getattr(user, 'home_address', None) == address and getattr(user, 'home_latitude', None) is not None:
+        return user.home_latitude, user.home_longitude
+
+    result = geocode(address)
+    if result is None:
+        return None
+    try:
+        with driver.session(database=database) as session:
+            session.run("""
+                MATCH (u:User {id: $id})
+                SET u.home_latitude = $latitude,
+                    u.home_longitude = $longitude,
+                    u.home_address = $address
+            """, id=user.id, latitude=result.latitude, longitude=result.longitude, address=address)
+    except Exception as e:
+        # The feed still works this time; we'll just geocode again next time
+        logger.error(f"Error caching home location for user {user.id}: {str(e)}")
+    user.home_latitude, user.home_longitude, user.home_address = result.latitude, result.longitude, address
+    return result.latitude, result.longitude
+
+
+def jobs_near(latitude: float, longitude: float, cursor: str = None, page_size: int = PAGE_SIZE, category=None):
+    """Return ``(jobs, next_cursor)`` for open jobs ordered by distance from a point.
+
+    Each job is its index record plus ``distance_km``. ``next_cursor`` is
+    ``None`` on the last page.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+
+    def is_open(record):
+        return record.get('status') in OPEN_STATUSES and (not category or record.get('category') == category)
+
+    index = get_spatial_index()
+    radius = max(START_RADIUS_KM, (after[0] * 2) if after else 0.0)
+    while True:
+        found = index.within_radius(latitude, longitude, radius, kinds=('job',), predicate=is_open)
+        ranked = sorted(((round(distance, 6), record['id'], record) for record, distance in found),
+                        key=lambda item: item[:2])
+        if after:
+            ranked = [item for item in ranked if item[:2] > after]
+        # One extra row tells us whether another page exists
+        if len(ranked) > page_size or radius >= MAX_RADIUS_KM:
+            break
+        radius = min(radius * 2, MAX_RADIUS_KM)
+
+    page = ranked[:page_size]
+    jobs = [dict(record, distance_km=round(distance, 3)) for distance, _, record in page]
+    next_cursor = encode_cursor(*page[-1][:2]) if len(ranked) > page_size else None
+    return jobs, next_cursor
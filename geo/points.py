@@ -0,0 +1,77 @@
+"""
+Helpers for the native Neo4j ``position`` point property.
+
+Listings (Business, Job, Service, ServiceRequest) keep their human readable
+address in ``location`` and the WGS-84 coordinates in ``latitude`` /
+``longitude``. Every save path also writes ``position``, a Neo4j ``point``
+built from those coordinates, so radius searches can use a point index
+instead of constructing a point for every node.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Labels that carry a ``position`` point and get a point index
+POSITION_LABELS = ('Business', 'Job', 'Service', 'ServiceRequest')
+
+
+def position_cypher(latitude: str = '$latitude', longitude: str = '$longitude') -> str:
+    """Return a Cypher expression building a WGS-84 point from two expressions.
+
+    Evaluates to null when either coordinate is missing, so ``SET n.position = ...``
+    removes a stale point instead of failing.
+    """
+    return (
+        f"CASE WHEN {latitude} IS NULL OR {longitude} IS NULL THEN null "
+        f"ELSE point({{latitude: toFloat({latitude}), longitude: toFloat({longitude})}}) END"
+    )
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float):
+    """Return ``(min_lat, min_lng, max_lat, max_lng)`` enclosing a radius around a point.
+
+    The box is a cheap, index-friendly pre-filter; callers still check the exact
+    ``point.distance`` afterwards.
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6:
+        delta_lng = 180.0
+    else:
+        delta_lng = min(180.0, delta_lat / cos_lat)
+    return (
+        max(-90.0, latitude - delta_lat),
+        max(-180.0, longitude - delta_lng),
+        min(90.0, latitude + delta_lat),
+        min(180.0, longitude + delta_lng),
+    )
+
+
+def nearby_params(latitude: float, longitude: float, radius_km: float) -> dict:
+    """Build the query parameters used by the bounding-box + distance Cypher."""
+    min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius_km)
+    return {
+        'lat': float(latitude),
+        'lng': float(longitude),
+        'radius': float(radius_km),
+        'min_lat': min_lat,
+        'min_lng': min_lng,
+        'max_lat': max_lat,
+        'max_lng': max_lng,
+    }
+
+
+def bbox_predicate(alias: str) -> str:
+    """Return a predicate keeping nodes whose ``position`` lies in the nearby bounding box.
+
+    ``point.withinBBox`` is answered by the point index; the exact distance is
+    only computed for the nodes inside the box.
+    """
+    return (
+        f"point.withinBBox({alias}.position, "
+        f"point({{latitude: $min_lat, longitude: $min_lng}}), "
+        f"point({{latitude: $max_lat, longitude: $max_lng}}))"
+    )
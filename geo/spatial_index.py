@@ -0,0 +1,342 @@
+"""
+Process-local spatial index of active listings (jobs, businesses, services).
+
+Map and nearby endpoints used to hit Neo4j on every pan or filter. This index
+keeps the coordinates of every active listing in NumPy arrays, sorted by a
+uniform lat/lng grid cell, and answers radius, k-nearest and bounding-box
+queries with a vectorized haversine.
+
+- Loaded lazily from Neo4j on first use and reloaded after ``SPATIAL_INDEX_TTL``
+  seconds so writes from other workers or scripts are eventually picked up.
+- Kept fresh in-process through the write hooks in ``geo.listings``.
+- Arrays are rebuilt lazily on the first query after a write; reads never
+  block on Neo4j once the index is warm.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from geo.points import EARTH_RADIUS_KM, bounding_box
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('job', 'business', 'service')
+
+# ~2.2 km cells: a 5 km radius search touches a handful of grid rows
+CELL_DEG = float(os.getenv('SPATIAL_INDEX_CELL_DEG', 0.02))
+INDEX_TTL = float(os.getenv('SPATIAL_INDEX_TTL', 300))
+MAX_GRID_ROWS = 64
+
+# Statuses that make a listing visible on maps and nearby searches
+ACTIVE_STATUSES = {None, '', 'open', 'active', 'verified'}
+
+# Cypher used to (re)load the index. Services live under two labels for
+# historical reasons; both are exposed as kind 'service'.
+_LOAD_QUERIES = {
+    'job': """
+        MATCH (j:Job)
+        WHERE j.latitude IS NOT NULL AND j.longitude IS NOT NULL
+        OPTIONAL MATCH (b:Business)-[:POSTED]->(j)
+        RETURN coalesce(j.id, elementId(j)) AS id, j.latitude AS latitude, j.longitude AS longitude,
+               j.title AS title, j.location AS location, j.category AS category, j.status AS status,
+               j.salary AS salary, b.name AS business_name,
+               j.municipality_id AS municipality_id
+    """,
+    'business': """
+        MATCH (b:Business)
+        WHERE b.latitude IS NOT NULL AND b.longitude IS NOT NULL
+        RETURN coalesce(b.id, elementId(b)) AS id, b.latitude AS latitude, b.longitude AS longitude,
+               b.name AS title, b.location AS location, b.category AS category, b.status AS status,
+               b.municipality_id AS municipality_id
+    """,
+    'service': """
+        MATCH (s)
+        WHERE (s:Service OR s:ServiceRequest)
+          AND s.latitude IS NOT NULL AND s.longitude IS NOT NULL
+        RETURN coalesce(s.id, elementId(s)) AS id, s.latitude AS latitude, s.longitude AS longitude,
+               coalesce(s.title, s.type) AS title, s.location AS location, s.category AS category,
+               s.status AS status, coalesce(s.budget, s.payment) AS payment_offer,
+               s.municipality_id AS municipality_id
+    """,
+}
+
+
+def haversine_km(latitude, longitude, lats_rad, lngs_rad):
+    """Vectorized great-circle distance (km) from one point to arrays of radians."""
+    lat1 = math.radians(latitude)
+    lng1 = math.radians(longitude)
+    dlat = lats_rad - lat1
+    dlng = lngs_rad - lng1
+    a = np.sin(dlat / 2.0) ** 2 + math.cos(lat1) * np.cos(lats_rad) * np.sin(dlng / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def is_active(status) -> bool:
+    return status in ACTIVE_STATUSES
+
+
+class SpatialIndex:
+    """Grid-bucketed NumPy index over listing coordinates.
+
+    Records are sorted by grid cell key ``row * n_cols + col``. The cells of one
+    grid row covering a bounding box form a contiguous key range, so a bbox
+    lookup is one pair of ``searchsorted`` calls per row.
+    """
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.n_cols = int(math.ceil(360.0 / cell_deg))
+        self._lock = threading.RLock()
+        self._records = {}  # (kind, id) -> record dict
+        self._dirty = True
+        self._loaded_at = None
+        # version changes on every write, generation only on full reloads
+        self.version = 0
+        self.generation = 0
+        self._build_empty()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def upsert(self, kind: str, listing_id: str, latitude, longitude, **props):
+        """Insert or replace one listing. Listings without coordinates are dropped."""
+        if kind not in KINDS or not listing_id:
+            return
+        if latitude is None or longitude is None or not is_active(props.get('status')):
+            self.remove(kind, listing_id)
+            return
+        try:
+            latitude = float(latitude)
+            longitude = float(longitude)
+        except (TypeError, ValueError):
+            self.remove(kind, listing_id)
+            return
+        record = dict(props, id=str(listing_id), type=kind, latitude=latitude, longitude=longitude)
+        with self._lock:
+            self._records[(kind, str(listing_id))] = record
+            self._dirty = True
+            self.version += 1
+
+    def remove(self, kind: str, listing_id: str):
+        with self._lock:
+            if self._records.pop((kind, str(listing_id)), None) is not None:
+                self._dirty = True
+                self.version += 1
+
+    def get(self, kind: str, listing_id: str):
+        with self._lock:
+            return self._records.get((kind, str(listing_id)))
+
+    def load(self, driver, database):
+        """Replace the index contents with every active listing in Neo4j."""
+        records = {}
+        with driver.session(database=database) as session:
+            for kind, query in _LOAD_QUERIES.items():
+                for row in session.run(query):
+                    data = dict(row)
+                    if not is_active(data.get('status')):
+                        continue
+                    try:
+                        data['latitude'] = float(data['latitude'])
+                        data['longitude'] = float(data['longitude'])
+                    except (TypeError, ValueError):
+                        continue
+                    data['id'] = str(data['id'])
+                    data['type'] = kind
+                    records[(kind, data['id'])] = data
+        with self._lock:
+            self._records = records
+            self._dirty = True
+            self._loaded_at = time.monotonic()
+            self.version += 1
+            self.generation += 1
+        logger.info('Spatial index loaded %d listings', len(records))
+        return len(records)
+
+    def mark_fresh(self):
+        """Restart the TTL without reloading (used to back off after a failed load)."""
+        self._loaded_at = time.monotonic()
+
+    def is_stale(self, ttl: float = INDEX_TTL) -> bool:
+        return self._loaded_at is None or (time.monotonic() - self._loaded_at) > ttl
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    # ------------------------------------------------------------------
+    # Array maintenance
+    # ------------------------------------------------------------------
+    def _build_empty(self):
+        self._keys = []
+        self._lat = np.empty(0, dtype=np.float64)
+        self._lng = np.empty(0, dtype=np.float64)
+        self._lat_rad = np.empty(0, dtype=np.float64)
+        self._lng_rad = np.empty(0, dtype=np.float64)
+        self._kind = np.empty(0, dtype=np.int8)
+        self._cells = np.empty(0, dtype=np.int64)
+
+    def _cell_rows_cols(self, lats, lngs):
+        rows = np.floor((np.asarray(lats) + 90.0) / self.cell_deg).astype(np.int64)
+        cols = np.floor((np.asarray(lngs) + 180.0) / self.cell_deg).astype(np.int64)
+        return rows, np.clip(cols, 0, self.n_cols - 1)
+
+    def _rebuild(self):
+        """Re-materialize the sorted arrays. Caller holds the lock."""
+        if not self._dirty:
+            return
+        keys = list(self._records.keys())
+        if not keys:
+            self._build_empty()
+            self._dirty = False
+            return
+        lat = np.fromiter((self._records[k]['latitude'] for k in keys), dtype=np.float64, count=len(keys))
+        lng = np.fromiter((self._records[k]['longitude'] for k in keys), dtype=np.float64, count=len(keys))
+        kind = np.fromiter((KINDS.index(k[0]) for k in keys), dtype=np.int8, count=len(keys))
+        rows, cols = self._cell_rows_cols(lat, lng)
+        cells = rows * self.n_cols + cols
+        order = np.argsort(cells, kind='stable')
+        self._keys = [keys[i] for i in order]
+        self._lat = lat[order]
+        self._lng = lng[order]
+        self._lat_rad = np.radians(self._lat)
+        self._lng_rad = np.radians(self._lng)
+        self._kind = kind[order]
+        self._cells = cells[order]
+        self._dirty = False
+
+    def _snapshot(self):
+        with self._lock:
+            self._rebuild()
+            # Rebuilds swap in new arrays rather than mutating these, and a
+            # record removed after the snapshot is skipped in _materialize.
+            return (self._keys, self._lat, self._lng, self._lat_rad, self._lng_rad,
+                    self._kind, self._cells, self._records)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def _bbox_candidates(self, snap, min_lat, min_lng, max_lat, max_lng, kinds=None):
+        keys, lat, lng, _, _, kind, cells, _ = snap
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        (row0, row1), (col0, col1) = self._cell_rows_cols([min_lat, max_lat], [min_lng, max_lng])
+        if row1 - row0 >= MAX_GRID_ROWS:
+            # Very tall boxes (zoomed-out maps): one vectorized mask beats thousands of row lookups
+            mask = (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+            if kinds:
+                mask &= np.isin(kind, [KINDS.index(k) for k in kinds if k in KINDS])
+            return np.nonzero(mask)[0]
+        ranges = []
+        for row in range(int(row0), int(row1) + 1):
+            start = np.searchsorted(cells, row * self.n_cols + col0, side='left')
+            stop = np.searchsorted(cells, row * self.n_cols + col1, side='right')
+            if stop > start:
+                ranges.append(np.arange(start, stop))
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        idx = np.concatenate(ranges)
+        mask = (lat[idx] >= min_lat) & (lat[idx] <= max_lat) & (lng[idx] >= min_lng) & (lng[idx] <= max_lng)
+        if kinds:
+            mask &= np.isin(kind[idx], [KINDS.index(k) for k in kinds if k in KINDS])
+        return idx[mask]
+
+    @staticmethod
+    def _materialize(snap, idx, distances=None, predicate=None, limit=None):
+        keys, records = snap[0], snap[7]
+        results = []
+        for pos, i in enumerate(idx):
+            record = records.get(keys[i])
+            if record is None or (predicate is not None and not predicate(record)):
+                continue
+            if distances is not None:
+                results.append((record, float(distances[pos])))
+            else:
+                results.append(record)
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def listings(self, kinds=None, predicate=None):
+        """Return every indexed record, optionally restricted to some kinds."""
+        with self._lock:
+            records = list(self._records.values())
+        return [r for r in records
+                if (not kinds or r['type'] in kinds) and (predicate is None or predicate(r))]
+
+    def within_bbox(self, min_lat, min_lng, max_lat, max_lng, kinds=None, predicate=None, limit=None):
+        """Return listing records inside a bounding box."""
+        snap = self._snapshot()
+        idx = self._bbox_candidates(snap, min_lat, min_lng, max_lat, max_lng, kinds)
+        return self._materialize(snap, idx, predicate=predicate, limit=limit)
+
+    def bbox_arrays(self, min_lat, min_lng, max_lat, max_lng, kinds=None, predicate=None):
+        """Return ``(records, lats, lngs)`` for a bounding box without per-row Python work on coordinates."""
+        snap = self._snapshot()
+        idx = self._bbox_candidates(snap, min_lat, min_lng, max_lat, max_lng, kinds)
+        records = [snap[7].get(snap[0][i]) for i in idx]
+        keep = np.fromiter((r is not None and (predicate is None or predicate(r)) for r in records),
+                           dtype=bool, count=len(records))
+        idx = idx[keep]
+        return [r for r, k in zip(records, keep) if k], snap[1][idx], snap[2][idx]
+
+    def within_radius(self, latitude, longitude, radius_km, kinds=None, predicate=None, limit=None):
+        """Return ``[(record, distance_km)]`` within ``radius_km``, nearest first."""
+        snap = self._snapshot()
+        idx = self._bbox_candidates(snap, *bounding_box(latitude, longitude, radius_km), kinds=kinds)
+        if idx.size == 0:
+            return []
+        dist = haversine_km(latitude, longitude, snap[3][idx], snap[4][idx])
+        keep = dist <= radius_km
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return self._materialize(snap, idx[order], dist[order], predicate=predicate, limit=limit)
+
+    def nearest(self, latitude, longitude, k=10, kinds=None, predicate=None, max_radius_km=None):
+        """Return the ``k`` nearest listings as ``[(record, distance_km)]``.
+
+        Searches an expanding radius over the grid and falls back to a full
+        vectorized scan once the radius covers the whole index.
+        """
+        radius = max(self.cell_deg * 111.0, 1.0)
+        limit_radius = max_radius_km if max_radius_km is not None else 2 * math.pi * EARTH_RADIUS_KM
+        while radius < limit_radius and radius < 500.0:
+            found = self.within_radius(latitude, longitude, radius, kinds=kinds, predicate=predicate, limit=k)
+            if len(found) >= k:
+                return found
+            radius *= 2.0
+        snap = self._snapshot()
+        idx = np.arange(len(snap[0]))
+        if kinds:
+            idx = idx[np.isin(snap[5], [KINDS.index(kd) for kd in kinds if kd in KINDS])]
+        if idx.size == 0:
+            return []
+        dist = haversine_km(latitude, longitude, snap[3][idx], snap[4][idx])
+        if max_radius_km is not None:
+            keep = dist <= max_radius_km
+            idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return self._materialize(snap, idx[order], dist[order], predicate=predicate, limit=k)
+
+
+_index = SpatialIndex()
+_load_lock = threading.Lock()
+
+
+def get_spatial_index(refresh: bool = True) -> SpatialIndex:
+    """Return the process-wide index, (re)loading it from Neo4j when stale."""
+    if refresh and _index.is_stale():
+        with _load_lock:
+            if _index.is_stale():
+                try:
+                    from database import get_neo4j_driver, DATABASE
+                    _index.load(get_neo4j_driver(), DATABASE)
+                except Exception as e:
+                    logger.error(f'Could not load spatial index: {str(e)}')
+                    _index.mark_fresh()
+    return _index
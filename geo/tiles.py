@@ -0,0 +1,117 @@
+"""
+On-demand GeoJSON tiles for the jobs, businesses and services map layers.
+
+A tile ``(layer, z, x, y)`` is rendered from the spatial index the first time
+it is requested and cached as serialized JSON with its ETag. When a listing
+changes, ``invalidate_listing`` drops exactly the tiles (one per zoom level)
+that contain its old and new position; a full index reload invalidates every
+tile through the index ``generation``.
+
+Below ``CLUSTER_MAX_ZOOM`` points are clustered on a 64px grid, which divides
+the 256px tile evenly, so a cluster never straddles two tiles and a tile's
+size is bounded by its pixel area rather than by the number of listings.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from geo.cache import TTLCache
+from geo.clustering import cluster_points
+from geo.mercator import MAX_ZOOM, TILE_SIZE, project, tile_bounds, tile_for
+from geo.spatial_index import get_spatial_index
+
+LAYERS = {
+    'jobs': ('job',),
+    'businesses': ('business',),
+    'services': ('service',),
+}
+KIND_LAYERS = {kind: layer for layer, kinds in LAYERS.items() for kind in kinds}
+
+TILE_CLUSTER_PX = 64
+# Tiles are invalidated explicitly; the TTL only bounds staleness for writes
+# made by other workers, which this process sees on the next index reload.
+TILE_CACHE_TTL = int(os.getenv('TILE_CACHE_TTL', 300))
+_tile_cache = TTLCache(maxsize=int(os.getenv('TILE_CACHE_SIZE', 4096)), ttl=TILE_CACHE_TTL)
+
+# Properties exposed to anonymous map visitors
+_PUBLIC_PROPS = ('title', 'location', 'category', 'business_name', 'salary', 'payment_offer')
+
+
+def _feature(record):
+    properties = {key: record.get(key) for key in _PUBLIC_PROPS if record.get(key) is not None}
+    properties.update(id=record['id'], type=record['type'])
+    return {
+        'type': 'Feature',
+        'id': f"{record['type']}-{record['id']}",
+        'geometry': {'type': 'Point', 'coordinates': [record['longitude'], record['latitude']]},
+        'properties': properties,
+    }
+
+
+def _cluster_feature(cluster):
+    return {
+        'type': 'Feature',
+        'id': cluster['id'],
+        'geometry': {'type': 'Point', 'coordinates': [cluster['longitude'], cluster['latitude']]},
+        'properties': {
+            'cluster': True,
+            'point_count': cluster['count'],
+            'bbox': cluster['bbox'],
+            'expansion_zoom': cluster['expansion_zoom'],
+        },
+    }
+
+
+def render_tile(layer: str, z: int, x: int, y: int) -> dict:
+    """Build the GeoJSON FeatureCollection of one tile straight from the index."""
+    min_lat, min_lng, max_lat, max_lng = tile_bounds(x, y, z)
+    records, lats, lngs = get_spatial_index().bbox_arrays(min_lat, min_lng, max_lat, max_lng,
+                                                          kinds=LAYERS[layer])
+    # Points on the shared edge belong to the tile tile_for() assigns them to,
+    # so neighbouring tiles never both draw the same listing.
+    px, py = project(lats, lngs, z)
+    keep = np.nonzero((np.floor(px / TILE_SIZE) == x) & (np.floor(py / TILE_SIZE) == y))[0]
+    records = [records[i] for i in keep]
+    lats, lngs = lats[keep], lngs[keep]
+    items = cluster_points(records, lats, lngs, z, radius_px=TILE_CLUSTER_PX)
+    features = [_cluster_feature(item) if item.get('cluster') else _feature(item) for item in items]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def get_tile(layer: str, z: int, x: int, y: int):
+    """Return ``(body, etag)`` for a tile, rendering it on a cache miss.
+
+    Raises ``ValueError`` for unknown layers or out-of-range coordinates.
+    """
+    if layer not in LAYERS:
+        raise ValueError(f'Unknown layer {layer}')
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError('Tile coordinates out of range')
+
+    index = get_spatial_index()
+    generation, version = index.generation, index.version
+    key = (layer, z, x, y)
+    cached = _tile_cache.get(key)
+    if cached is not None and cached[0] == generation:
+        return cached[1], cached[2]
+
+    body = json.dumps(render_tile(layer, z, x, y), separators=(',', ':'))
+    etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+    # A write that landed while rendering may already have tried to evict
+    # this tile; don't cache a possibly stale body over it.
+    if index.version == version:
+        _tile_cache.set(key, (generation, body, etag))
+    return body, etag
+
+
+def invalidate_listing(kind: str, latitude, longitude):
+    """Drop every cached tile of ``kind``'s layer that contains a point."""
+    layer = KIND_LAYERS.get(kind)
+    if layer is None or latitude is None or longitude is None:
+        return
+    for z in range(MAX_ZOOM + 1):
+        x, y = tile_for(float(latitude), float(longitude), z)
+        _tile_cache.pop((layer, z, x, y))
@@ -0,0 +1,165 @@
+"""
+Micro-batching queue for local model inference.
+
+Concurrent chat requests each used to run their own ``model.generate`` and
+fight over the same CPU cores. Requests now go through one worker thread
+that collects them for a short window (``window_ms``, or until ``max_batch``
+prompts are waiting), runs one padded ``generate`` call for the batch and
+hands each output back to its caller.
+
+A lone request does not wait for the window. The worker only lingers when
+another request arrived recently, so single-user latency is unchanged.
+Every request carries a deadline. Requests that expire while queued are
+dropped before they reach the model, and callers stop waiting at their
+deadline.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the queue already holds ``max_depth`` requests."""
+
+
+class QueueTimeout(Exception):
+    """Raised when a request's deadline passes before its output is ready."""
+
+
+class _Request:
+    __slots__ = ('text', 'deadline', 'done', 'result', 'error')
+
+    def __init__(self, text, deadline):
+        self.text = text
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferenceQueue:
+    def __init__(self, generate_batch, max_batch: int = 8, window_ms: float = 20.0,
+                 max_depth: int = 64, default_timeout: float = 30.0):
+        """``generate_batch(texts) -> outputs`` runs the model on a list of prompts."""
+        self.generate_batch = generate_batch
+        self.max_batch = max(1, int(max_batch))
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_depth = max_depth
+        self.default_timeout = default_timeout
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._last_arrival = 0.0
+        self._arrival_gap = float('inf')
+        self._thread = None
+
+        self.batches = 0
+        self.batched_requests = 0
+        self.max_batch_seen = 0
+        self.max_depth_seen = 0
+        self.expired = 0
+        self.rejected = 0
+        self.failed = 0
+
+    # ------------------------------------------------------------------
+    # Callers
+    # ------------------------------------------------------------------
+    def submit(self, text: str, timeout: float = None):
+        """Queue ``text`` and block until its output is ready or the deadline passes."""
+        timeout = self.default_timeout if timeout is None else timeout
+        request = _Request(text, time.monotonic() + timeout)
+        with self._cond:
+            if len(self._pending) >= self.max_depth:
+                self.rejected += 1
+                raise QueueFull(f"Inference queue is full ({self.max_depth} requests)")
+            now = time.monotonic()
+            self._arrival_gap = now - self._last_arrival
+            self._last_arrival = now
+            self._pending.append(request)
+            self.max_depth_seen = max(self.max_depth_seen, len(self._pending))
+            self._ensure_worker()
+            self._cond.notify()
+
+        if not request.done.wait(max(0.0, request.deadline - time.monotonic())):
+            raise QueueTimeout(f"No inference result within {timeout:.1f}s")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'depth': len(self._pending),
+                'max_depth_seen': self.max_depth_seen,
+                'batches': self.batches,
+                'requests': self.batched_requests,
+                'avg_batch': round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+                'max_batch_seen': self.max_batch_seen,
+                'expired': self.expired,
+                'rejected': self.rejected,
+                'failed': self.failed,
+            }
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _ensure_worker(self):
+        # Started lazily so a queue created before a fork gets its thread in the child
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='inference-queue', daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # Linger for companions only when requests are arriving concurrently
+            if self.window and (len(self._pending) > 1 or self._arrival_gap < self.window):
+                close = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = close - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            now = time.monotonic()
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                request = self._pending.popleft()
+                if request.deadline <= now:
+                    # The caller has already given up; don't spend model time on it
+                    self.expired += 1
+                    continue
+                batch.append(request)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                outputs = self.generate_batch([request.text for request in batch])
+                for request, output in zip(batch, outputs):
+                    request.result = output
+            except Exception as e:
+                logger.exception(f"Batched inference failed for {len(batch)} requests")
+                with self._cond:
+                    self.failed += len(batch)
+                for request in batch:
+                    request.error = e
+            finally:
+                with self._cond:
+                    self.batches += 1
+                    self.batched_requests += len(batch)
+                    self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                for request in batch:
+                    request.done.set()
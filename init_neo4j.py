@@ -4,6 +4,9 @@ from database import driver, DATABASE, get_neo4j_driver
 if driver is None:
     driver = get_neo4j_driver()
 from datetime import datetime
+from geo.points import POSITION_LABELS
+from admin_users import backfill_sort_keys
+from analytics_export import TABLES, backfill_ids
 
 def init_db():
     with driver.session(database=DATABASE) as session:
@@ -17,6 +20,7 @@ def init_db():
         session.run("CREATE CONSTRAINT service_id IF NOT EXISTS FOR (s:Service) REQUIRE s.id IS UNIQUE")
         session.run("CREATE CONSTRAINT serviceoffer_id IF NOT EXISTS FOR (o:ServiceOffer) REQUIRE o.id IS UNIQUE")
         session.run("CREATE CONSTRAINT review_id IF NOT EXISTS FOR (r:Review) REQUIRE r.id IS UNIQUE")
+        session.run("CREATE CONSTRAINT service_request_id IF NOT EXISTS FOR (s:ServiceRequest) REQUIRE s.id IS UNIQUE")
         
         # Create indexes for better performance
         session.run("CREATE INDEX user_role IF NOT EXISTS FOR (u:User) ON (u.role)")
@@ -26,6 +30,36 @@ def init_db():
         session.run("CREATE INDEX service_category IF NOT EXISTS FOR (s:Service) ON (s.category)")
         session.run("CREATE INDEX service_status IF NOT EXISTS FOR (s:Service) ON (s.status)")
         session.run("CREATE INDEX serviceoffer_status IF NOT EXISTS FOR (o:ServiceOffer) ON (o.status)")
+
+        # Delta sync of the admin tables (admin_sync)
+        session.run("CREATE INDEX user_updated_at IF NOT EXISTS FOR (u:User) ON (u.updated_at)")
+        session.run("CREATE INDEX tombstone_kind_deleted IF NOT EXISTS FOR (t:Tombstone) ON (t.kind, t.deleted_at)")
+        # updated_at is epoch milliseconds; older nodes may lack it or hold a datetime()
+        session.run("""
+            MATCH (u:User)
+            WHERE coalesce(u.updated_at >= 0, false) = false
+            SET u.updated_at = timestamp()
+        """)
+
+        # Admin user list (admin_users): filters, keyset pages and search
+        session.run("CREATE INDEX user_role_status IF NOT EXISTS FOR (u:User) ON (u.role, u.verification_status)")
+        session.run("CREATE INDEX user_email_key IF NOT EXISTS FOR (u:User) ON (u.email_key)")
+        session.run("CREATE INDEX user_name_key IF NOT EXISTS FOR (u:User) ON (u.name_key)")
+        session.run("CREATE TEXT INDEX user_email_key_text IF NOT EXISTS FOR (u:User) ON (u.email_key)")
+        session.run("CREATE TEXT INDEX user_name_key_text IF NOT EXISTS FOR (u:User) ON (u.name_key)")
+        backfill_sort_keys(session)
+
+        # The analytics export pages on id; some older writers left it unset
+        for table in TABLES.values():
+            backfill_ids(session, table.label)
+
+        # Point indexes back the bounding-box pre-filter of the nearby queries
+        for label in POSITION_LABELS:
+            session.run(f"CREATE POINT INDEX {label.lower()}_position IF NOT EXISTS FOR (n:{label}) ON (n.position)")
+
+        # Location filters match on the gazetteer municipality id
+        for label in POSITION_LABELS + ('User',):
+            session.run(f"CREATE INDEX {label.lower()}_municipality IF NOT EXISTS FOR (n:{label}) ON (n.municipality_id)")
         
         # Initialize a dummy node to ensure all relationship types exist
         session.run("""
@@ -0,0 +1,373 @@
+"""
+Embedding index of listings for chatbot context.
+
+``get_relevant_data`` used to run three keyword scans against Neo4j for every
+chat message, and word matching misses paraphrases ("carpenter" vs
+"woodworking"). This index encodes every active job, business and service
+once, offline, into a float16 NumPy matrix. Chat retrieval is then a cosine
+top-k over that matrix, with no Neo4j queries per message.
+
+- Built by ``scripts/build_listing_embeddings.py`` and saved to
+  ``EMBEDDING_INDEX_PATH``. The build is incremental by default: a listing is
+  only re-encoded when its text changed.
+- Loaded from that file on first use. If the file is missing, or was built
+  with another encoder, the index is built from Neo4j once and saved.
+- Kept fresh in-process through the write hooks in ``geo.listings``.
+
+The encoder is a small sentence-transformers model on CPU when that package
+is installed (``EMBEDDING_MODEL``). Otherwise it is ``HashingEncoder``:
+hashed words, character trigrams and a table of related trade terms, with no
+extra dependencies.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from chatbot_pipeline import _stem, terms
+from geo.spatial_index import is_active
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('job', 'business', 'service')
+
+EMBEDDING_ENCODER = os.getenv('EMBEDDING_ENCODER', 'auto')  # auto | model | hashing
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+INDEX_PATH = os.getenv(
+    'EMBEDDING_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model', 'embeddings', 'listings.npz')
+)
+MIN_SCORE = float(os.getenv('EMBEDDING_MIN_SCORE', 0.15))
+ENCODE_BATCH = 64
+
+# Cypher used to build the index. Services live under two labels for
+# historical reasons; both are exposed as kind 'service'.
+_LOAD_QUERIES = {
+    'job': """
+        MATCH (j:Job)
+        OPTIONAL MATCH (b:Business)-[:POSTED]->(j)
+        RETURN coalesce(j.id, elementId(j)) AS id, j.title AS title, j.description AS description,
+               j.location AS location, j.category AS category, j.status AS status,
+               j.salary AS salary, b.name AS business_name
+    """,
+    'business': """
+        MATCH (b:Business)
+        RETURN coalesce(b.id, elementId(b)) AS id, b.name AS title, b.description AS description,
+               b.location AS location, b.category AS category, b.status AS status
+    """,
+    'service': """
+        MATCH (s)
+        WHERE s:Service OR s:ServiceRequest
+        RETURN coalesce(s.id, elementId(s)) AS id, coalesce(s.title, s.type) AS title,
+               s.description AS description, s.location AS location, s.category AS category,
+               s.status AS status, coalesce(s.budget, s.payment) AS payment_offer
+    """,
+}
+
+# Record fields kept for building chat context
+_FIELDS = ('title', 'description', 'location', 'category', 'salary', 'business_name', 'payment_offer')
+DESCRIPTION_CHARS = 300
+
+# Words from the same trade or sector, so e.g. a "woodworking" listing answers
+# a question about carpenters even without a neural encoder
+RELATED_TERMS = [
+    {"carpenter", "carpentry", "woodwork", "woodworking", "furniture", "cabinet", "joinery", "lumber"},
+    {"cook", "chef", "kitchen", "restaurant", "food", "catering", "eatery", "bakery", "baker", "canteen", "eat", "dining"},
+    {"driver", "driving", "tricycle", "jeepney", "delivery", "transport", "rider", "courier"},
+    {"cleaner", "cleaning", "housekeeping", "janitor", "janitorial", "maid", "laundry", "housekeeper"},
+    {"teacher", "tutor", "tutoring", "teaching", "school", "education", "instructor"},
+    {"nurse", "caregiver", "health", "clinic", "medical", "pharmacy", "hospital"},
+    {"electrician", "electrical", "wiring", "electric"},
+    {"plumber", "plumbing", "pipe", "water"},
+    {"mechanic", "repair", "vehicle", "motorcycle", "auto", "automotive", "vulcanizing"},
+    {"fisherman", "fishing", "fish", "seafood", "fishery"},
+    {"farmer", "farming", "agriculture", "abaca", "crop", "farm", "harvest"},
+    {"cashier", "sales", "store", "retail", "shop", "clerk", "sari", "merchandise"},
+    {"hotel", "resort", "lodging", "tourism", "tour", "guide", "surfing", "inn"},
+    {"computer", "programmer", "developer", "software", "encoder", "typing", "website"},
+    {"construction", "mason", "masonry", "builder", "laborer", "welding", "welder", "helper"},
+    {"salon", "barber", "haircut", "beauty", "spa", "massage", "parlor"},
+]
+
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+class HashingEncoder:
+    """Dependency-free encoder: signed feature hashing of words, trigrams and related-term groups."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f'hashing-{dim}-v1'
+        self._concepts = {}
+        for number, group in enumerate(RELATED_TERMS):
+            for word in group:
+                self._concepts[_stem(word)] = f'concept:{number}'
+
+    def _features(self, text: str):
+        for term in terms(text):
+            yield term, 1.0
+            concept = self._concepts.get(term)
+            if concept:
+                yield concept, 1.0
+            padded = f'#{term}#'
+            for i in range(len(padded) - 2):
+                yield 'tri:' + padded[i:i + 3], 0.25
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text or ''):
+                h = _hash(feature)
+                vectors[row, h % self.dim] += weight if h & 0x80000000 else -weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+
+class SentenceEncoder:
+    """Small sentence-transformers model on CPU, e.g. all-MiniLM-L6-v2 (384 dimensions)."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def encode(self, texts):
+        return self.model.encode(list(texts), batch_size=ENCODE_BATCH, convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False).astype(np.float32)
+
+
+def load_encoder(kind: str = EMBEDDING_ENCODER):
+    """The configured encoder; ``auto`` uses the model when sentence-transformers is installed."""
+    if kind in ('auto', 'model'):
+        try:
+            return SentenceEncoder()
+        except Exception as e:
+            if kind == 'model':
+                raise
+            logger.info(f"Using the hashing encoder for listings ({str(e)})")
+    return HashingEncoder()
+
+
+def listing_text(kind: str, record: dict) -> str:
+    """The text that gets embedded for one listing."""
+    parts = [kind, record.get('title'), record.get('category'), record.get('business_name'),
+             record.get('location'), (record.get('description') or '')[:DESCRIPTION_CHARS]]
+    return ' '.join(str(p) for p in parts if p)
+
+
+class EmbeddingIndex:
+    """Normalized listing vectors in one float16 matrix, one row per listing.
+
+    ``_keys[row]`` is the ``(kind, id)`` of each row and ``_rows`` maps back.
+    Removing a listing moves the last row into its place, so the matrix stays
+    dense. Searches use a float32 copy of the matrix (rebuilt lazily after
+    writes) because NumPy has no fast float16 matrix-vector product.
+    """
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self._lock = threading.Lock()
+        self._keys = []
+        self._rows = {}
+        self._records = []
+        self._hashes = []
+        self._vectors = np.zeros((0, encoder.dim), dtype=np.float16)
+        self._matrix = None
+        self.loaded = False
+        self.version = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def upsert_many(self, items):
+        """Insert or replace ``(kind, id, record)`` items. Only changed texts are encoded."""
+        changed = []
+        for kind, listing_id, record in items:
+            record = {field: record.get(field) for field in _FIELDS if record.get(field) is not None}
+            text = listing_text(kind, record)
+            digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+            key = (kind, str(listing_id))
+            with self._lock:
+                row = self._rows.get(key)
+                if row is not None and self._hashes[row] == digest:
+                    self._records[row] = dict(record, id=key[1], type=kind)
+                    continue
+            changed.append((key, record, text, digest))
+
+        for start in range(0, len(changed), ENCODE_BATCH):
+            batch = changed[start:start + ENCODE_BATCH]
+            vectors = self.encoder.encode([text for _, _, text, _ in batch]).astype(np.float16)
+            with self._lock:
+                new_rows = []
+                for (key, record, _, digest), vector in zip(batch, vectors):
+                    record = dict(record, id=key[1], type=key[0])
+                    row = self._rows.get(key)
+                    if row is None:
+                        self._rows[key] = len(self._keys)
+                        self._keys.append(key)
+                        self._records.append(record)
+                        self._hashes.append(digest)
+                        new_rows.append(vector)
+                    else:
+                        self._vectors[row] = vector
+                        self._records[row] = record
+                        self._hashes[row] = digest
+                if new_rows:
+                    self._vectors = np.vstack([self._vectors, np.asarray(new_rows, dtype=np.float16)])
+                self._matrix = None
+                self.version += 1
+        return len(changed)
+
+    def upsert(self, kind: str, listing_id: str, record: dict):
+        return self.upsert_many([(kind, listing_id, record)])
+
+    def remove(self, kind: str, listing_id: str):
+        with self._lock:
+            row = self._rows.pop((kind, str(listing_id)), None)
+            if row is None:
+                return False
+            last = len(self._keys) - 1
+            if row != last:
+                self._keys[row] = self._keys[last]
+                self._records[row] = self._records[last]
+                self._hashes[row] = self._hashes[last]
+                self._vectors[row] = self._vectors[last]
+                self._rows[self._keys[row]] = row
+            self._keys.pop()
+            self._records.pop()
+            self._hashes.pop()
+            self._vectors = self._vectors[:last]
+            self._matrix = None
+            self.version += 1
+            return True
+
+    def build(self, driver, database, incremental: bool = True):
+        """Sync with every active listing in Neo4j. Returns ``(encoded, removed)``."""
+        items = []
+        with driver.session(database=database) as session:
+            for kind, query in _LOAD_QUERIES.items():
+                for row in session.run(query):
+                    data = dict(row)
+                    if data.get('id') and is_active(data.get('status')):
+                        items.append((kind, str(data['id']), data))
+        if not incremental:
+            with self._lock:
+                self._keys, self._rows, self._records, self._hashes = [], {}, [], []
+                self._vectors = np.zeros((0, self.encoder.dim), dtype=np.float16)
+                self._matrix = None
+        seen = {(kind, listing_id) for kind, listing_id, _ in items}
+        encoded = self.upsert_many(items)
+        with self._lock:
+            stale = [key for key in self._keys if key not in seen]
+        for kind, listing_id in stale:
+            self.remove(kind, listing_id)
+        self.loaded = True
+        logger.info(f"Embedding index synced: {len(self)} listings, {encoded} encoded, {len(stale)} removed")
+        return encoded, len(stale)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._lock:
+            data = {
+                'vectors': self._vectors,
+                'kinds': np.array([k for k, _ in self._keys], dtype=str),
+                'ids': np.array([i for _, i in self._keys], dtype=str),
+                'hashes': np.array(self._hashes, dtype=str),
+                'records': np.array(json.dumps(self._records)),
+                'encoder': np.array(self.encoder.name),
+            }
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **data)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str = INDEX_PATH):
+        """Load a saved index. Raises ValueError if it was built with another encoder."""
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['encoder']) != self.encoder.name:
+                raise ValueError(f"index was built with {data['encoder']}, not {self.encoder.name}")
+            vectors = data['vectors'].astype(np.float16)
+            keys = list(zip(data['kinds'].tolist(), data['ids'].tolist()))
+            hashes = data['hashes'].tolist()
+            records = json.loads(str(data['records']))
+        with self._lock:
+            self._vectors = vectors
+            self._keys = keys
+            self._rows = {key: row for row, key in enumerate(keys)}
+            self._hashes = hashes
+            self._records = records
+            self._matrix = None
+            self.loaded = True
+            self.version += 1
+        return len(keys)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def search(self, query: str, k: int = 5, kinds=None, min_score: float = MIN_SCORE):
+        """Return up to ``k`` ``(record, score)`` pairs by cosine similarity, best first."""
+        vector = self.encoder.encode([query])[0]
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = self._vectors.astype(np.float32)
+            # Copies: upsert_many and remove change the lists in place
+            matrix, keys, records = self._matrix, list(self._keys), list(self._records)
+        if not keys:
+            return []
+        scores = matrix @ vector
+        if kinds:
+            scores = np.where(np.isin([kind for kind, _ in keys], list(kinds)), scores, -1.0)
+        k = min(k, len(keys))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(records[i], float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_embedding_index() -> EmbeddingIndex:
+    """Return the process-wide index, loading it from disk (or building it once) on first use."""
+    global _index
+    if _index is None or not _index.loaded:
+        with _index_lock:
+            if _index is None:
+                _index = EmbeddingIndex(load_encoder())
+            if not _index.loaded:
+                start = time.perf_counter()
+                try:
+                    count = _index.load(INDEX_PATH)
+                    logger.info(f"Loaded {count} listing embeddings in {time.perf_counter() - start:.2f}s")
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"No usable embedding index at {INDEX_PATH} ({str(e)}); building it")
+                    try:
+                        from database import get_neo4j_driver, DATABASE
+                        _index.build(get_neo4j_driver(), DATABASE, incremental=False)
+                        _index.save(INDEX_PATH)
+                    except Exception as e:
+                        logger.error(f"Could not build embedding index: {str(e)}")
+                        # Don't retry on every message; the write hooks still fill it
+                        _index.loaded = True
+    return _index
+
+
+def loaded_embedding_index():
+    """The process-wide index if it has been loaded, else None. Never loads the encoder."""
+    index = _index
+    return index if index is not None and index.loaded else None
@@ -4,6 +4,11 @@ import uuid
 from datetime import datetime
 from neo4j import GraphDatabase
 from database import driver, DATABASE, get_neo4j_driver
+from geo.gazetteer import location_condition, municipality_id_for
+from geo.listings import listing_saved, listing_removed
+from geo.points import position_cypher
+from admin_users import sort_keys
+import activity_stats
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
@@ -198,7 +203,8 @@ class Notification:
 class Service:
     def __init__(self, id=None, title=None, description=None, category=None, budget=None, 
                  duration=None, location=None, requirements=None, client_id=None, 
-                 status='open', created_at=None):
+                 status='open', created_at=None, latitude=None, longitude=None, position=None,
+                 municipality_id=None):
         self.id = id or str(uuid.uuid4())
         self.title = title
         self.description = description
@@ -207,6 +213,10 @@ class Service:
         self.duration = duration
         self.location = location
         self.requirements = requirements
+        self.latitude = latitude
+        self.longitude = longitude
+        self.position = position
+        self.municipality_id = municipality_id or municipality_id_for(location)
         self.client_id = client_id
         self.status = status
         self.created_at = created_at or datetime.now().isoformat()
@@ -225,7 +235,8 @@ class Service:
                     location: $location,
                     requirements: $requirements,
                     status: $status,
-                    created_at: $created_at
+                    created_at: $created_at,
+                    municipality_id: $municipality_id
                 }
                 WITH s
                 MATCH (c:User {id: $client_id})
@@ -242,10 +253,12 @@ class Service:
                 requirements=self.requirements,
                 status=self.status,
                 created_at=self.created_at,
+                municipality_id=self.municipality_id,
                 client_id=self.client_id
             )
             record = result.single()
             if record:
+                listing_saved('service', record['s'])
                 return self
             return None
 
@@ -353,7 +366,10 @@ class Service:
                 service_id=self.id,
                 job_seeker_id=job_seeker_id
             )
-            return result.single() is not None
+            accepted = result.single() is not None
+            if accepted:
+                listing_removed('service', self.id)
+            return accepted
 
     @staticmethod
     def get_offers_by_job_seeker(job_seeker_id):
@@ -369,7 +385,9 @@ class User(UserMixin):
                  education=None, resume_path=None, permit_path=None, id_front_path=None, id_back_path=None,
                  verification_status='pending_verification',
                  google_id=None, profile_picture=None, name=None, verification_notes=None, 
-                 verified_by=None, verified_at=None, is_admin=False):
+                 verified_by=None, verified_at=None, is_admin=False, home_latitude=None,
+                 home_longitude=None, home_address=None, latitude=None, longitude=None,
+                 municipality_id=None):
         # Handle legacy name field
         if name and not any([first_name, last_name]):
             name_parts = name.split()
@@ -402,6 +420,14 @@ class User(UserMixin):
         self.is_admin = is_admin
         self.google_id = google_id  # Added for Google OAuth
         self.profile_picture = profile_picture  # Added for Google profile picture
+        # Geocoded address, cached by the "jobs near me" feed
+        self.home_latitude = home_latitude
+        self.home_longitude = home_longitude
+        self.home_address = home_address
+        # Business owners: map position and gazetteer municipality
+        self.latitude = latitude
+        self.longitude = longitude
+        self.municipality_id = municipality_id
 
     @property
     def names(self):
@@ -464,6 +490,7 @@ class User(UserMixin):
                 result = session.run("""
                     MATCH (u:User {id: $user_id})
                     SET u.verification_status = 'verified',
+                        u.updated_at = timestamp(),
                         u.verification_notes = $notes,
                         u.verified_by = $admin_email,
                         u.verified_at = datetime()
@@ -491,6 +518,7 @@ class User(UserMixin):
                 result = session.run("""
                     MATCH (u:User {id: $user_id})
                     SET u.verification_status = 'rejected',
+                        u.updated_at = timestamp(),
                         u.verification_notes = $notes,
                         u.verified_by = $admin_email,
                         u.verified_at = datetime()
@@ -604,6 +632,8 @@ class User(UserMixin):
                     'google_id': self.google_id,
                     'profile_picture': self.profile_picture
                 }
+                # Indexed keys for the admin user list (admin_users)
+                user_data.update(sort_keys(self.email, self.first_name, self.last_name))
                 
                 # Add password if set
                 if self.password:
@@ -613,11 +643,14 @@ class User(UserMixin):
                 result = session.run(
                     """
                     MERGE (u:User {id: $id})
-                    SET u += $user_data
+                    ON CREATE SET u.created_at = $created_at
+                    SET u += $user_data,
+                        u.updated_at = timestamp()
                     RETURN u
                     """,
                     id=self.id,
-                    user_data=user_data
+                    user_data=user_data,
+                    created_at=datetime.now().isoformat()
                 )
                 return result.single() is not None
         except Exception as e:
@@ -660,7 +693,10 @@ class User(UserMixin):
                         verification_notes=user.get("verification_notes"),
                         verified_by=user.get("verified_by"),
                         verified_at=user.get("verified_at"),
-                        is_admin=user.get("is_admin", False)
+                        is_admin=user.get("is_admin", False),
+                        home_latitude=user.get("home_latitude"),
+                        home_longitude=user.get("home_longitude"),
+                        home_address=user.get("home_address")
                     )
                 return None
         except Exception as e:
@@ -700,7 +736,10 @@ class User(UserMixin):
             verification_notes=node_data.get("verification_notes"),
             verified_by=node_data.get("verified_by"),
             verified_at=node_data.get("verified_at"),
-            is_admin=node_data.get("is_admin", False)
+            is_admin=node_data.get("is_admin", False),
+            home_latitude=node_data.get("home_latitude"),
+            home_longitude=node_data.get("home_longitude"),
+            home_address=node_data.get("home_address")
         )
     @classmethod
     def get_by_google_id(cls, google_id):
@@ -738,7 +777,7 @@ class User(UserMixin):
             return []
 
 class Business:
-    def __init__(self, id=None, name=None, description=None, location=None, category=None, phone=None, email=None, website=None, owner=None, latitude=None, longitude=None):
+    def __init__(self, id=None, name=None, description=None, location=None, category=None, phone=None, email=None, website=None, owner=None, latitude=None, longitude=None, position=None, municipality_id=None):
         self.id = id
         self.name = name
         self.description = description
@@ -750,12 +789,14 @@ class Business:
         self.owner = owner
         self.latitude = latitude
         self.longitude = longitude
+        self.position = position
+        self.municipality_id = municipality_id or municipality_id_for(location)
 
     def save(self):
         with driver.session(database=DATABASE) as session:
             result = session.run(
-                """
-                CREATE (b:Business {
+                f"""
+                CREATE (b:Business {{
                     id: $id,
                     name: $name,
                     description: $description,
@@ -765,10 +806,12 @@ class Business:
                     email: $email,
                     website: $website,
                     latitude: $latitude,
-                    longitude: $longitude
-                })
+                    longitude: $longitude,
+                    position: {position_cypher()},
+                    municipality_id: $municipality_id
+                }})
                 WITH b
-                MATCH (u:User {id: $owner_id})
+                MATCH (u:User {{id: $owner_id}})
                 CREATE (u)-[:OWNS]->(b)
                 RETURN b
                 """,
@@ -782,9 +825,12 @@ class Business:
                 website=self.website,
                 latitude=self.latitude,
                 longitude=self.longitude,
+                municipality_id=self.municipality_id,
                 owner_id=self.owner.id
             )
-            return result.single()["b"]
+            business = result.single()["b"]
+            listing_saved('business', business)
+            return business
 
     @staticmethod
     def get_by_owner_id(owner_id):
@@ -915,8 +961,7 @@ class Business:
                 params["query"] = query
 
             if location:
-                cypher_query += " AND b.location = $location"
-                params["location"] = location
+                cypher_query += f" AND {location_condition('b', location, params)}"
 
             if category:
                 cypher_query += " AND b.category = $category"
@@ -990,7 +1035,7 @@ class Business:
 class Job:
     def __init__(self, id=None, title=None, description=None, requirements=None, 
                     location=None, job_type=None, salary=None, business=None,
-                    created_at=None, latitude=None, longitude=None):
+                    created_at=None, latitude=None, longitude=None, position=None, municipality_id=None):
         self.id = id or str(uuid.uuid4())
         self.title = title
         self.description = description
@@ -1002,11 +1047,13 @@ class Job:
         self.created_at = created_at or datetime.now()
         self.latitude = latitude
         self.longitude = longitude
+        self.position = position
+        self.municipality_id = municipality_id or municipality_id_for(location)
 
     def save(self):
         with driver.session(database=DATABASE) as session:
-            result = session.run("""
-                CREATE (j:Job {
+            result = session.run(f"""
+                CREATE (j:Job {{
                     id: $id,
                     title: $title,
                     description: $description,
@@ -1016,10 +1063,12 @@ class Job:
                     salary: $salary,
                     created_at: $created_at,
                     latitude: $latitude,
-                    longitude: $longitude
-                })
+                    longitude: $longitude,
+                    position: {position_cypher()},
+                    municipality_id: $municipality_id
+                }})
                 WITH j
-                MATCH (b:Business {id: $business_id})
+                MATCH (b:Business {{id: $business_id}})
                 CREATE (b)-[:POSTED]->(j)
                 RETURN j
                 """,
@@ -1033,9 +1082,13 @@ class Job:
                 created_at=self.created_at.isoformat(),
                 latitude=self.latitude,
                 longitude=self.longitude,
+                municipality_id=self.municipality_id,
                 business_id=self.business.id
             )
-            return result.single()["j"]
+            job = result.single()["j"]
+            listing_saved('job', dict(job, business_name=self.business.name))
+            activity_stats.record('jobs')
+            return job
 
     @staticmethod
     def get_by_id(job_id):
@@ -1186,8 +1239,7 @@ class Job:
                 params["query"] = query
 
             if location:
-                cypher_query += " AND j.location = $location"
-                params["location"] = location
+                cypher_query += f" AND {location_condition('j', location, params)}"
 
             if job_type:
                 cypher_query += " AND j.job_type = $job_type"
@@ -1286,6 +1338,8 @@ class Application:
             result = session.run("""
                 MATCH (j:Job {id: $job_id})
                 MATCH (a:User {id: $applicant_id})
+                OPTIONAL MATCH (existing:Application {id: $id})
+                WITH j, a, existing IS NULL AS created
                 MERGE (app:Application {id: $id})
                 SET app.status = $status,
                     app.date_applied = $date_applied,
@@ -1294,7 +1348,7 @@ class Application:
                     app.feedback = $feedback
                 MERGE (a)-[:APPLIED_TO]->(app)
                 MERGE (app)-[:FOR_JOB]->(j)
-                RETURN app
+                RETURN app, created
                 """,
                 id=self.id,
                 job_id=self.job.id,
@@ -1306,8 +1360,18 @@ class Application:
                 feedback=self.feedback
             )
             record = result.single()
+            if record and record['created']:
+                activity_stats.record('applications')
             return record is not None
 
+    @staticmethod
+    def create(job_id, user_id):
+        """Apply ``user_id`` to ``job_id``; returns the saved Application or None."""
+        if Application.has_applied(user_id, job_id):
+            return None
+        application = Application(job=Job(id=job_id), applicant=User(id=user_id))
+        return application if application.save() else None
+
     @staticmethod
     def get_by_id(application_id):
         with driver.session(database=DATABASE) as session:
@@ -1,6 +1,9 @@
 import uuid
 from datetime import datetime
 from database import driver, DATABASE
+from geo.gazetteer import location_condition, municipality_id_for
+from geo.listings import listing_saved
+from geo.points import position_cypher, nearby_params, bbox_predicate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,7 +14,7 @@ class Business:
 
     def __init__(self, id=None, name=None, description=None, category=None,
                  location=None, latitude=None, longitude=None, email=None, phone=None,
-                 website=None, created_at=None):
+                 website=None, created_at=None, position=None, municipality_id=None):
         self.id = id or str(uuid.uuid4())
         self.name = name
         self.description = description
@@ -20,6 +23,8 @@ class Business:
         # Normalize coordinate property names
         self.latitude = latitude
         self.longitude = longitude
+        self.position = position
+        self.municipality_id = municipality_id or municipality_id_for(location)
         self.email = email
         self.phone = phone
         self.website = website
@@ -31,8 +36,8 @@ class Business:
                 logger.error('Driver not initialized when saving business')
                 return False
             with driver.session(database=DATABASE) as session:
-                result = session.run("""
-                    MERGE (b:Business {id: $id})
+                result = session.run(f"""
+                    MERGE (b:Business {{id: $id}})
                     SET
                         b.name = $name,
                         b.description = $description,
@@ -40,13 +45,18 @@ class Business:
                         b.location = $location,
                         b.latitude = $latitude,
                         b.longitude = $longitude,
+                        b.position = {position_cypher()},
+                        b.municipality_id = $municipality_id,
                         b.email = $email,
                         b.phone = $phone,
                         b.website = $website,
                         b.created_at = $created_at
                     RETURN b
                 """, self.__dict__)
-                return bool(result.single())
+                record = result.single()
+                if record:
+                    listing_saved('business', record['b'])
+                return bool(record)
         except Exception as e:
             logger.error(f"Error saving business: {str(e)}")
             return False
@@ -100,8 +110,7 @@ class Business:
             params["category"] = category
 
         if location:
-            conditions.append("b.location = $location")
-            params["location"] = location
+            conditions.append(location_condition('b', location, params))
 
         where_clause = " AND ".join(conditions) if conditions else "true"
 
@@ -123,18 +132,15 @@ class Business:
         """Get businesses within a radius (in km) of a point."""
         with driver.session(database=DATABASE) as session:
             result = session.run(
-                """
+                f"""
                 MATCH (b:Business)
-                WITH b, point({latitude: b.latitude, longitude: b.longitude}) AS p1, 
-                     point({latitude: $lat, longitude: $lng}) AS p2
-                WITH b, distance(p1, p2) / 1000 AS distance
+                WHERE {bbox_predicate('b')}
+                WITH b, point.distance(b.position, point({{latitude: $lat, longitude: $lng}})) / 1000 AS distance
                 WHERE distance <= $radius
                 RETURN b, distance
                 ORDER BY distance
                 """,
-                lat=latitude,
-                lng=longitude,
-                radius=radius
+                **nearby_params(latitude, longitude, radius)
             )
             return [(Business.from_dict(record["b"]), record["distance"]) 
                    for record in result]
@@ -144,7 +150,7 @@ class ServiceRequest:
 
     def __init__(self, id=None, type=None, description=None, category=None,
                  location=None, latitude=None, longitude=None, payment=None, status="open",
-                 skills_required=None, user_id=None, created_at=None):
+                 skills_required=None, user_id=None, created_at=None, position=None, municipality_id=None):
         self.id = id or str(uuid.uuid4())
         self.type = type
         self.description = description
@@ -152,6 +158,8 @@ class ServiceRequest:
         self.location = location
         self.latitude = latitude
         self.longitude = longitude
+        self.position = position
+        self.municipality_id = municipality_id or municipality_id_for(location)
         self.payment = payment
         self.status = status
         self.skills_required = skills_required or []
@@ -164,9 +172,9 @@ class ServiceRequest:
                 logger.error('Driver not initialized when saving service request')
                 return False
             with driver.session(database=DATABASE) as session:
-                result = session.run("""
-                    MATCH (u:User {id: $user_id})
-                    MERGE (s:ServiceRequest {id: $id})
+                result = session.run(f"""
+                    MATCH (u:User {{id: $user_id}})
+                    MERGE (s:ServiceRequest {{id: $id}})
                     SET
                         s.type = $type,
                         s.description = $description,
@@ -174,6 +182,8 @@ class ServiceRequest:
                         s.location = $location,
                         s.latitude = $latitude,
                         s.longitude = $longitude,
+                        s.position = {position_cypher()},
+                        s.municipality_id = $municipality_id,
                         s.payment = $payment,
                         s.status = $status,
                         s.skills_required = $skills_required,
@@ -181,7 +191,10 @@ class ServiceRequest:
                     MERGE (s)-[:POSTED_BY]->(u)
                     RETURN s
                 """, self.__dict__)
-                return bool(result.single())
+                record = result.single()
+                if record:
+                    listing_saved('service', record['s'])
+                return bool(record)
         except Exception as e:
             logger.error(f"Error saving service request: {str(e)}")
             return False
@@ -249,8 +262,7 @@ class ServiceRequest:
             params["category"] = category
 
         if location:
-            conditions.append("s.location = $location")
-            params["location"] = location
+            conditions.append(location_condition('s', location, params))
 
         where_clause = " AND ".join(conditions)
 
@@ -273,20 +285,16 @@ class ServiceRequest:
         """Get service requests within a radius (in km) of a point."""
         with driver.session(database=DATABASE) as session:
             result = session.run(
-                """
+                f"""
                 MATCH (s:ServiceRequest)-[:POSTED_BY]->(u:User)
-                WHERE s.status = $status
-                WITH s, u, point({latitude: s.latitude, longitude: s.longitude}) AS p1, 
-                     point({latitude: $lat, longitude: $lng}) AS p2
-                WITH s, u, distance(p1, p2) / 1000 AS distance
+                WHERE {bbox_predicate('s')} AND s.status = $status
+                WITH s, u, point.distance(s.position, point({{latitude: $lat, longitude: $lng}})) / 1000 AS distance
                 WHERE distance <= $radius
                 RETURN s, u, distance
                 ORDER BY distance
                 """,
-                lat=latitude,
-                lng=longitude,
-                radius=radius,
-                status=status
+                status=status,
+                **nearby_params(latitude, longitude, radius)
             )
             return [(ServiceRequest.from_dict(record["s"], User.from_dict(record["u"])), 
-                    record["distance"]) for record in result]
\ No newline at end of file
+                    record["distance"]) for record in result]
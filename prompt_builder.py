@@ -0,0 +1,166 @@
+"""
+Token-budgeted prompt assembly for the local model and Gemini.
+
+A prompt is made of four segments: the system prompt, retrieved context, the
+conversation history and the user's question. ``PromptBuilder`` counts the
+tokens of each segment and trims by priority until the prompt fits a budget:
+
+1. the oldest history turns are dropped
+2. the context is cut from the end
+3. the system prompt is cut from the end
+4. the question is cut from the end (only when it alone exceeds the budget)
+
+Token ids of the system prompt are cached, so it is tokenized once per process
+rather than on every request. With a real tokenizer the builder also returns
+the concatenated input ids, ready for ``generate``. For Gemini, which has no
+local tokenizer, ``ApproxTokenizer`` counts words and punctuation.
+"""
+
+import logging
+import re
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Trimmed segment texts, the input ids (tokenizer builders only) and token counts
+Prompt = namedtuple('Prompt', 'system context history question input_ids counts trimmed')
+
+
+class ApproxTokenizer:
+    """Word/punctuation splitter approximating subword token counts without a model."""
+
+    _PIECE = re.compile(r'\w+\s*|[^\w\s]\s*|\s+')
+
+    def encode(self, text: str):
+        return self._PIECE.findall(text or '')
+
+    def decode(self, pieces) -> str:
+        return ''.join(pieces)
+
+
+class PromptBuilder:
+    def __init__(self, budget: int, encode, decode, eos_id=None, reserve: int = 0):
+        """
+        ``encode(text) -> tokens`` and ``decode(tokens) -> text`` define the token
+        space; ``eos_id`` is appended to ``input_ids`` when given. ``reserve``
+        tokens of the budget are left unused (e.g. for the reply).
+        """
+        self.budget = budget
+        self.encode = encode
+        self.decode = decode
+        self.eos_id = eos_id
+        self.reserve = reserve
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self.cache_hits = self.cache_misses = 0
+
+    @classmethod
+    def for_tokenizer(cls, tokenizer, budget: int):
+        """Builder for a Hugging Face tokenizer, producing ``input_ids``."""
+        return cls(
+            budget,
+            encode=lambda text: tokenizer.encode(text, add_special_tokens=False),
+            decode=lambda ids: tokenizer.decode(ids, skip_special_tokens=True),
+            eos_id=tokenizer.eos_token_id,
+        )
+
+    @classmethod
+    def approximate(cls, budget: int, reserve: int = 0):
+        """Builder counting approximate tokens, for APIs without a local tokenizer."""
+        tokenizer = ApproxTokenizer()
+        return cls(budget, tokenizer.encode, tokenizer.decode, reserve=reserve)
+
+    def cached_encode(self, text: str):
+        """Encode text that repeats across requests (the system prompt) once."""
+        with self._cache_lock:
+            tokens = self._cache.get(text)
+            if tokens is None:
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+        if tokens is None:
+            tokens = list(self.encode(text))
+            with self._cache_lock:
+                if len(self._cache) >= 8:
+                    self._cache.clear()
+                self._cache[text] = tokens
+        return tokens
+
+    def build(self, question: str, system: str = '', context: str = '', history=(),
+              system_format='{}\n\n', context_format='Context:\n{}\n\n',
+              turn_format='{role}: {content}\n', question_format='User: {}\nAssistant:'):
+        """Fit the segments into the budget and return a ``Prompt``.
+
+        ``history`` is a list of ``{"role", "content"}`` dicts, oldest first.
+        The ``*_format`` strings wrap each segment and are counted in the budget.
+        Untrimmed segment texts are returned as given; trimmed ones are decoded
+        from their wrapped tokens, so callers that use the texts directly
+        (Gemini) pass plain ``'{}'`` formats.
+        """
+        budget = max(1, self.budget - self.reserve - (1 if self.eos_id is not None else 0))
+
+        # Copy: trimming below must not modify the cached ids
+        system_tokens = list(self.cached_encode(system_format.format(system))) if system else []
+        context_tokens = list(self.encode(context_format.format(context))) if context else []
+        question_tokens = list(self.encode(question_format.format(question)))
+        turns = [(turn, list(self.encode(turn_format.format(
+                    role='Assistant' if turn.get('role') == 'assistant' else 'User',
+                    content=turn.get('content', '')))))
+                 for turn in history or ()]
+
+        def total():
+            return (len(system_tokens) + len(context_tokens) + len(question_tokens)
+                    + sum(len(tokens) for _, tokens in turns))
+
+        trimmed = []
+        over = total() - budget
+        # 1. oldest history turns
+        while over > 0 and turns:
+            over -= len(turns.pop(0)[1])
+            if 'history' not in trimmed:
+                trimmed.append('history')
+        # 2-4. cut context, then system, then question from the end
+        for name in ('context', 'system', 'question'):
+            if over <= 0:
+                break
+            tokens = {'context': context_tokens, 'system': system_tokens, 'question': question_tokens}[name]
+            cut = min(over, len(tokens))
+            if cut:
+                del tokens[len(tokens) - cut:]
+                over -= cut
+                trimmed.append(name)
+
+        counts = {
+            'system': len(system_tokens),
+            'context': len(context_tokens),
+            'history': sum(len(tokens) for _, tokens in turns),
+            'question': len(question_tokens),
+        }
+        counts['total'] = sum(counts.values())
+        if trimmed:
+            logger.info(f"Prompt trimmed ({', '.join(trimmed)}) to fit {self.budget} tokens: {counts}")
+        else:
+            logger.debug(f"Prompt tokens: {counts}")
+
+        input_ids = None
+        if self.eos_id is not None:
+            input_ids = system_tokens + context_tokens
+            for _, tokens in turns:
+                input_ids = input_ids + tokens
+            input_ids = input_ids + question_tokens + [self.eos_id]
+
+        return Prompt(
+            system=self._strip(system, system_tokens, 'system' in trimmed),
+            context=self._strip(context, context_tokens, 'context' in trimmed),
+            history=[turn for turn, _ in turns],
+            question=self._strip(question, question_tokens, 'question' in trimmed),
+            input_ids=input_ids,
+            counts=counts,
+            trimmed=trimmed,
+        )
+
+    def _strip(self, original: str, tokens, was_trimmed: bool) -> str:
+        if not was_trimmed:
+            return original or ''
+        return self.decode(tokens).strip()
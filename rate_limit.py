@@ -0,0 +1,224 @@
+"""
+Rate limiting and fair queueing for the chat API.
+
+``/api/chat`` is open to anonymous visitors, and every call can hold one of
+the four gunicorn threads for seconds while spending Gemini quota. Two
+limits protect the rest of the site:
+
+- Token buckets per client. Logged-in users get a bucket per user id,
+  anonymous visitors one per IP (``request.remote_addr``, already corrected
+  by ProxyFix). An empty bucket is answered right away with 429 and
+  ``Retry-After``.
+- A concurrency cap on chat requests. Requests over the cap wait in a short
+  FIFO queue (first come, first served) and get a 429 when the queue is full
+  or their wait runs out.
+
+Bucket state is kept in a SQLite file under ``instance/`` (``RATE_LIMIT_DB``)
+so the limits hold across workers and restarts. There is no Redis or
+memcached in this deployment. The concurrency cap is per process, which with
+``--workers=1`` covers the whole app.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from flask import Response, jsonify, request
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv(
+    'RATE_LIMIT_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'rate_limits.db')
+)
+
+# Requests per minute and burst size
+CHAT_IP_PER_MINUTE = float(os.getenv('CHAT_IP_PER_MINUTE', 10))
+CHAT_IP_BURST = float(os.getenv('CHAT_IP_BURST', 5))
+CHAT_USER_PER_MINUTE = float(os.getenv('CHAT_USER_PER_MINUTE', 20))
+CHAT_USER_BURST = float(os.getenv('CHAT_USER_BURST', 8))
+
+CHAT_MAX_CONCURRENT = int(os.getenv('CHAT_MAX_CONCURRENT', 3))
+CHAT_MAX_WAITING = int(os.getenv('CHAT_MAX_WAITING', 6))
+CHAT_MAX_WAIT = float(os.getenv('CHAT_MAX_WAIT', 2.0))
+# Retry-After sent when the concurrency queue is full
+BUSY_RETRY_AFTER = 2
+
+ERROR_RATE_LIMITED = 'error_rate_limited'
+
+# Buckets untouched for this long are deleted
+IDLE_SECONDS = 3600
+PRUNE_EVERY = 500
+
+
+class TokenBuckets:
+    """Token buckets stored in SQLite, shared by every process using the same file."""
+
+    def __init__(self, path: str = DB_PATH, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit mode so BEGIN IMMEDIATE below controls the transaction
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, per_minute: float, burst: float, cost: float = 1.0):
+        """Take ``cost`` tokens from ``key``'s bucket.
+
+        Returns ``(allowed, retry_after_seconds)``. The read-refill-write runs
+        in one ``BEGIN IMMEDIATE`` transaction, so concurrent workers can't
+        both spend the same token.
+        """
+        rate = per_minute / 60.0
+        now = self.clock()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._calls += 1
+        if self._calls % PRUNE_EVERY == 0:
+            self.prune()
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / rate if rate > 0 else float(IDLE_SECONDS)
+
+    def prune(self, idle_seconds: float = IDLE_SECONDS):
+        conn = self._connection()
+        conn.execute("DELETE FROM buckets WHERE updated < ?", (self.clock() - idle_seconds,))
+
+
+class FairLimiter:
+    """Concurrency cap with a bounded FIFO wait queue.
+
+    A finishing request hands its slot straight to the oldest waiter, so a
+    newcomer can never overtake the queue.
+    """
+
+    def __init__(self, limit: int = CHAT_MAX_CONCURRENT, max_waiting: int = CHAT_MAX_WAITING):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.rejected = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float = CHAT_MAX_WAIT) -> bool:
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return True
+            if len(self._waiters) >= self.max_waiting:
+                self.rejected += 1
+                return False
+            turn = threading.Event()
+            self._waiters.append(turn)
+        if turn.wait(timeout):
+            return True
+        with self._lock:
+            if turn.is_set():
+                # The slot was handed over just as the wait timed out
+                return True
+            self._waiters.remove(turn)
+            self.rejected += 1
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # Hand the slot over; ``active`` stays the same
+                self._waiters.popleft().set()
+            else:
+                self.active -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'active': self.active, 'waiting': len(self._waiters), 'rejected': self.rejected}
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+chat_limiter = FairLimiter()
+
+
+def get_buckets() -> TokenBuckets:
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                _buckets = TokenBuckets()
+    return _buckets
+
+
+def _too_many(retry_after: float, message: str):
+    response = jsonify({
+        'status': 'error',
+        'error': ERROR_RATE_LIMITED,
+        'message': message
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def chat_rate_limited(f):
+    """Apply the per-client bucket and the concurrency cap to a chat view.
+
+    Streaming responses keep their slot until the response is closed.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_user.is_authenticated:
+            key, per_minute, burst = f'chat:user:{current_user.id}', CHAT_USER_PER_MINUTE, CHAT_USER_BURST
+        else:
+            key, per_minute, burst = f'chat:ip:{request.remote_addr}', CHAT_IP_PER_MINUTE, CHAT_IP_BURST
+        try:
+            allowed, retry_after = get_buckets().take(key, per_minute, burst)
+        except sqlite3.Error as e:
+            # Fail open: a locked or broken limiter file must not take chat down
+            logger.error(f"Rate limiter unavailable: {str(e)}")
+            allowed, retry_after = True, 0.0
+        if not allowed:
+            logger.info(f"Rate limited {key} for {retry_after:.1f}s")
+            return _too_many(retry_after, 'Too many messages. Please wait a moment before trying again.')
+
+        if not chat_limiter.acquire():
+            return _too_many(BUSY_RETRY_AFTER, 'The assistant is busy right now. Please try again shortly.')
+        try:
+            result = f(*args, **kwargs)
+        except Exception:
+            chat_limiter.release()
+            raise
+        if isinstance(result, Response) and result.is_streamed:
+            result.call_on_close(chat_limiter.release)
+        else:
+            chat_limiter.release()
+        return result
+    return decorated_function
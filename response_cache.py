@@ -0,0 +1,151 @@
+"""
+Response cache for repeated chatbot questions.
+
+Many messages are the same FAQ in different words ("How do I apply for a
+job?", "how to apply for jobs"). Before this cache, each one cost a Gemini
+round trip or a beam search on the local model. Replies are cached under:
+
+- the normalized question: lowercased, without punctuation or stop words,
+  stemmed and sorted, so word order and filler words don't matter
+- the context version: a hash of the retrieved context (Gemini) or the
+  listing index version (local model). When the listings behind an answer
+  change, the old entry stops matching
+
+With ``RESPONSE_CACHE_SIMILARITY`` set (e.g. 0.9), a question that misses
+the exact key may still reuse the reply of a cached question with the same
+context whose hashed embedding is at least that similar.
+
+Questions about the user's own data ("my applications", emails, phone
+numbers) and follow-ups that depend on earlier turns ("what about there?")
+are never cached. Entries expire after ``RESPONSE_CACHE_TTL`` seconds, and
+the least recently used entries are evicted above ``RESPONSE_CACHE_SIZE``.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from chatbot_pipeline import terms
+
+CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 3600))
+# 0 disables similarity lookups
+SIMILARITY = float(os.getenv('RESPONSE_CACHE_SIMILARITY', 0))
+
+# The answer depends on who is asking
+PERSONAL_WORDS = {'my', 'mine', 'myself', 'our', 'ours'}
+PERSONAL_PATTERN = re.compile(r'\S+@\S+|\d{4,}')
+# The answer depends on earlier turns
+FOLLOW_UP_WORDS = {'it', 'its', 'that', 'this', 'those', 'these', 'there', 'them', 'they',
+                   'he', 'she', 'him', 'her', 'more', 'else', 'another', 'also', 'same',
+                   'previous', 'again', 'above', 'one', 'ones'}
+
+
+def normalize_question(text: str) -> str:
+    """Order-insensitive key of the question's content words."""
+    return ' '.join(sorted(terms(text or '')))
+
+
+def is_cacheable(text: str) -> bool:
+    """False for personalized questions and follow-ups."""
+    words = set(re.findall(r"[a-z']+", (text or '').lower()))
+    if words & PERSONAL_WORDS or words & FOLLOW_UP_WORDS:
+        return False
+    return not PERSONAL_PATTERN.search(text or '')
+
+
+def context_version(context) -> str:
+    """Short hash identifying the retrieved context a reply was built from."""
+    return hashlib.sha1(str(context or '').encode('utf-8')).hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL, similarity: float = SIMILARITY,
+                 encoder=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self.clock = clock
+        self._encoder = encoder
+        self._data = OrderedDict()  # (version, normalized) -> (expires, reply, vector)
+        self._lock = threading.Lock()
+        self.hits = self.similar_hits = self.misses = self.bypassed = 0
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            from listing_embeddings import HashingEncoder
+            self._encoder = HashingEncoder(dim=256)
+        return self._encoder
+
+    def key(self, question: str, version=''):
+        """The cache key, or None when the question must not be cached."""
+        if not is_cacheable(question):
+            return None
+        normalized = normalize_question(question)
+        return (str(version), normalized) if normalized else None
+
+    def get(self, question: str, version=''):
+        key = self.key(question, version)
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        now = self.clock()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] >= now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            candidates = [(k, v) for k, v in self._data.items()
+                          if self.similarity and k[0] == key[0] and v[0] >= now and v[2] is not None]
+        if candidates:
+            vector = self.encoder.encode([key[1]])[0]
+            scores = np.stack([v[2] for _, v in candidates]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity:
+                with self._lock:
+                    self.similar_hits += 1
+                return candidates[best][1][1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, question: str, reply: str, version=''):
+        key = self.key(question, version)
+        if key is None or not reply:
+            return
+        vector = self.encoder.encode([key[1]])[0] if self.similarity else None
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, reply, vector)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_rate': round((self.hits + self.similar_hits) / lookups, 3) if lookups else None,
+            }
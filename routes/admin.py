@@ -1,7 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_required
+import logging
+import math
+import time
+
+from flask import Blueprint, Response, jsonify, render_template, request, redirect, url_for, flash
+from flask_login import current_user, login_required
 from utils.decorators import admin_required
 from database import driver as neo4j_driver, DATABASE as NEO4J_DATABASE
+import activity_stats
+import admin_events
+import admin_users
+import analytics_export
+from rate_limit import chat_limiter
+
+logger = logging.getLogger(__name__)
 
 
 admin = Blueprint("admin", __name__, url_prefix="/admin")
@@ -63,34 +74,27 @@ def users():
     role = request.args.get("role")
     status = request.args.get("status")
     q = request.args.get("q", "").strip()
+    sort = request.args.get("sort", admin_users.DEFAULT_SORT)
+    descending = request.args.get("order") == "desc"
+    cursor = request.args.get("cursor")
 
-    conditions = []
-    params = {}
-    if role:
-        conditions.append("u.role = $role")
-        params["role"] = role
-    if status:
-        conditions.append("u.verification_status = $status")
-        params["status"] = status
-    if q:
-        conditions.append("toLower(u.email) CONTAINS toLower($q) OR toLower(coalesce(u.first_name,'')) CONTAINS toLower($q) OR toLower(coalesce(u.last_name,'')) CONTAINS toLower($q)")
-        params["q"] = q
-
-    where_clause = (" WHERE " + " AND ".join(conditions)) if conditions else ""
-
-    users = []
+    if sort not in admin_users.SORT_KEYS:
+        sort = admin_users.DEFAULT_SORT
     with neo4j_driver.session(database=NEO4J_DATABASE) as session:
-        res = session.run(
-            f"""
-            MATCH (u:User){where_clause}
-            RETURN u ORDER BY toLower(u.email)
-            """,
-            **params,
-        )
-        for rec in res:
-            users.append(dict(rec["u"]))
+        try:
+            users, next_cursor = admin_users.list_users(
+                session, role=role, status=status, q=q, sort=sort, descending=descending, cursor=cursor
+            )
+        except ValueError:
+            flash("That page link has expired; showing the first page.", "warning")
+            users, next_cursor = admin_users.list_users(
+                session, role=role, status=status, q=q, sort=sort, descending=descending
+            )
+            cursor = None
 
-    return render_template("admin/users.html", users=users, q=q, role=role, status=status)
+    return render_template("admin/users.html", users=users, q=q, role=role, status=status,
+                           sort=sort, order="desc" if descending else "asc",
+                           cursor=cursor, next_cursor=next_cursor)
 
 
 @admin.route("/verifications", methods=["GET", "POST"])
@@ -103,15 +107,20 @@ def verifications():
         if email and action in {"approve", "reject"}:
             new_status = "verified" if action == "approve" else "rejected"
             with neo4j_driver.session(database=NEO4J_DATABASE) as session:
-                session.run(
+                row = session.run(
                     """
                     MATCH (u:User {email: $email})
-                    SET u.verification_status = $status
-                    RETURN u
+                    WITH u, u.verification_status AS previous
+                    SET u.verification_status = $status,
+                        u.updated_at = timestamp()
+                    RETURN u, previous
                     """,
                     email=email,
                     status=new_status,
-                )
+                ).single()
+            if row:
+                admin_events.verification_decided(dict(row["u"]), new_status, row["previous"],
+                                                  decided_by=current_user.email)
             flash("Status updated.", "success")
         return redirect(url_for("admin_blueprint.verifications"))
 
@@ -121,7 +130,7 @@ def verifications():
             """
             MATCH (u:User)
             WHERE u.verification_status = 'pending_verification'
-            RETURN u ORDER BY toLower(u.email)
+            RETURN u ORDER BY u.email_key
             """
         )
         for rec in res:
@@ -168,6 +177,20 @@ def services():
 @login_required
 @admin_required
 def reports():
+    """Reports from the columnar analytics export (``analytics_export``).
+
+    Until the first export exists only the live counts are shown; each
+    visit starts a background export when the files are stale.
+    """
+    analytics_export.refresh_in_background(neo4j_driver, NEO4J_DATABASE)
+    try:
+        analytics = analytics_export.report()
+    except Exception as e:
+        logger.error(f"Error reading the analytics export: {str(e)}")
+        analytics = None
+    if analytics is not None:
+        return render_template("admin/reports.html", data=analytics, analytics=analytics)
+
     data = {
         "verified_users": 0,
         "pending_users": 0,
@@ -194,6 +217,75 @@ def reports():
         if row:
             data["active_services"] = row["c"] or 0
 
-    return render_template("admin/reports.html", data=data)
+    return render_template("admin/reports.html", data=data, analytics=None)
+
+
+# Default chart range per interval, in seconds
+TIMESERIES_DEFAULT_RANGE = {"hour": 48 * 3600, "day": 30 * 24 * 3600}
+
+
+@admin.route("/reports/timeseries")
+@login_required
+@admin_required
+def reports_timeseries():
+    """Activity counts per hour or day from the ``activity_stats`` buckets.
+
+    Query: ``metric`` (comma separated, default all), ``interval`` (``day`` or
+    ``hour``), ``start`` and ``end`` (ISO dates or times; default the last 30
+    days or 48 hours).
+    """
+    interval = request.args.get("interval", "day")
+    metrics = [m for m in request.args.get("metric", "").split(",") if m] or list(activity_stats.METRICS)
+    if interval not in activity_stats.INTERVALS:
+        return jsonify({"error": f"interval must be one of {', '.join(activity_stats.INTERVALS)}"}), 400
+
+    end = analytics_export.to_epoch(request.args["end"]) if request.args.get("end") else time.time()
+    start = (analytics_export.to_epoch(request.args["start"]) if request.args.get("start")
+             else end - TIMESERIES_DEFAULT_RANGE[interval])
+    if math.isnan(start) or math.isnan(end) or start >= end:
+        return jsonify({"error": "start and end must be ISO dates with start before end"}), 400
+
+    stats = activity_stats.get_activity_stats()
+    series = {}
+    try:
+        for metric in metrics:
+            series[metric] = [
+                {"t": activity_stats.isoformat(ts), "count": count}
+                for ts, count in stats.series(metric, start, end, interval)
+            ]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "interval": interval,
+        "start": activity_stats.isoformat(start),
+        "end": activity_stats.isoformat(end),
+        "series": series,
+    })
+
+
+@admin.route("/events")
+@login_required
+@admin_required
+def events():
+    """Stream admin change events (see ``admin_events``) as Server-Sent Events."""
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    # A stream holds a thread like a chat reply does, so it takes a chat slot
+    if not chat_limiter.acquire(timeout=0):
+        return _streams_busy()
+    subscription = admin_events.bus.subscribe(last_id)
+    if subscription is None:
+        chat_limiter.release()
+        return _streams_busy()
+    response = Response(admin_events.bus.stream(subscription), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    response.call_on_close(chat_limiter.release)
+    return response
 
 
+def _streams_busy():
+    response = jsonify({"error": "Too many open event streams"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "30"
+    return response
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from database import get_neo4j_driver, DATABASE
+from geo.gazetteer import municipality_id_for
 
 bp = Blueprint('businesses', __name__)
 
@@ -55,8 +56,13 @@ def search_businesses():
             params['category'] = category
 
         if location:
-            conditions.append("(coalesce(u.location, u.province, u.city) = $location)")
-            params['location'] = location
+            municipality_id = municipality_id_for(location)
+            if municipality_id:
+                conditions.append("u.municipality_id = $municipality_id")
+                params['municipality_id'] = municipality_id
+            else:
+                conditions.append("(coalesce(u.location, u.province, u.city) = $location)")
+                params['location'] = location
 
         where_clause = ' AND '.join(conditions)
 
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, current_app
 from neo4j import exceptions as neo4j_exceptions
 from database import driver as neo4j_driver, DATABASE as NEO4J_DATABASE
+from geo.gazetteer import municipality_id_for
 
 businesses_bp = Blueprint('businesses', __name__)
 
@@ -49,7 +50,8 @@ def list_business_owners():
                     AND
                     CASE WHEN $category <> '' THEN category = $category ELSE true END
                     AND
-                    CASE WHEN $location <> '' THEN
+                    CASE WHEN $municipality_id IS NOT NULL THEN u.municipality_id = $municipality_id
+                    WHEN $location <> '' THEN
                         toLower(city) CONTAINS toLower($location) OR
                         toLower(province) CONTAINS toLower($location) OR
                         toLower(location) CONTAINS toLower($location)
@@ -60,7 +62,8 @@ def list_business_owners():
             result = session.run(owners_query, {
                 'query': query,
                 'category': category,
-                'location': location
+                'location': location,
+                'municipality_id': municipality_id_for(location)
             })
 
             for record in result:
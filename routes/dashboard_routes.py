@@ -2,9 +2,18 @@ from flask import Blueprint, redirect, render_template, url_for, jsonify, reques
 from flask_login import login_required, current_user
 from models import JobOffer, ServiceRequest
 from decorators import role_required
+from geo.cache import TTLCache
+from geo.clustering import cluster_points
+from geo.mercator import clamp_zoom, parse_bbox, snap_bbox
+from geo.spatial_index import get_spatial_index
+import os
 
 dashboard = Blueprint('dashboard', __name__)
 
+# Clustered viewport responses, keyed by (layer, zoom, tile range, filters, index version)
+MAP_CACHE_TTL = int(os.getenv('MAP_CACHE_TTL', 30))
+_map_cache = TTLCache(maxsize=512, ttl=MAP_CACHE_TTL)
+
 @dashboard.route('/dashboard')
 @login_required
 def dashboard_redirect():
@@ -202,41 +211,138 @@ def delete_service_request(service_id):
         return jsonify({'status': 'error', 'message': str(e)})
 
 # API endpoints for map data
+def _map_record(record):
+    """Shape a spatial index record like the map payloads maps.js expects."""
+    data = {
+        'id': record['id'],
+        'title': record.get('title'),
+        'location': record.get('location'),
+        'latitude': record['latitude'],
+        'longitude': record['longitude'],
+        'type': record['type']
+    }
+    if record['type'] == 'job':
+        data['business_name'] = record.get('business_name')
+    elif record['type'] == 'service':
+        data['payment_offer'] = record.get('payment_offer')
+    return data
+
+def _listing_filter():
+    """Build a record predicate from the ``category`` and ``municipality`` args."""
+    category = request.args.get('category')
+    municipality_id = request.args.get('municipality')
+    if not category and not municipality_id:
+        return None
+    return lambda record: ((not category or record.get('category') == category) and
+                           (not municipality_id or record.get('municipality_id') == municipality_id))
+
+def _viewport_response(layer, kinds):
+    """Serve the clustered listings of one layer inside the requested ``bbox``/``zoom``.
+
+    The bbox is snapped outward to whole map tiles at ``zoom`` so nearby
+    viewports share a cache entry; points just outside the viewport are harmless.
+    """
+    try:
+        bbox = parse_bbox(request.args['bbox'])
+        zoom = clamp_zoom(request.args.get('zoom', 12))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'bbox must be west,south,east,north and zoom an integer'}), 400
+
+    filters = (request.args.get('category') or '', request.args.get('municipality') or '')
+    tiles, snapped = snap_bbox(*bbox, zoom)
+    index = get_spatial_index()
+    key = (layer, zoom, tiles, filters, index.version)
+    payload = _map_cache.get(key)
+    if payload is None:
+        records, lats, lngs = index.bbox_arrays(*snapped, kinds=kinds, predicate=_listing_filter())
+        items = cluster_points(records, lats, lngs, zoom, to_point=_map_record)
+        payload = {
+            'zoom': zoom,
+            'bbox': [snapped[1], snapped[0], snapped[3], snapped[2]],
+            'total': len(records),
+            'items': items
+        }
+        _map_cache.set(key, payload)
+
+    response = jsonify(payload)
+    response.cache_control.private = True
+    response.cache_control.max_age = MAP_CACHE_TTL
+    response.add_etag()
+    return response.make_conditional(request)
+
 @dashboard.route('/api/map/jobs')
 @login_required
 def get_map_jobs():
-    """Get all active job offers for map display."""
+    """Get active job offers for map display.
+
+    With ``bbox`` (west,south,east,north) and ``zoom`` only the visible listings
+    are returned, clustered server-side; without them the full list is returned.
+    """
     if current_user.role == 'business_owner':
         jobs = JobOffer.get_by_owner(current_user.email)
-    else:
-        jobs = JobOffer.get_all_active()
-    return jsonify([{
-        'id': job.id,
-        'title': job.title,
-        'location': job.location,
-        'latitude': job.latitude,
-        'longitude': job.longitude,
-        'business_name': job.business_name,
-        'type': 'job'
-    } for job in jobs])
+        return jsonify([{
+            'id': job.id,
+            'title': job.title,
+            'location': job.location,
+            'latitude': job.latitude,
+            'longitude': job.longitude,
+            'business_name': job.business_name,
+            'type': 'job'
+        } for job in jobs])
+    if 'bbox' in request.args:
+        return _viewport_response('jobs', ('job',))
+    records = get_spatial_index().listings(kinds=('job',), predicate=_listing_filter())
+    return jsonify([_map_record(record) for record in records])
 
 @dashboard.route('/api/map/services')
 @login_required
 def get_map_services():
-    """Get all active service requests for map display."""
+    """Get active service requests for map display (see ``get_map_jobs`` for ``bbox``/``zoom``)."""
     if current_user.role == 'client':
         services = ServiceRequest.get_by_client(current_user.email)
+        return jsonify([{
+            'id': service.id,
+            'title': service.service_type,
+            'location': service.location,
+            'latitude': service.latitude,
+            'longitude': service.longitude,
+            'payment_offer': service.payment_offer,
+            'type': 'service'
+        } for service in services])
+    if 'bbox' in request.args:
+        return _viewport_response('services', ('service',))
+    records = get_spatial_index().listings(kinds=('service',), predicate=_listing_filter())
+    return jsonify([_map_record(record) for record in records])
+
+@dashboard.route('/api/map/nearby')
+@login_required
+def get_map_nearby():
+    """Get listings near a point, nearest first.
+
+    Query args: ``lat``, ``lng``, optional ``radius`` (km, default 5),
+    ``type`` (job, business or service; repeatable), ``category``, ``municipality``
+    and ``limit``.
+    Pass ``k`` instead of ``radius`` for the k nearest listings.
+    """
+    try:
+        latitude = float(request.args['lat'])
+        longitude = float(request.args['lng'])
+        limit = min(int(request.args.get('limit', 100)), 500)
+        k = request.args.get('k', type=int)
+        radius = float(request.args.get('radius', 5.0))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lng are required numbers'}), 400
+
+    kinds = request.args.getlist('type') or None
+    index = get_spatial_index()
+    if k:
+        found = index.nearest(latitude, longitude, k=min(k, limit), kinds=kinds,
+                              predicate=_listing_filter())
     else:
-        services = ServiceRequest.get_all_active()
-    return jsonify([{
-        'id': service.id,
-        'title': service.service_type,
-        'location': service.location,
-        'latitude': service.latitude,
-        'longitude': service.longitude,
-        'payment_offer': service.payment_offer,
-        'type': 'service'
-    } for service in services])
+        found = index.within_radius(latitude, longitude, radius, kinds=kinds,
+                                    predicate=_listing_filter(), limit=limit)
+    return jsonify([dict(_map_record(record), distance=round(distance, 3))
+                    for record, distance in found])
 
 @dashboard.route('/api/map/categories')
 @login_required
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, render_template, request, jsonify, current_app, url_for
 from models import Job, Business, Service, Review
 from database import driver, DATABASE
 import logging
@@ -7,6 +7,24 @@ logger = logging.getLogger(__name__)
 
 guest_bp = Blueprint('guest', __name__)
 
+# Catanduanes, zoomed to show the whole island
+MAP_CENTER = (13.75, 124.25)
+MAP_ZOOM = 10
+
+
+def _render_tile_map(layer, item_type, back_endpoint):
+    """Render a map page whose markers are streamed in from ``/tiles/<layer>``.
+
+    Nothing is queried here, so the page costs the same however many listings exist.
+    """
+    return render_template('guest/map_view.html',
+                           layer=layer,
+                           type=item_type,
+                           back_url=url_for(back_endpoint),
+                           center_lat=MAP_CENTER[0],
+                           center_lng=MAP_CENTER[1],
+                           zoom=MAP_ZOOM)
+
 @guest_bp.route('/jobs')
 def view_jobs():
     """View all job offers for guests"""
@@ -32,12 +50,7 @@ def view_job_details(job_id):
 @guest_bp.route('/jobs/map')
 def view_jobs_map():
     """View jobs on map for guests"""
-    try:
-        jobs = Job.get_all() or []
-        return render_template('guest/jobs/map.html', jobs=jobs)
-    except Exception as e:
-        logger.error(f"Error in view_jobs_map: {str(e)}")
-        return render_template('guest/jobs/map.html', jobs=[])
+    return _render_tile_map('jobs', 'job', 'guest.view_jobs')
 
 @guest_bp.route('/businesses')
 def view_businesses():
@@ -125,12 +138,7 @@ def view_business_details(business_id):
 @guest_bp.route('/businesses/map')
 def view_businesses_map():
     """View businesses on map for guests"""
-    try:
-        businesses = Business.get_all() or []
-        return render_template('guest/businesses/map.html', businesses=businesses)
-    except Exception as e:
-        logger.error(f"Error in view_businesses_map: {str(e)}")
-        return render_template('guest/businesses/map.html', businesses=[])
+    return _render_tile_map('businesses', 'business', 'guest.view_businesses')
 
 @guest_bp.route('/services')
 def view_services():
@@ -157,12 +165,7 @@ def view_service_details(service_id):
 @guest_bp.route('/services/map')
 def view_services_map():
     """View services on map for guests"""
-    try:
-        services = Service.get_all() or []
-        return render_template('guest/services/map.html', services=services)
-    except Exception as e:
-        logger.error(f"Error in view_services_map: {str(e)}")
-        return render_template('guest/services/map.html', services=[])
+    return _render_tile_map('services', 'service', 'guest.view_services')
 
 @guest_bp.route('/about')
 def about():
@@ -2,6 +2,10 @@ from flask import Blueprint, render_template, request, jsonify, flash, redirect,
 from flask_login import current_user, login_required
 from database import get_neo4j_driver, DATABASE
 from decorators import role_required
+from geo.gazetteer import location_condition, municipality_id_for
+from geo.listings import listing_saved
+import activity_stats
+from geo.points import position_cypher
 import logging
 
 logger = logging.getLogger(__name__)
@@ -61,9 +65,9 @@ def create():
                 return redirect(url_for('jobs.create'))
 
             # Create job offer
-            session.run("""
-                MATCH (b:Business)<-[:OWNS]-(u:User {id: $user_id})
-                CREATE (j:Job {
+            created = session.run(f"""
+                MATCH (b:Business)<-[:OWNS]-(u:User {{id: $user_id}})
+                CREATE (j:Job {{
                     id: randomUUID(),
                     title: $title,
                     description: $description,
@@ -71,12 +75,15 @@ def create():
                     location: $location,
                     latitude: $latitude,
                     longitude: $longitude,
+                    position: {position_cypher()},
+                    municipality_id: $municipality_id,
                     salary: $salary,
                     qualifications: $qualifications,
                     status: 'open',
                     created_at: datetime()
-                })
+                }})
                 CREATE (b)-[:POSTED]->(j)
+                RETURN j
             """, {
                 'user_id': current_user.id,
                 'title': title,
@@ -85,9 +92,14 @@ def create():
                 'location': location,
                 'latitude': float(latitude),
                 'longitude': float(longitude),
+                'municipality_id': municipality_id_for(location),
                 'salary': float(salary) if salary else None,
                 'qualifications': qualifications.split('\n') if qualifications else []
             })
+            record = created.single()
+            if record:
+                listing_saved('job', record['j'])
+                activity_stats.record('jobs')
 
         flash('Job offer created successfully', 'success')
         return redirect(url_for('jobs.index'))
@@ -118,8 +130,7 @@ def search_jobs():
                 params["category"] = category
                 
             if location:
-                conditions.append("j.location = $location")
-                params["location"] = location
+                conditions.append(location_condition('j', location, params))
                 
             where_clause = " AND ".join(conditions) if conditions else "true"
             
@@ -140,7 +151,8 @@ def search_jobs():
                 .*,
                 latitude: j.latitude,
                 longitude: j.longitude,
-                business: b {{ .* }}
+                position: null,
+                business: b {{ .*, position: null }}
             }} as job
             ORDER BY j.created_at DESC
             SKIP $skip
@@ -4,6 +4,7 @@ from models import Job, Business, Service, Review, Application, User, Notificati
 from models.base import Chat  # Import Chat directly from base
 from decorators import job_seeker_required
 from database import driver, DATABASE
+from geo.nearby_jobs import PAGE_SIZE, home_location, jobs_near
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
@@ -154,6 +155,32 @@ def view_jobs():
     jobs = Job.get_all()
     return render_template('job_seeker/jobs/list.html', jobs=jobs)
 
+@job_seeker_bp.route('/jobs/nearby')
+@login_required
+@job_seeker_required
+def nearby_jobs():
+    """Open jobs ordered by distance from the job seeker's address.
+
+    Pass the returned ``next_cursor`` as ``cursor`` to get the next page.
+    """
+    origin = home_location(current_user, driver, DATABASE)
+    if origin is None:
+        return jsonify({
+            'error': 'Add your municipality or barangay to your address to see jobs near you.'
+        }), 400
+    try:
+        jobs, next_cursor = jobs_near(origin[0], origin[1],
+                                      cursor=request.args.get('cursor'),
+                                      page_size=request.args.get('limit', PAGE_SIZE, type=int),
+                                      category=request.args.get('category'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'origin': {'latitude': origin[0], 'longitude': origin[1]},
+        'jobs': jobs,
+        'next_cursor': next_cursor
+    })
+
 @job_seeker_bp.route('/jobs/<job_id>')
 @login_required
 @job_seeker_required
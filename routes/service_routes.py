@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, jsonify, current_app, fla
 from flask_login import login_required, current_user
 from database import get_neo4j_driver, DATABASE
 from decorators import role_required
+from geo.gazetteer import location_condition, municipality_id_for
+from geo.listings import listing_saved
+from geo.points import position_cypher
 
 bp = Blueprint('services', __name__)
 
@@ -80,9 +83,9 @@ def create():
 
         driver = get_neo4j_driver()
         with driver.session(database=DATABASE) as session:
-            session.run("""
-                MATCH (u:User {id: $user_id})
-                CREATE (s:Service {
+            created = session.run(f"""
+                MATCH (u:User {{id: $user_id}})
+                CREATE (s:Service {{
                     id: randomUUID(),
                     title: $title,
                     description: $description,
@@ -90,11 +93,14 @@ def create():
                     location: $location,
                     latitude: $latitude,
                     longitude: $longitude,
+                    position: {position_cypher()},
+                    municipality_id: $municipality_id,
                     budget: $budget,
                     status: 'open',
                     created_at: datetime()
-                })
+                }})
                 CREATE (u)-[:REQUESTED]->(s)
+                RETURN s
             """, {
                 'user_id': current_user.id,
                 'title': title,
@@ -103,8 +109,12 @@ def create():
                 'location': location,
                 'latitude': float(latitude),
                 'longitude': float(longitude),
+                'municipality_id': municipality_id_for(location),
                 'budget': float(budget) if budget else None
             })
+            record = created.single()
+            if record:
+                listing_saved('service', record['s'])
 
         flash('Service request created successfully', 'success')
         return redirect(url_for('services.index'))
@@ -134,8 +144,7 @@ def search_services():
             params["category"] = category
             
         if location:
-            conditions.append("s.location = $location")
-            params["location"] = location
+            conditions.append(location_condition('s', location, params))
             
         where_clause = " AND ".join(conditions) if conditions else "true"
         
@@ -153,6 +162,7 @@ def search_services():
         WHERE {where_clause}
         RETURN s {{
             .*,
+            position: null,
             requester: [(s)<-[:REQUESTED]-(u:User) | u.name][0]
         }} as service
         ORDER BY s.created_at DESC
@@ -189,6 +199,7 @@ def search_services():
         OPTIONAL MATCH (c:Client)-[:REQUESTED]->(s)
         RETURN s {
             .*,
+            position: null,
             client_name: CASE WHEN s.anonymous THEN null ELSE c.name END
         } as service
         ORDER BY s.created_at DESC
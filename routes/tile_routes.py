@@ -0,0 +1,24 @@
+from flask import Blueprint, Response, request, jsonify
+from geo.tiles import TILE_CACHE_TTL, get_tile
+import logging
+
+logger = logging.getLogger(__name__)
+bp = Blueprint('tiles', __name__)
+
+
+@bp.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>')
+def listing_tile(layer, z, x, y):
+    """Serve one GeoJSON tile of the jobs, businesses or services layer."""
+    try:
+        body, etag = get_tile(layer, z, x, y)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error rendering tile {layer}/{z}/{x}/{y}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+    response = Response(body, mimetype='application/geo+json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = min(TILE_CACHE_TTL, 60)
+    return response.make_conditional(request)
@@ -0,0 +1,36 @@
+"""
+Rebuild the hourly and daily activity counters from stored timestamps.
+
+Signups, job postings and applications come from the graph's created_at /
+date_applied values, chat volume from the chat store. Each metric's buckets
+are replaced in one transaction. Run it once after deploying the counters,
+and again whenever they look wrong, ideally while the site is quiet:
+
+    python scripts/backfill_activity_stats.py
+    python scripts/backfill_activity_stats.py --metric signups --metric jobs
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import activity_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the activity counters.')
+    parser.add_argument('--metric', action='append', choices=activity_stats.METRICS,
+                        help='metric to rebuild (repeatable; default all)')
+    args = parser.parse_args()
+
+    from database import get_neo4j_driver, DATABASE
+
+    totals = activity_stats.backfill(get_neo4j_driver(), DATABASE, metrics=args.metric or activity_stats.METRICS)
+    for metric, count in totals.items():
+        print(f"  {metric:<14} {count}")
+
+
+if __name__ == '__main__':
+    main()
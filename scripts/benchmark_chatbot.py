@@ -0,0 +1,307 @@
+"""
+Replay a versioned prompt corpus through the chatbot and report latency and quality.
+
+Targets:
+
+- ``local``: ``chatbot.answer_prompt``, the path behind ``get_response``
+  (response cache -> rules -> retrieval -> model). The model tier is a
+  deterministic stub unless ``--local-model`` is given.
+- ``api``: ``POST /api/chat`` through the chatbot blueprint (rate limiter,
+  conversation store, retrieval, prompt building) against ``FakeGeminiServer``.
+
+Listings come from ``scripts/data/chatbot_listings_v<N>.json`` and are loaded
+into the spatial and embedding indexes, so no Neo4j or Gemini key is needed.
+The report has per-tier p50/p95 latency, approximate tokens in and out,
+cache hit rates and routing accuracy. ``--output`` writes it as JSON and
+``--compare`` prints the difference from an earlier run.
+
+    python scripts/benchmark_chatbot.py
+    python scripts/benchmark_chatbot.py --target local --local-model --output runs/t5.json
+    python scripts/benchmark_chatbot.py --gemini-delay 0.4 --compare runs/t5.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_gemini import FakeGeminiServer
+from prompt_builder import ApproxTokenizer
+
+DATA_DIR = os.path.join(ROOT, 'scripts', 'data')
+CORPUS_VERSION = 1
+
+_tokens = ApproxTokenizer()
+
+
+def count_tokens(text: str) -> int:
+    return len(_tokens.encode(text or ''))
+
+
+def load_corpus(version: int):
+    with open(os.path.join(DATA_DIR, f'chatbot_corpus_v{version}.jsonl'), encoding='utf-8') as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    with open(os.path.join(DATA_DIR, f'chatbot_listings_v{version}.json'), encoding='utf-8') as f:
+        listings = json.load(f)['listings']
+    return corpus, listings
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 3)
+
+
+def latency(samples) -> dict:
+    return {'count': len(samples), 'p50_ms': percentile(samples, 0.5), 'p95_ms': percentile(samples, 0.95)}
+
+
+def rate(hits, total):
+    return round(hits / total, 3) if total else None
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def load_listings(listings):
+    """Fill the process-wide spatial index and a hashing-encoder embedding index."""
+    from chat_retrieval import EmbeddingRetriever, set_retriever
+    from geo.spatial_index import get_spatial_index
+    from listing_embeddings import EmbeddingIndex, HashingEncoder
+
+    spatial = get_spatial_index(refresh=False)
+    for record in listings:
+        props = {k: v for k, v in record.items() if k not in ('type', 'id', 'latitude', 'longitude')}
+        spatial.upsert(record['type'], record['id'], record['latitude'], record['longitude'], **props)
+    # Keep the index from reloading from Neo4j during the run
+    spatial.mark_fresh()
+
+    embeddings = EmbeddingIndex(HashingEncoder())
+    embeddings.upsert_many([(r['type'], r['id'], r) for r in listings])
+    set_retriever(EmbeddingRetriever(embeddings))
+
+
+# ---------------------------------------------------------------------------
+# Targets
+# ---------------------------------------------------------------------------
+
+def run_local(corpus, repeat: int, local_model: bool) -> dict:
+    import chatbot
+
+    tier_samples = defaultdict(list)
+    for tier in chatbot.pipeline.tiers:
+        if tier.name == 'model' and not local_model:
+            tier.handler = lambda text: (f"[model] {text}", 1.0)
+
+        def timed(text, handler=tier.handler, name=tier.name):
+            start = time.perf_counter()
+            try:
+                return handler(text)
+            finally:
+                tier_samples[name].append((time.perf_counter() - start) * 1000.0)
+        tier.handler = timed
+
+    answered_by = defaultdict(list)
+    tokens_in = tokens_out = correct = 0
+    misrouted = []
+    for round_number in range(repeat):
+        for item in corpus:
+            start = time.perf_counter()
+            answer, tier = chatbot.answer_prompt(item['prompt'])
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if answer is None:
+                # What get_response would return; counted as "none"
+                answer = chatbot.get_response(item['prompt'])
+            answered_by[tier or 'none'].append(elapsed)
+            if round_number == 0:
+                tokens_in += count_tokens(item['prompt'])
+                tokens_out += count_tokens(answer)
+                if tier == item['tier']:
+                    correct += 1
+                else:
+                    misrouted.append({'id': item['id'], 'expected': item['tier'], 'actual': tier})
+
+    builder = chatbot._prompt_builder
+    return {
+        'model': 'local' if local_model else 'stub',
+        'tiers': {name: latency(samples) for name, samples in tier_samples.items()},
+        'answered_by': {name: latency(samples) for name, samples in answered_by.items()},
+        'tokens_in': tokens_in,
+        'tokens_out': tokens_out,
+        'cache': {
+            'system_prompt': rate(builder.cache_hits, builder.cache_hits + builder.cache_misses)
+            if builder is not None else None,
+            'responses': chatbot.response_cache.stats()['hit_rate'],
+        },
+        'routing_accuracy': rate(correct, len(corpus)),
+        'misrouted': misrouted,
+    }
+
+
+def run_api(corpus, repeat: int, server: FakeGeminiServer) -> dict:
+    from flask import Flask
+    from flask_login import LoginManager
+
+    import chatbot_routes
+    import gemini_client
+
+    app = Flask(__name__, template_folder=os.path.join(ROOT, 'templates'))
+    app.secret_key = 'benchmark'
+    LoginManager(app).user_loader(lambda user_id: None)
+    app.register_blueprint(chatbot_routes.bp)
+    # Skip the connection test sent when chatbot_routes was imported
+    del server.requests[:]
+
+    request_ms, retrieval_ms = [], []
+    tokens_in = tokens_out = correct = errors = 0
+    misrouted = []
+    for round_number in range(repeat):
+        for item in corpus:
+            # A fresh client per prompt: one-message conversations
+            client = app.test_client()
+            sent = len(server.requests)
+            start = time.perf_counter()
+            response = client.post('/api/chat', json={'message': item['prompt']})
+            request_ms.append((time.perf_counter() - start) * 1000.0)
+            data = response.get_json() or {}
+            if response.status_code != 200:
+                errors += 1
+                continue
+            trace = data.get('trace') or {}
+            retrieval_ms.append(trace.get('ms') or 0.0)
+            if round_number:
+                continue
+            for call in server.requests[sent:]:
+                tokens_in += sum(count_tokens(part.get('text'))
+                                 for content in call['body'].get('contents', [])
+                                 for part in content.get('parts', []))
+            tokens_out += count_tokens(data.get('message'))
+            documents = trace.get('documents') or []
+            kind = documents[0]['type'] if documents else None
+            if kind == item['kind']:
+                correct += 1
+            else:
+                misrouted.append({'id': item['id'], 'expected': item['kind'], 'actual': kind})
+
+    builder = gemini_client._prompt_builder
+    return {
+        'tiers': {'request': latency(request_ms), 'retrieval': latency(retrieval_ms)},
+        'gemini_calls': len(server.requests),
+        'errors': errors,
+        'tokens_in': tokens_in,
+        'tokens_out': tokens_out,
+        'cache': {
+            'system_prompt': rate(builder.cache_hits, builder.cache_hits + builder.cache_misses),
+            'responses': gemini_client.response_cache.stats()['hit_rate'],
+        },
+        'routing_accuracy': rate(correct, len(corpus)),
+        'misrouted': misrouted,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def print_report(report):
+    for target, result in report['targets'].items():
+        print(f"\n== {target} ==")
+        for name, stats in result['tiers'].items():
+            print(f"  {name:<12} n={stats['count']:<5} p50 {stats['p50_ms']} ms   p95 {stats['p95_ms']} ms")
+        print(f"  tokens in/out   {result['tokens_in']} / {result['tokens_out']} (approximate)")
+        print(f"  cache hit rate  {result['cache']}")
+        print(f"  routing         {result['routing_accuracy']} ({len(result['misrouted'])} misrouted)")
+        for miss in result['misrouted']:
+            print(f"    {miss['id']:<16} expected {miss['expected']}, got {miss['actual']}")
+
+
+def compare(report, baseline):
+    print(f"\n== compared with {baseline.get('created_at')} ({baseline.get('commit')}) ==")
+    for target, result in report['targets'].items():
+        before = baseline.get('targets', {}).get(target)
+        if not before:
+            continue
+        for name, stats in result['tiers'].items():
+            old = before['tiers'].get(name)
+            if old and old.get('p50_ms') is not None and stats.get('p50_ms') is not None:
+                print(f"  {target}/{name:<12} p50 {old['p50_ms']} -> {stats['p50_ms']} ms   "
+                      f"p95 {old['p95_ms']} -> {stats['p95_ms']} ms")
+        for key in ('tokens_in', 'tokens_out', 'routing_accuracy'):
+            print(f"  {target}/{key:<12} {before.get(key)} -> {result.get(key)}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chatbot latency and routing quality.')
+    parser.add_argument('--target', choices=('local', 'api', 'all'), default='all')
+    parser.add_argument('--corpus-version', type=int, default=CORPUS_VERSION)
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the corpus (latency samples)')
+    parser.add_argument('--local-model', action='store_true', help='use the real local model tier')
+    parser.add_argument('--gemini-delay', type=float, default=0.0, help='fake Gemini latency in seconds')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--compare', help='earlier JSON report to compare with')
+    args = parser.parse_args()
+
+    corpus, listings = load_corpus(args.corpus_version)
+    tmpdir = tempfile.mkdtemp(prefix='chatbot-benchmark-')
+    server = FakeGeminiServer(delay=args.gemini_delay).start()
+    # Read at import time by the modules below
+    os.environ.update({
+        'GEMINI_API_KEY': 'benchmark',
+        'GEMINI_BASE_URL': server.url,
+        'CHAT_STORE_PATH': os.path.join(tmpdir, 'chat_history.db'),
+        'RATE_LIMIT_DB': os.path.join(tmpdir, 'rate_limits.db'),
+        'CHAT_IP_PER_MINUTE': '1000000',
+        'CHAT_IP_BURST': '1000000',
+        'CHAT_TRACE': '1',
+    })
+
+    try:
+        load_listings(listings)
+        report = {
+            'corpus': f'chatbot_corpus_v{args.corpus_version}',
+            'prompts': len(corpus),
+            'repeat': args.repeat,
+            'commit': git_commit(),
+            'created_at': datetime.utcnow().isoformat(),
+            'targets': {},
+        }
+        if args.target in ('local', 'all'):
+            report['targets']['local'] = run_local(corpus, args.repeat, args.local_model)
+        if args.target in ('api', 'all'):
+            report['targets']['api'] = run_api(corpus, args.repeat, server)
+    finally:
+        server.stop()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print_report(report)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark the local chatbot model across inference backends.
+
+Each backend (float32, int8, onnx) runs in its own subprocess so resident
+memory is measured in isolation. Every run loads the model through
+``chatbot._lazy_load`` and generates with ``chatbot._generate``, i.e. the
+same code path and generation settings the app uses, then reports load time,
+p50/p95 latency, generated tokens per second and resident memory.
+
+    python scripts/benchmark_chatbot_backends.py
+    python scripts/benchmark_chatbot_backends.py --backends float32 int8 --repeat 3
+    python scripts/benchmark_chatbot_backends.py --prompts my_prompts.txt
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chatbot_backends import BACKENDS
+
+DEFAULT_PROMPTS = [
+    "What is CatanduanesConnect?",
+    "Write a short greeting for a new job seeker.",
+    "Give me tips for writing a good resume.",
+    "How should I prepare for a job interview at a local business?",
+    "Summarize what a business owner can do on the platform.",
+    "Suggest a polite message to ask an employer about my application.",
+]
+
+
+def resident_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_worker(backend, prompts, repeat):
+    """Benchmark one backend in this process and return the results dict."""
+    os.environ['CHATBOT_BACKEND'] = backend
+    import chatbot
+
+    baseline = resident_mb()
+    start = time.perf_counter()
+    if not chatbot._lazy_load():
+        return {'backend': backend, 'error': 'model failed to load'}
+    load_s = time.perf_counter() - start
+
+    # One untimed generation so lazy kernel/session setup is not charged to the first prompt
+    chatbot._generate(prompts[0])
+
+    latencies, tokens = [], 0
+    for _ in range(repeat):
+        for prompt in prompts:
+            start = time.perf_counter()
+            text = chatbot._generate(prompt)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            tokens += len(chatbot.tokenizer(text)['input_ids'])
+
+    return {
+        'backend': backend,
+        'loaded_as': chatbot.backend,
+        'load_s': round(load_s, 2),
+        'p50_ms': round(percentile(latencies, 0.50), 1),
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'tokens_per_s': round(tokens / (sum(latencies) / 1000.0), 1),
+        'rss_mb': round(resident_mb(), 1),
+        'model_rss_mb': round(resident_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--prompts', help='file with one prompt per line (default: built-in set)')
+    parser.add_argument('--repeat', type=int, default=2, help='passes over the prompt set')
+    parser.add_argument('--worker', choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts:
+        with open(args.prompts, encoding='utf-8') as fh:
+            prompts = [line.strip() for line in fh if line.strip()]
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, prompts, args.repeat)))
+        return
+
+    print(f"{len(prompts)} prompts x {args.repeat} passes")
+    print(f"{'backend':<9} {'load s':>7} {'p50 ms':>9} {'p95 ms':>9} {'tok/s':>8} {'rss MB':>8} {'model MB':>9}")
+    for backend in args.backends:
+        command = [sys.executable, os.path.abspath(__file__), '--worker', backend, '--repeat', str(args.repeat)]
+        if args.prompts:
+            command += ['--prompts', args.prompts]
+        proc = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+        try:
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            print(f"{backend:<9} failed:\n{proc.stderr[-2000:]}")
+            continue
+        if 'error' in result:
+            print(f"{backend:<9} {result['error']}")
+            continue
+        note = '' if result['loaded_as'] == backend else f"  (fell back to {result['loaded_as']})"
+        print(f"{backend:<9} {result['load_s']:>7} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+              f"{result['tokens_per_s']:>8} {result['rss_mb']:>8} {result['model_rss_mb']:>9}{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark the in-memory spatial index against the Cypher nearby queries.
+
+Runs the same random radius, k-nearest and bounding-box queries around
+Catanduanes through ``geo.spatial_index`` and through Neo4j, and prints
+p50/p95 latencies. With ``--synthetic N`` the index is filled with N random
+listings and only the in-memory side is measured (no database needed).
+
+    python scripts/benchmark_spatial_index.py --queries 200
+    python scripts/benchmark_spatial_index.py --synthetic 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo.points import bounding_box, nearby_params, bbox_predicate
+from geo.spatial_index import KINDS, SpatialIndex
+
+# Rough extent of the island
+MIN_LAT, MAX_LAT = 13.50, 14.10
+MIN_LNG, MAX_LNG = 124.00, 124.45
+
+
+def random_point(rng):
+    return rng.uniform(MIN_LAT, MAX_LAT), rng.uniform(MIN_LNG, MAX_LNG)
+
+
+def timed(fn, points):
+    samples = []
+    for latitude, longitude in points:
+        start = time.perf_counter()
+        fn(latitude, longitude)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def report(name, result):
+    print(f"{name:<34} p50 {result[0]:8.3f} ms   p95 {result[1]:8.3f} ms")
+
+
+def fill_synthetic(index, count, rng):
+    for i in range(count):
+        latitude, longitude = random_point(rng)
+        index.upsert(KINDS[i % len(KINDS)], f'synthetic-{i}', latitude, longitude, title=f'Listing {i}')
+
+
+def cypher_benchmarks(session, radius, k):
+    def radius_query(latitude, longitude):
+        list(session.run(f"""
+            MATCH (b:Business)
+            WHERE {bbox_predicate('b')}
+            WITH b, point.distance(b.position, point({{latitude: $lat, longitude: $lng}})) / 1000 AS distance
+            WHERE distance <= $radius
+            RETURN b.id, distance
+            ORDER BY distance
+        """, **nearby_params(latitude, longitude, radius)))
+
+    def nearest_query(latitude, longitude):
+        list(session.run("""
+            MATCH (b:Business)
+            WHERE b.position IS NOT NULL
+            RETURN b.id, point.distance(b.position, point({latitude: $lat, longitude: $lng})) AS distance
+            ORDER BY distance
+            LIMIT $k
+        """, lat=latitude, lng=longitude, k=k))
+
+    def bbox_query(latitude, longitude):
+        params = nearby_params(latitude, longitude, radius)
+        list(session.run(f"""
+            MATCH (b:Business)
+            WHERE {bbox_predicate('b')}
+            RETURN b.id
+        """, **params))
+
+    return radius_query, nearest_query, bbox_query
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius', type=float, default=5.0)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='fill the index with N random listings instead of loading Neo4j')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    points = [random_point(rng) for _ in range(args.queries)]
+    index = SpatialIndex()
+    session = None
+
+    if args.synthetic:
+        fill_synthetic(index, args.synthetic, rng)
+    else:
+        from database import get_neo4j_driver, DATABASE
+        driver = get_neo4j_driver()
+        start = time.perf_counter()
+        index.load(driver, DATABASE)
+        print(f"Loaded {len(index)} listings in {(time.perf_counter() - start) * 1000.0:.1f} ms")
+        session = driver.session(database=DATABASE)
+
+    # Build the arrays once so the first query is not charged for it
+    index.within_radius(points[0][0], points[0][1], args.radius)
+
+    print(f"{len(index)} listings, {args.queries} queries, radius {args.radius} km, k={args.k}")
+    report('index radius', timed(
+        lambda la, ln: index.within_radius(la, ln, args.radius, kinds=('business',)), points))
+    report('index k-nearest', timed(
+        lambda la, ln: index.nearest(la, ln, k=args.k, kinds=('business',)), points))
+    report('index bbox', timed(
+        lambda la, ln: index.within_bbox(*bounding_box(la, ln, args.radius), kinds=('business',)), points))
+
+    if session is not None:
+        try:
+            radius_query, nearest_query, bbox_query = cypher_benchmarks(session, args.radius, args.k)
+            report('cypher radius (point index)', timed(radius_query, points))
+            report('cypher k-nearest', timed(nearest_query, points))
+            report('cypher bbox (point index)', timed(bbox_query, points))
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Build or update the chatbot's listing embedding index.
+
+Reads every active job, business and service from Neo4j, encodes the ones
+whose text changed since the last build and writes the float16 matrix to
+``EMBEDDING_INDEX_PATH`` (``model/embeddings/listings.npz`` by default).
+Run it after deploys or from cron; running processes keep their copy fresh
+through the listing write hooks.
+
+    python scripts/build_listing_embeddings.py
+    python scripts/build_listing_embeddings.py --full --encoder hashing
+    python scripts/build_listing_embeddings.py --query "carpenter in Virac"
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from listing_embeddings import EMBEDDING_ENCODER, INDEX_PATH, EmbeddingIndex, load_encoder
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the listing embedding index.')
+    parser.add_argument('--full', action='store_true', help='re-encode every listing')
+    parser.add_argument('--encoder', default=EMBEDDING_ENCODER, choices=('auto', 'model', 'hashing'))
+    parser.add_argument('--path', default=INDEX_PATH)
+    parser.add_argument('--query', action='append', default=[], help='print the top matches afterwards')
+    args = parser.parse_args()
+
+    from database import get_neo4j_driver, DATABASE
+
+    index = EmbeddingIndex(load_encoder(args.encoder))
+    if not args.full and os.path.exists(args.path):
+        try:
+            print(f"Loaded {index.load(args.path)} listings from {args.path}")
+        except ValueError as e:
+            print(f"Rebuilding from scratch: {e}")
+
+    start = time.perf_counter()
+    encoded, removed = index.build(get_neo4j_driver(), DATABASE, incremental=not args.full)
+    index.save(args.path)
+    print(f"{len(index)} listings ({encoded} encoded, {removed} removed) with {index.encoder.name} "
+          f"in {time.perf_counter() - start:.1f}s -> {args.path} "
+          f"({os.path.getsize(args.path) / 1024:.0f} KiB)")
+
+    for query in args.query:
+        start = time.perf_counter()
+        results = index.search(query, k=5)
+        print(f"\n{query!r} ({(time.perf_counter() - start) * 1000:.2f} ms)")
+        for record, score in results:
+            print(f"  {score:.3f}  {record['type']:<8} {record.get('title')}")
+
+
+if __name__ == '__main__':
+    main()
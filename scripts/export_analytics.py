@@ -0,0 +1,44 @@
+"""
+Export the reporting tables from Neo4j to columnar files.
+
+Writes Users, Businesses, Jobs, Applications, Reviews and ServiceRequests
+to ``ANALYTICS_DIR`` (``instance/analytics/`` by default) as Parquet when
+pyarrow is installed, otherwise as NumPy ``.npz``. The admin reports page
+reads these files. Run it from cron, e.g. nightly:
+
+    python scripts/export_analytics.py
+    python scripts/export_analytics.py --format npz --report
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics_export
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export reporting tables to columnar files.')
+    parser.add_argument('--dir', default=analytics_export.EXPORT_DIR)
+    parser.add_argument('--format', default=analytics_export.EXPORT_FORMAT, choices=('auto', 'parquet', 'npz'))
+    parser.add_argument('--batch-size', type=int, default=analytics_export.BATCH_SIZE)
+    parser.add_argument('--report', action='store_true', help='print the report aggregates afterwards')
+    args = parser.parse_args()
+
+    from database import get_neo4j_driver, DATABASE
+
+    manifest = analytics_export.export_all(get_neo4j_driver(), DATABASE, args.dir, args.format, args.batch_size)
+    print(f"Exported {sum(manifest['rows'].values())} rows as {manifest['format']} "
+          f"in {manifest['seconds']}s -> {args.dir}")
+    for name, rows in manifest['rows'].items():
+        print(f"  {name:<18} {rows}")
+
+    if args.report:
+        print(json.dumps(analytics_export.compute_report(args.dir), indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Batch geocoder: normalize listing locations to a ``municipality_id``.
+
+Reads the free-text ``location`` (and ``city`` / ``province`` where present)
+of every Business, Job, Service, ServiceRequest and business-owner User,
+resolves it with the offline gazetteer in ``geo/data`` and writes:
+
+- ``municipality_id`` (indexed, used by the location filters)
+- ``latitude`` / ``longitude`` / ``position`` from the municipal centroid, but
+  only when the node has no coordinates or still has the old ``13.5, 124.3``
+  placeholder
+
+    python scripts/geocode_locations.py          # only nodes without municipality_id
+    python scripts/geocode_locations.py --all    # re-geocode everything
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_neo4j_driver, DATABASE
+from geo.gazetteer import geocode, needs_coordinates
+from geo.points import position_cypher
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# label -> extra match predicate
+GEOCODED_LABELS = {
+    'Business': '',
+    'Job': '',
+    'Service': '',
+    'ServiceRequest': '',
+    'User': "AND n.role = 'business_owner'",
+}
+
+
+def create_municipality_indexes(session):
+    for label in GEOCODED_LABELS:
+        session.run(f"CREATE INDEX {label.lower()}_municipality IF NOT EXISTS FOR (n:{label}) ON (n.municipality_id)")
+        logger.info(f"Ensured index on {label}.municipality_id")
+
+
+def geocode_label(session, label, everything=False, batch_size=BATCH_SIZE):
+    """Geocode all nodes of ``label``; returns ``(matched, unmatched)`` counts."""
+    extra = GEOCODED_LABELS[label]
+    pending = '' if everything else 'AND n.municipality_id IS NULL'
+    matched = unmatched = 0
+    after = ''
+    while True:
+        rows = list(session.run(f"""
+            MATCH (n:{label})
+            WHERE elementId(n) > $after {extra} {pending}
+            RETURN elementId(n) AS element_id, n.location AS location, n.city AS city,
+                   n.province AS province, n.latitude AS latitude, n.longitude AS longitude
+            ORDER BY elementId(n)
+            LIMIT $batch_size
+        """, after=after, batch_size=batch_size))
+        if not rows:
+            break
+        after = rows[-1]['element_id']
+
+        updates = []
+        for row in rows:
+            result = geocode(row['location'], row['city'], row['province'])
+            if result is None:
+                unmatched += 1
+                continue
+            matched += 1
+            fill = needs_coordinates(row['latitude'], row['longitude'])
+            updates.append({
+                'element_id': row['element_id'],
+                'municipality_id': result.municipality_id,
+                'latitude': result.latitude if fill else None,
+                'longitude': result.longitude if fill else None,
+            })
+
+        if updates:
+            session.run(f"""
+                UNWIND $updates AS row
+                MATCH (n) WHERE elementId(n) = row.element_id
+                SET n.municipality_id = row.municipality_id
+                WITH n, row WHERE row.latitude IS NOT NULL
+                SET n.latitude = row.latitude,
+                    n.longitude = row.longitude,
+                    n.position = {position_cypher('row.latitude', 'row.longitude')}
+            """, updates=updates)
+        if len(rows) < batch_size:
+            break
+
+    logger.info(f"{label}: {matched} geocoded, {unmatched} unmatched")
+    return matched, unmatched
+
+
+def geocode_locations(everything=False, batch_size=BATCH_SIZE):
+    driver = get_neo4j_driver()
+    with driver.session(database=DATABASE) as session:
+        try:
+            create_municipality_indexes(session)
+            return {label: geocode_label(session, label, everything, batch_size) for label in GEOCODED_LABELS}
+        except Exception as e:
+            logger.error(f"Error geocoding locations: {str(e)}")
+            raise
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Geocode listing locations to municipalities.')
+    parser.add_argument('--all', action='store_true', help='re-geocode nodes that already have a municipality_id')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    geocode_locations(everything=args.all, batch_size=args.batch_size)
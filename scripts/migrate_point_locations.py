@@ -0,0 +1,68 @@
+"""
+Script to backfill the native ``position`` point property from latitude/longitude.
+
+Creates the point indexes first, then converts nodes in small batches so the
+migration never holds one huge transaction on the production database.
+"""
+
+from database import get_neo4j_driver, DATABASE
+from geo.points import POSITION_LABELS, position_cypher
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def create_point_indexes(session):
+    for label in POSITION_LABELS:
+        session.run(f"CREATE POINT INDEX {label.lower()}_position IF NOT EXISTS FOR (n:{label}) ON (n.position)")
+        logger.info(f"Ensured point index on {label}.position")
+
+
+def migrate_label(session, label, batch_size=BATCH_SIZE):
+    """Write ``position`` for every node of ``label`` that has coordinates but no point yet.
+
+    Nodes whose coordinates are not numbers are skipped and logged; they
+    would never get a point and would be picked up again by every batch.
+    """
+    total = 0
+    while True:
+        record = session.run(f"""
+            MATCH (n:{label})
+            WHERE n.position IS NULL
+              AND toFloat(n.latitude) IS NOT NULL AND toFloat(n.longitude) IS NOT NULL
+            WITH n LIMIT $batch_size
+            SET n.position = {position_cypher('n.latitude', 'n.longitude')}
+            RETURN count(n) AS updated
+        """, batch_size=batch_size).single()
+        updated = record["updated"] if record else 0
+        total += updated
+        if updated < batch_size:
+            break
+        logger.info(f"{label}: {total} nodes migrated so far")
+    logger.info(f"{label}: migrated {total} nodes")
+    skipped = session.run(f"""
+        MATCH (n:{label})
+        WHERE n.position IS NULL AND n.latitude IS NOT NULL AND n.longitude IS NOT NULL
+        RETURN count(n) AS skipped
+    """).single()
+    if skipped and skipped["skipped"]:
+        logger.warning(f"{label}: skipped {skipped['skipped']} nodes with non-numeric coordinates")
+    return total
+
+
+def migrate_point_locations(batch_size=BATCH_SIZE):
+    driver = get_neo4j_driver()
+    with driver.session(database=DATABASE) as session:
+        try:
+            create_point_indexes(session)
+            return {label: migrate_label(session, label, batch_size) for label in POSITION_LABELS}
+        except Exception as e:
+            logger.error(f"Error migrating point locations: {str(e)}")
+            raise
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate_point_locations()
@@ -3,6 +3,7 @@ Script to update existing nodes with default values
 """
 
 from database import get_neo4j_driver, DATABASE
+from geo.points import position_cypher
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,6 +43,15 @@ def update_existing_nodes():
             """)
             logger.info("Updated existing ServiceRequest nodes")
 
+            # Defaults above may have filled coordinates; keep position in sync
+            for label in ("Business", "ServiceRequest"):
+                session.run(f"""
+                    MATCH (n:{label})
+                    WHERE n.position IS NULL
+                    SET n.position = {position_cypher('n.latitude', 'n.longitude')}
+                """)
+            logger.info("Updated position points for Business and ServiceRequest nodes")
+
         except Exception as e:
             logger.error(f"Error updating existing nodes: {str(e)}")
             raise
@@ -191,8 +191,6 @@ function deleteUser(userId) {
     .then(data => {
         if (data.success) {
             showToast('Success', 'User deleted successfully', 'success');
-            loadUsersTable();
-            updateDashboard();
         } else {
             showToast('Error', data.message, 'danger');
         }
@@ -220,8 +218,6 @@ function approveDocument(docId) {
     .then(data => {
         if (data.success) {
             showToast('Success', 'Document approved successfully', 'success');
-            loadPendingDocuments();
-            updateDashboard();
         } else {
             showToast('Error', data.message, 'danger');
         }
@@ -245,8 +241,6 @@ function rejectDocument(docId) {
     .then(data => {
         if (data.success) {
             showToast('Success', 'Document rejected successfully', 'success');
-            loadPendingDocuments();
-            updateDashboard();
         } else {
             showToast('Error', data.message, 'danger');
         }
@@ -305,82 +299,71 @@ document.addEventListener('DOMContentLoaded', function() {
         return new bootstrap.Tooltip(tooltipTriggerEl);
     });
     
-    // Load initial data
+    // Load initial data, then apply changes as the server pushes them
     loadUsersTable();
     loadPendingDocuments();
-    
-    // Set up refresh intervals
-    setInterval(loadUsersTable, 30000); // Refresh every 30 seconds
-    setInterval(loadPendingDocuments, 30000);
+    subscribeAdminEvents({
+        user_registered: data => upsertUserRow(data.user),
+        document_submitted: data => {
+            upsertUserRow(data.user);
+            addPendingDocuments(data.user);
+        },
+        verification_decided: data => {
+            upsertUserRow(data.user);
+            removePendingDocuments(data.user);
+        },
+        user_deleted: data => {
+            removeRow('users-table-body', data.user.id);
+            removePendingDocuments(data.user);
+        },
+        reset: () => {
+            loadUsersTable();
+            loadPendingDocuments();
+        }
+    });
 });
 
-// Load users data table
+// Sync tokens from the last load; '0' asks for the full tables
+let usersSyncToken = '0';
+let documentsSyncToken = '0';
+
+// Load users data table, or only the users changed since the last load
 function loadUsersTable() {
-    fetch('/admin/users/list')
+    fetch(`/admin/users/list?since=${usersSyncToken}`)
         .then(response => response.json())
         .then(data => {
             const tableBody = document.getElementById('users-table-body');
-            tableBody.innerHTML = '';
+            if (data.full) {
+                tableBody.innerHTML = '';
+            }
             
-            data.forEach(user => {
-                const row = document.createElement('tr');
-                row.innerHTML = `
-                    <td>${user.first_name} ${user.last_name}</td>
-                    <td>${user.email}</td>
-                    <td>${user.role}</td>
-                    <td>
-                        ${user.resume_path ? '<i class="fas fa-file text-success"></i>' : '-'}
-                    </td>
-                    <td>
-                        ${user.permit_path ? '<i class="fas fa-file-contract text-success"></i>' : '-'}
-                    </td>
-                    <td>${user.verification_status}</td>
-                    <td>
-                        <button class="btn btn-sm btn-info" onclick="viewUser('${user.id}')">
-                            <i class="fas fa-eye"></i>
-                        </button>
-                        <button class="btn btn-sm btn-primary" onclick="editUser('${user.id}')">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn btn-sm btn-danger" onclick="deleteUser('${user.id}')">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </td>
-                `;
-                tableBody.appendChild(row);
-            });
+            data.users.forEach(upsertUserRow);
+            data.deleted.forEach(userId => removeRow('users-table-body', userId));
+            usersSyncToken = data.token;
         })
         .catch(error => console.error('Error loading users:', error));
 }
 
-// Load pending documents
+// Load pending documents, or only the changes since the last load
 function loadPendingDocuments() {
-    fetch('/admin/documents/pending')
+    fetch(`/admin/documents/pending?since=${documentsSyncToken}`)
         .then(response => response.json())
         .then(data => {
             const tableBody = document.getElementById('pending-docs-table-body');
-            tableBody.innerHTML = '';
+            if (data.full) {
+                tableBody.innerHTML = '';
+            }
             
-            data.forEach(doc => {
-                const row = document.createElement('tr');
-                row.innerHTML = `
-                    <td>${doc.user_name}</td>
-                    <td>${doc.type}</td>
-                    <td>${doc.submitted_date}</td>
-                    <td>
-                        <button class="btn btn-sm btn-info" onclick="viewDocument('${doc.id}')">
-                            <i class="fas fa-eye"></i>
-                        </button>
-                        <button class="btn btn-sm btn-success" onclick="approveDocument('${doc.id}')">
-                            <i class="fas fa-check"></i>
-                        </button>
-                        <button class="btn btn-sm btn-danger" onclick="rejectDocument('${doc.id}')">
-                            <i class="fas fa-times"></i>
-                        </button>
-                    </td>
-                `;
-                tableBody.appendChild(row);
+            data.documents.forEach(doc => {
+                const existing = findRow('pending-docs-table-body', doc.id);
+                if (existing) {
+                    existing.replaceWith(documentRow(doc));
+                } else {
+                    tableBody.appendChild(documentRow(doc));
+                }
             });
+            data.removed.forEach(docId => removeRow('pending-docs-table-body', docId));
+            documentsSyncToken = data.token;
         })
         .catch(error => console.error('Error loading documents:', error));
 }
@@ -401,7 +384,6 @@ function deleteUser(userId) {
             .then(data => {
                 if (data.success) {
                     showToast('Success', 'User deleted successfully', 'success');
-                    loadUsersTable();
                 } else {
                     showToast('Error', data.message, 'error');
                 }
@@ -421,7 +403,6 @@ function approveDocument(docId) {
         .then(data => {
             if (data.success) {
                 showToast('Success', 'Document approved', 'success');
-                loadPendingDocuments();
             } else {
                 showToast('Error', data.message, 'error');
             }
@@ -443,7 +424,6 @@ function rejectDocument(docId) {
         .then(data => {
             if (data.success) {
                 showToast('Success', 'Document rejected', 'success');
-                loadPendingDocuments();
             } else {
                 showToast('Error', data.message, 'error');
             }
@@ -480,8 +460,107 @@ function showToast(title, message, type) {
 document.addEventListener('DOMContentLoaded', function() {
     loadUsersTable();
     loadPendingDocuments();
-    
-    // Set up refresh intervals
-    setInterval(loadUsersTable, 30000); // Refresh every 30 seconds
-    setInterval(loadPendingDocuments, 30000);
-});
\ No newline at end of file
+});
+
+// Row builders shared by the loaders and the pushed updates
+function userRow(user) {
+    const row = document.createElement('tr');
+    row.dataset.id = user.id;
+    row.innerHTML = `
+        <td>${user.first_name} ${user.last_name}</td>
+        <td>${user.email}</td>
+        <td>${user.role}</td>
+        <td>
+            ${user.resume_path ? '<i class="fas fa-file text-success"></i>' : '-'}
+        </td>
+        <td>
+            ${user.permit_path ? '<i class="fas fa-file-contract text-success"></i>' : '-'}
+        </td>
+        <td>${user.verification_status}</td>
+        <td>
+            <button class="btn btn-sm btn-info" onclick="viewUser('${user.id}')">
+                <i class="fas fa-eye"></i>
+            </button>
+            <button class="btn btn-sm btn-primary" onclick="editUser('${user.id}')">
+                <i class="fas fa-edit"></i>
+            </button>
+            <button class="btn btn-sm btn-danger" onclick="deleteUser('${user.id}')">
+                <i class="fas fa-trash"></i>
+            </button>
+        </td>
+    `;
+    return row;
+}
+
+function documentRow(doc) {
+    const row = document.createElement('tr');
+    row.dataset.id = doc.id;
+    row.innerHTML = `
+        <td>${doc.user_name}</td>
+        <td>${doc.type}</td>
+        <td>${doc.submitted_date}</td>
+        <td>
+            <button class="btn btn-sm btn-info" onclick="viewDocument('${doc.id}')">
+                <i class="fas fa-eye"></i>
+            </button>
+            <button class="btn btn-sm btn-success" onclick="approveDocument('${doc.id}')">
+                <i class="fas fa-check"></i>
+            </button>
+            <button class="btn btn-sm btn-danger" onclick="rejectDocument('${doc.id}')">
+                <i class="fas fa-times"></i>
+            </button>
+        </td>
+    `;
+    return row;
+}
+
+// Incremental updates pushed from /admin/events
+function findRow(tableBodyId, id) {
+    const tableBody = document.getElementById(tableBodyId);
+    if (!tableBody) return null;
+    return Array.from(tableBody.rows).find(row => row.dataset.id === String(id)) || null;
+}
+
+function removeRow(tableBodyId, id) {
+    const row = findRow(tableBodyId, id);
+    if (row) row.remove();
+}
+
+function upsertUserRow(user) {
+    const tableBody = document.getElementById('users-table-body');
+    if (!tableBody) return;
+    const existing = findRow('users-table-body', user.id);
+    if (existing) {
+        existing.replaceWith(userRow(user));
+    } else {
+        tableBody.appendChild(userRow(user));
+    }
+}
+
+function userDocuments(user) {
+    const name = `${user.first_name || ''} ${user.last_name || ''}`.trim();
+    const submitted = user.created_at || new Date().toISOString();
+    const documents = [];
+    if (user.resume_path) {
+        documents.push({ id: `${user.id}_resume`, user_name: name, type: 'Resume', submitted_date: submitted });
+    }
+    if (user.permit_path) {
+        documents.push({ id: `${user.id}_permit`, user_name: name, type: 'Business Permit', submitted_date: submitted });
+    }
+    return documents;
+}
+
+function addPendingDocuments(user) {
+    const tableBody = document.getElementById('pending-docs-table-body');
+    if (!tableBody || !['pending', 'pending_verification'].includes(user.verification_status)) return;
+    userDocuments(user).forEach(doc => {
+        if (!findRow('pending-docs-table-body', doc.id)) {
+            tableBody.appendChild(documentRow(doc));
+        }
+    });
+}
+
+function removePendingDocuments(user) {
+    removeRow('pending-docs-table-body', `${user.id}_resume`);
+    removeRow('pending-docs-table-body', `${user.id}_permit`);
+}
@@ -0,0 +1,54 @@
+// Admin change events from /admin/events (server-sent events)
+
+// Wait before trying again after the server refused a stream
+const ADMIN_EVENTS_RETRY_MS = 60000;
+const ADMIN_EVENT_TYPES = ['user_registered', 'document_submitted', 'verification_decided', 'user_deleted', 'stats'];
+
+/**
+ * Call handlers[type](data) for each admin event as it arrives.
+ * handlers.reset() runs when events were missed (the server's replay buffer
+ * ran out); it should reload the page's data once. EventSource reconnects on
+ * its own and resumes from the last event id it saw.
+ */
+function subscribeAdminEvents(handlers) {
+    if (!window.EventSource) {
+        return null;
+    }
+    const source = new EventSource('/admin/events');
+
+    ADMIN_EVENT_TYPES.forEach(type => {
+        if (!handlers[type]) return;
+        source.addEventListener(type, event => {
+            try {
+                handlers[type](JSON.parse(event.data));
+            } catch (error) {
+                console.error(`Error applying admin event ${type}:`, error);
+            }
+        });
+    });
+
+    source.addEventListener('reset', () => {
+        if (handlers.reset) handlers.reset();
+    });
+    source.onerror = () => {
+        // EventSource retries dropped connections itself; it gives up only
+        // when the server refused the stream (e.g. too many open tabs)
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(() => {
+                if (handlers.reset) handlers.reset();
+                subscribeAdminEvents(handlers);
+            }, ADMIN_EVENTS_RETRY_MS);
+        }
+    };
+    return source;
+}
+
+// Add the deltas of a `stats` event to elements marked data-stat="<key>"
+function applyStatsDelta(delta) {
+    Object.entries(delta).forEach(([key, change]) => {
+        document.querySelectorAll(`[data-stat="${key}"]`).forEach(el => {
+            const value = parseInt(el.textContent, 10) || 0;
+            el.textContent = Math.max(0, value + change);
+        });
+    });
+}
@@ -69,30 +69,28 @@ document.addEventListener('DOMContentLoaded', function() {
             behavior: 'smooth'
         });
         
-        // Send request to server
-        fetch('/chatbot/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ message: message })
+        // Stream the reply into one bubble as it arrives
+        let botDiv = null;
+        streamChat(message, {
+            onChunk: (text) => {
+                if (!botDiv) {
+                    chatContainer.removeChild(thinkingDiv);
+                    botDiv = document.createElement('div');
+                    botDiv.className = 'message-bubble bot fade-in';
+                    chatContainer.appendChild(botDiv);
+                }
+                botDiv.textContent = text;
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            }
         })
-        .then(response => response.json())
-        .then(data => {
-            // Remove thinking indicator
-            chatContainer.removeChild(thinkingDiv);
-            
-            // Create bot response bubble
-            const botDiv = document.createElement('div');
-            botDiv.className = 'message-bubble bot fade-in';
-            
-            if (data.error) {
-                botDiv.innerHTML = `<i class="fas fa-exclamation-circle text-warning me-2"></i>${data.error}`;
-            } else {
-                botDiv.textContent = data.response;
+        .then(reply => {
+            if (!botDiv) {
+                chatContainer.removeChild(thinkingDiv);
+                botDiv = document.createElement('div');
+                botDiv.className = 'message-bubble bot fade-in';
+                chatContainer.appendChild(botDiv);
             }
-            
-            chatContainer.appendChild(botDiv);
+            botDiv.textContent = reply;
             
             // Smooth scroll to bottom
             chatContainer.scrollTo({
@@ -104,7 +102,7 @@ document.addEventListener('DOMContentLoaded', function() {
             console.error('Error:', error);
             
             // Remove thinking indicator
-            chatContainer.removeChild(thinkingDiv);
+            if (thinkingDiv.parentNode) chatContainer.removeChild(thinkingDiv);
             
             // Show error message
             const errorDiv = document.createElement('div');
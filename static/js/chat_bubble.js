@@ -63,8 +63,47 @@ class ChatBubble {
         this.messagesContainer.appendChild(thinkingDiv);
         this.scrollToBottom();
 
+        const removeThinking = () => {
+            const thinking = document.getElementById('thinking');
+            if (thinking) thinking.remove();
+        };
+
+        // Stream the reply into one bubble as it arrives
+        let botDiv = null;
+        try {
+            const reply = await streamChat(message, {
+                onChunk: (text) => {
+                    if (!botDiv) {
+                        removeThinking();
+                        botDiv = this.addMessage(text, 'bot');
+                    } else {
+                        this.setMessageText(botDiv, text);
+                    }
+                }
+            });
+            removeThinking();
+            if (botDiv) {
+                this.setMessageText(botDiv, reply);
+            } else {
+                this.addMessage(reply || 'Sorry, I encountered an error. Please try again.', 'bot');
+            }
+        } catch (error) {
+            removeThinking();
+            if (error.fallback && !botDiv) {
+                await this.requestReply(message);
+            } else {
+                console.error('Error:', error);
+                this.addMessage('Sorry, I encountered an error. Please try again.', 'bot');
+            }
+        }
+
+        // Scroll to bottom
+        this.scrollToBottom();
+    }
+
+    // Non-streaming request, used when the streaming endpoint is unavailable
+    async requestReply(message) {
         try {
-            // Send message to chatbot server using new Gemini endpoint
             const response = await fetch('/api/chat', {
                 method: 'POST',
                 headers: {
@@ -74,10 +113,6 @@ class ChatBubble {
                 body: JSON.stringify({ message })
             });
 
-            // Remove thinking indicator
-            const thinking = document.getElementById('thinking');
-            if (thinking) thinking.remove();
-
             if (!response.ok) {
                 const error = await response.json();
                 throw new Error(error.message || error.error || 'Failed to get response');
@@ -96,14 +131,7 @@ class ChatBubble {
         } catch (error) {
             console.error('Error:', error);
             this.addMessage('Sorry, I encountered an error. Please try again.', 'bot');
-            
-            // Remove thinking indicator if still present
-            const thinking = document.getElementById('thinking');
-            if (thinking) thinking.remove();
         }
-
-        // Scroll to bottom
-        this.scrollToBottom();
     }
 
     addMessage(text, type) {
@@ -123,6 +151,16 @@ class ChatBubble {
         `;
         this.messagesContainer.appendChild(messageDiv);
         this.scrollToBottom();
+        return messageDiv;
+    }
+
+    setMessageText(messageDiv, text) {
+        const content = messageDiv.querySelector('.message-content');
+        content.innerHTML = text
+            .replace(/•/g, '<br>•')
+            .replace(/\n/g, '<br>')
+            .trim();
+        this.scrollToBottom();
     }
 
     scrollToBottom() {
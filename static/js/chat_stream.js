@@ -0,0 +1,76 @@
+// Streaming chat client for /api/chat/stream (server-sent events over POST)
+
+// Same clean-up the server applies to the final reply
+function formatChatReply(text) {
+    return text.trim().replace(/\*\*/g, '').replace(/\*/g, '• ');
+}
+
+/**
+ * Send a message and call onChunk(fullTextSoFar) as the reply streams in.
+ * Resolves with the final formatted reply. Rejects with an Error carrying
+ * `fallback = true` when streaming is unavailable and nothing was rendered,
+ * so callers can retry with the plain /api/chat endpoint.
+ */
+async function streamChat(message, { onChunk, signal } = {}) {
+    const csrf = document.querySelector('meta[name="csrf-token"]');
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+            ...(csrf ? { 'X-CSRF-Token': csrf.content } : {})
+        },
+        body: JSON.stringify({ message }),
+        signal
+    });
+
+    const type = response.headers.get('Content-Type') || '';
+    if (!response.ok || !type.includes('text/event-stream') || !response.body) {
+        let detail = 'Failed to get response';
+        try {
+            const data = await response.json();
+            detail = data.message || data.error || detail;
+        } catch (e) { /* not JSON */ }
+        const error = new Error(detail);
+        error.fallback = response.status === 404 || response.status === 405 || !response.body;
+        throw error;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+            const payload = JSON.parse(data);
+
+            if (event === 'chunk') {
+                text += payload.text;
+                if (onChunk) onChunk(formatChatReply(text));
+            } else if (event === 'done') {
+                return payload.message;
+            } else if (event === 'error') {
+                throw new Error(payload.message || 'Error while generating response');
+            }
+        }
+    }
+    // Stream closed without a done event; keep what arrived
+    return formatChatReply(text);
+}
@@ -1,12 +1,19 @@
 // Leaflet Map Initialization and Controls
 let map;
 let markers = [];
+let activeLayer = null;     // 'jobs' or 'services' once a layer has been loaded
+let activeFilters = {};
+let viewportRequest = null; // AbortController of the in-flight viewport fetch
 const DEFAULT_CENTER = [13.3087, 124.0989]; // Catanduanes coordinates
 const DEFAULT_ZOOM = 12;
+const MAP_ENDPOINTS = {
+    jobs: '/api/map/jobs',
+    services: '/api/map/services'
+};
 
 function initMap(elementId, options = {}) {
     map = L.map(elementId).setView(DEFAULT_CENTER, DEFAULT_ZOOM);
-    
+
     L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
         attribution: '© OpenStreetMap contributors'
     }).addTo(map);
@@ -24,6 +31,13 @@ function initMap(elementId, options = {}) {
         });
     }
 
+    // Only the visible listings are fetched, so reload whenever the view changes
+    map.on('moveend', function() {
+        if (activeLayer) {
+            loadViewport(activeLayer, activeFilters);
+        }
+    });
+
     return map;
 }
 
@@ -32,130 +46,105 @@ function clearMarkers() {
     markers = [];
 }
 
-function addJobMarkers(jobs) {
-    clearMarkers();
-    jobs.forEach(job => {
-        if (job.latitude && job.longitude) {
-            const marker = L.marker([job.latitude, job.longitude])
-                .bindPopup(`
-                    <h5>${job.title}</h5>
-                    <p><strong>${job.company_name}</strong></p>
-                    <p>${job.description.substring(0, 100)}...</p>
-                    <a href="/jobs/${job.id}" class="btn btn-sm btn-primary">View Details</a>
-                `);
-            markers.push(marker);
-            marker.addTo(map);
-        }
+function clusterMarker(cluster) {
+    const size = cluster.count < 10 ? 32 : cluster.count < 100 ? 40 : 48;
+    const marker = L.marker([cluster.latitude, cluster.longitude], {
+        icon: L.divIcon({
+            html: `<span>${cluster.count}</span>`,
+            className: 'map-cluster',
+            iconSize: [size, size]
+        })
     });
-    // Auto-fit bounds if there are markers
-    if (markers.length > 0) {
-        const group = new L.featureGroup(markers);
-        map.fitBounds(group.getBounds().pad(0.1));
-    }
-}
-
-function addServiceMarkers(services) {
-    clearMarkers();
-    services.forEach(service => {
-        if (service.latitude && service.longitude) {
-            const marker = L.marker([service.latitude, service.longitude])
-                .bindPopup(`
-                    <h5>${service.title}</h5>
-                    <p>${service.description.substring(0, 100)}...</p>
-                    <p><strong>Payment Offer:</strong> ₱${service.payment_offer}</p>
-                    <a href="/services/${service.id}" class="btn btn-sm btn-primary">View Details</a>
-                `);
-            markers.push(marker);
-            marker.addTo(map);
+    marker.on('click', function() {
+        const [west, south, east, north] = cluster.bbox;
+        if (west === east && south === north) {
+            map.setView([cluster.latitude, cluster.longitude], cluster.expansion_zoom);
+        } else {
+            map.fitBounds([[south, west], [north, east]], { maxZoom: cluster.expansion_zoom });
         }
     });
-    if (markers.length > 0) {
-        const group = new L.featureGroup(markers);
-        map.fitBounds(group.getBounds().pad(0.1));
-    }
+    return marker;
 }
 
-function loadJobsData(filters = {}) {
-    const params = new URLSearchParams(filters);
-    fetch(`/dashboard/api/map/jobs?${params.toString()}`)
-        .then(response => response.json())
-        .then(jobs => addJobMarkers(jobs))
-        .catch(error => console.error('Error loading jobs:', error));
+function jobPopup(job) {
+    return `
+        <h5>${job.title}</h5>
+        <p><strong>${job.business_name || ''}</strong></p>
+        <p>${job.location || ''}</p>
+        <a href="/jobs/${job.id}" class="btn btn-sm btn-primary">View Details</a>
+    `;
 }
 
-function loadServicesData(filters = {}) {
-    const params = new URLSearchParams(filters);
-    fetch(`/dashboard/api/map/services?${params.toString()}`)
-        .then(response => response.json())
-        .then(services => addServiceMarkers(services))
-        .catch(error => console.error('Error loading services:', error));
-}
-
-function zoomToMarker(lat, lng) {
-    map.setView([lat, lng], 15);
-    markers.forEach(marker => {
-        const markerLatLng = marker.getLatLng();
-        if (markerLatLng.lat === lat && markerLatLng.lng === lng) {
-            marker.openPopup();
-        }
-    });
+function servicePopup(service) {
+    return `
+        <h5>${service.title}</h5>
+        <p>${service.location || ''}</p>
+        <p><strong>Payment Offer:</strong> ₱${service.payment_offer ?? ''}</p>
+        <a href="/services/${service.id}" class="btn btn-sm btn-primary">View Details</a>
+    `;
 }
 
-function addJobMarkers(jobs) {
+function addMarkers(items, popup, fitBounds) {
     clearMarkers();
-    jobs.forEach(job => {
-        if (job.latitude && job.longitude) {
-            const marker = L.marker([job.latitude, job.longitude])
-                .bindPopup(`
-                    <h5>${job.title}</h5>
-                    <p><strong>${job.company_name}</strong></p>
-                    <p>${job.description.substring(0, 100)}...</p>
-                    <a href="/jobs/${job.id}" class="btn btn-sm btn-primary">View Details</a>
-                `);
-            markers.push(marker);
-            marker.addTo(map);
+    items.forEach(item => {
+        if (item.cluster) {
+            markers.push(clusterMarker(item).addTo(map));
+        } else if (item.latitude && item.longitude) {
+            const marker = L.marker([item.latitude, item.longitude]).bindPopup(popup(item));
+            markers.push(marker.addTo(map));
         }
     });
-    // Auto-fit bounds if there are markers
-    if (markers.length > 0) {
+    // Auto-fit bounds only for unbounded lists; viewport results follow the map
+    if (fitBounds && markers.length > 0) {
         const group = new L.featureGroup(markers);
         map.fitBounds(group.getBounds().pad(0.1));
     }
 }
 
-function addServiceMarkers(services) {
-    clearMarkers();
-    services.forEach(service => {
-        if (service.latitude && service.longitude) {
-            const marker = L.marker([service.latitude, service.longitude])
-                .bindPopup(`
-                    <h5>${service.title}</h5>
-                    <p>${service.description.substring(0, 100)}...</p>
-                    <p><strong>Payment Offer:</strong> ₱${service.payment_offer}</p>
-                    <a href="/services/${service.id}" class="btn btn-sm btn-primary">View Details</a>
-                `);
-            markers.push(marker);
-            marker.addTo(map);
-        }
-    });
-    if (markers.length > 0) {
-        const group = new L.featureGroup(markers);
-        map.fitBounds(group.getBounds().pad(0.1));
-    }
+function addJobMarkers(jobs, fitBounds = true) {
+    addMarkers(jobs, jobPopup, fitBounds);
 }
 
-function loadJobsData() {
-    fetch('/api/map/jobs')
-        .then(response => response.json())
-        .then(jobs => addJobMarkers(jobs))
-        .catch(error => console.error('Error loading jobs:', error));
+function addServiceMarkers(services, fitBounds = true) {
+    addMarkers(services, servicePopup, fitBounds);
 }
 
-function loadServicesData() {
-    fetch('/api/map/services')
+function loadViewport(layer, filters = {}) {
+    activeLayer = layer;
+    activeFilters = filters;
+    if (viewportRequest) {
+        viewportRequest.abort();
+    }
+    viewportRequest = new AbortController();
+
+    const params = new URLSearchParams(filters);
+    params.set('bbox', map.getBounds().toBBoxString());
+    params.set('zoom', map.getZoom());
+    const popup = layer === 'jobs' ? jobPopup : servicePopup;
+
+    fetch(`${MAP_ENDPOINTS[layer]}?${params.toString()}`, { signal: viewportRequest.signal })
         .then(response => response.json())
-        .then(services => addServiceMarkers(services))
-        .catch(error => console.error('Error loading services:', error));
+        .then(data => {
+            // Owners get their own (unclustered) listings as a plain array
+            if (Array.isArray(data)) {
+                addMarkers(data, popup, false);
+            } else {
+                addMarkers(data.items, popup, false);
+            }
+        })
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                console.error(`Error loading ${layer}:`, error);
+            }
+        });
+}
+
+function loadJobsData(filters = {}) {
+    loadViewport('jobs', filters);
+}
+
+function loadServicesData(filters = {}) {
+    loadViewport('services', filters);
 }
 
 function zoomToMarker(lat, lng) {
@@ -166,4 +155,4 @@ function zoomToMarker(lat, lng) {
             marker.openPopup();
         }
     });
-}
\ No newline at end of file
+}
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from flask import Flask
+from flask_login import LoginManager, UserMixin
+
+import activity_stats
+from activity_stats import ActivityStats
+
+
+class Admin(UserMixin):
+    id = 'admin-1'
+    role = 'admin'
+    email = 'admin@example.com'
+
+
+def epoch(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+class TestActivityStats(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.stats = ActivityStats(os.path.join(self.tmpdir, 'stats.db'))
+        self.offset = activity_stats.UTC_OFFSET
+        activity_stats.UTC_OFFSET = 8
+
+    def tearDown(self):
+        activity_stats.UTC_OFFSET = self.offset
+        shutil.rmtree(self.tmpdir)
+
+    def test_days_follow_the_configured_offset(self):
+        # 17:30 UTC is 01:30 the next day in UTC+8
+        self.assertEqual(activity_stats.bucket_start(epoch(2025, 9, 1, 17, 30), 'day'), epoch(2025, 9, 1, 16))
+        self.assertEqual(activity_stats.bucket_start(epoch(2025, 9, 1, 17, 30), 'hour'), epoch(2025, 9, 1, 17))
+
+    def test_series_counts_and_fills_gaps(self):
+        self.stats.record('signups', epoch(2025, 9, 1, 0, 10))
+        self.stats.record('signups', epoch(2025, 9, 1, 0, 50))
+        self.stats.record('signups', epoch(2025, 9, 3, 0, 5))
+        self.stats.record('jobs', epoch(2025, 9, 1, 0, 10))
+
+        days = self.stats.series('signups', epoch(2025, 8, 31, 16), epoch(2025, 9, 3, 16), 'day')
+        self.assertEqual([count for _, count in days], [2, 0, 1])
+        hours = self.stats.series('signups', epoch(2025, 9, 1), epoch(2025, 9, 1, 2), 'hour')
+        self.assertEqual(hours, [(epoch(2025, 9, 1), 2), (epoch(2025, 9, 1, 1), 0)])
+
+        with self.assertRaises(ValueError):
+            self.stats.series('visits', epoch(2025, 9, 1), epoch(2025, 9, 2))
+        with self.assertRaises(ValueError):
+            self.stats.series('signups', epoch(2020, 1, 1), epoch(2025, 1, 1), 'hour')
+
+    def test_replace_rebuilds_a_metric(self):
+        self.stats.record('applications', epoch(2025, 9, 1, 5))
+        total = self.stats.replace('applications', [epoch(2025, 9, 2, 5), epoch(2025, 9, 2, 6), float('nan')])
+        self.assertEqual(total, 2)
+        days = self.stats.series('applications', epoch(2025, 8, 31, 16), epoch(2025, 9, 2, 16), 'day')
+        self.assertEqual([count for _, count in days], [0, 2])
+
+
+class TestTimeseriesRoute(unittest.TestCase):
+    def setUp(self):
+        from routes.admin import admin
+        self.tmpdir = tempfile.mkdtemp()
+        activity_stats._stats = ActivityStats(os.path.join(self.tmpdir, 'stats.db'))
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        login_manager = LoginManager(app)
+        login_manager.user_loader(lambda user_id: None)
+        login_manager.request_loader(lambda request: Admin())
+        app.register_blueprint(admin, name='admin_blueprint')
+        self.client = app.test_client()
+
+    def tearDown(self):
+        activity_stats._stats = None
+        shutil.rmtree(self.tmpdir)
+
+    def test_returns_one_point_per_interval(self):
+        activity_stats.record('chat_messages')
+        response = self.client.get('/admin/reports/timeseries?metric=chat_messages,jobs&interval=hour')
+        self.assertEqual(response.status_code, 200)
+        series = response.get_json()['series']
+        # 48 hours back from now: the partial hours at both ends included
+        self.assertEqual(len(series['chat_messages']), 49)
+        self.assertEqual(sum(p['count'] for p in series['chat_messages']), 1)
+        self.assertEqual(sum(p['count'] for p in series['jobs']), 0)
+
+        self.assertEqual(self.client.get('/admin/reports/timeseries?start=soon').status_code, 400)
+        self.assertEqual(self.client.get('/admin/reports/timeseries?metric=visits').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+from flask import Flask
+from flask_login import LoginManager, UserMixin
+
+import admin_events
+from admin_events import EventBus, format_event
+from rate_limit import chat_limiter
+
+
+class Admin(UserMixin):
+    id = 'admin-1'
+    role = 'admin'
+    email = 'admin@example.com'
+
+
+class TestEventBus(unittest.TestCase):
+    def test_subscribers_receive_published_events(self):
+        bus = EventBus()
+        subscription = bus.subscribe()
+        bus.publish('stats', {'total_users': 1})
+        self.assertEqual(subscription.queue.get_nowait(), (1, 'stats', {'total_users': 1}))
+        bus.unsubscribe(subscription)
+        bus.publish('stats', {'total_users': 1})
+        self.assertTrue(subscription.queue.empty())
+
+    def test_reconnect_replays_missed_events(self):
+        bus = EventBus(history=3, max_streams=2)
+        for n in range(3):
+            bus.publish('stats', {'n': n})
+        subscription = bus.subscribe(last_event_id=bus.event_id(1))
+        self.assertEqual([subscription.queue.get_nowait()[0] for _ in range(2)], [2, 3])
+
+        # Events 2 and 3 fell out of the history: the client must reload
+        for n in range(3):
+            bus.publish('stats', {'n': n})
+        late = bus.subscribe(last_event_id=bus.event_id(1))
+        stream = bus.stream(late, heartbeat=0.01, max_age=1)
+        self.assertTrue(next(stream).startswith('retry:'))
+        self.assertEqual(next(stream), format_event(bus.event_id(6), 'reset', {}))
+
+    def test_reconnect_after_restart_resets(self):
+        old = EventBus()
+        for n in range(500):
+            old.publish('stats', {'n': n})
+        restarted = EventBus(max_streams=3)
+        restarted.publish('stats', {'n': 0})
+        # An id from the previous process, a bare number, and one ahead of this bus
+        for last_id in (old.event_id(500), '500', restarted.event_id(7)):
+            subscription = restarted.subscribe(last_event_id=last_id)
+            self.assertTrue(subscription.overflowed)
+            self.assertTrue(subscription.queue.empty())
+
+    def test_slow_subscriber_is_reset_and_streams_are_capped(self):
+        bus = EventBus(queue_size=1, max_streams=1)
+        subscription = bus.subscribe()
+        self.assertIsNone(bus.subscribe())
+        bus.publish('stats', {'a': 1})
+        bus.publish('stats', {'a': 1})
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(bus.stats()['dropped'], 1)
+
+    def test_verification_delta(self):
+        bus = admin_events.bus = EventBus()
+        try:
+            admin_events.verification_decided({'id': 'u1', 'role': 'client'}, 'verified',
+                                              previous_status='pending_verification')
+            events = [item[1:] for item in bus._history]
+        finally:
+            admin_events.bus = EventBus()
+        self.assertEqual(events[0][0], 'verification_decided')
+        self.assertEqual(events[1], ('stats', {'pending_verifications': -1}))
+
+
+class TestEventsRoute(unittest.TestCase):
+    def setUp(self):
+        from routes.admin import admin
+        admin_events.bus = EventBus()
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        login_manager = LoginManager(app)
+        login_manager.user_loader(lambda user_id: None)
+        login_manager.request_loader(lambda request: Admin())
+        app.register_blueprint(admin, name='admin_blueprint')
+        self.client = app.test_client()
+
+    def tearDown(self):
+        admin_events.bus = EventBus()
+
+    def test_stream_resumes_from_last_event_id(self):
+        admin_events.publish('user_registered', {'user': {'id': 'u1'}})
+        admin_events.publish('user_registered', {'user': {'id': 'u2'}})
+        last_id = admin_events.bus.event_id(1)
+        response = self.client.get('/admin/events', headers={'Last-Event-ID': last_id}, buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        chunks = response.response
+        self.assertTrue(next(chunks).decode().startswith('retry:'))
+        self.assertIn('"u2"', next(chunks).decode())
+        self.assertEqual(admin_events.bus.stats()['streams'], 1)
+        # The stream holds a chat slot, and a second one is turned away
+        self.assertEqual(chat_limiter.stats()['active'], 1)
+        self.assertEqual(self.client.get('/admin/events').status_code, 503)
+        self.assertEqual(chat_limiter.stats()['active'], 1)
+        response.close()
+        self.assertEqual(admin_events.bus.stats()['streams'], 0)
+        self.assertEqual(chat_limiter.stats()['active'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+import admin_sync
+
+
+class TestAdminSync(unittest.TestCase):
+    def test_parse_since(self):
+        self.assertIsNone(admin_sync.parse_since(None))
+        self.assertIsNone(admin_sync.parse_since(''))
+        self.assertEqual(admin_sync.parse_since('1700000000000'), 1700000000000)
+        for bad in ('abc', '-5'):
+            with self.assertRaises(ValueError):
+                admin_sync.parse_since(bad)
+
+    def test_window(self):
+        now = 1700000000000
+        self.assertEqual(admin_sync.window(0, now), (None, True))
+        # Looks back a little to catch writes that committed after the last read
+        self.assertEqual(admin_sync.window(now - 1000, now), (now - 1000 - admin_sync.OVERLAP_MS, False))
+        # Tombstones that old are gone: only a full list is correct
+        self.assertEqual(admin_sync.window(now - admin_sync.TOMBSTONE_MS - 1, now), (None, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import admin_users
+
+
+class FakeResult(list):
+    def data(self):
+        return list(self)
+
+
+class FakeSession:
+    """Records the Cypher sent and serves rows from a list of user dicts."""
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+
+    def run(self, query, **params):
+        self.queries.append((query, params))
+        key = 'name_key' if 'u.name_key ASC' in query or 'u.name_key DESC' in query else 'email_key'
+        rows = sorted(self.users, key=lambda u: (u[key], u['id']), reverse='DESC' in query)
+        if 'after_key' in params:
+            after = (params['after_key'], params['after_id'])
+            rows = [u for u in rows if ((u[key], u['id']) < after if 'DESC' in query else (u[key], u['id']) > after)]
+        return FakeResult({'u': u} for u in rows[:params['limit']])
+
+
+class TestAdminUsers(unittest.TestCase):
+    def test_sort_keys_are_normalized(self):
+        self.assertEqual(admin_users.sort_keys(' Ana@Example.COM ', 'José  María', 'Peña'),
+                         {'email_key': 'ana@example.com', 'name_key': 'pena jose maria'})
+
+    def test_pages_follow_the_cursor(self):
+        users = [dict(admin_users.sort_keys(f'user{n:02d}@example.com', 'A', 'B'), id=str(n)) for n in range(5)]
+        session = FakeSession(users)
+        seen, cursor = [], None
+        while True:
+            page, cursor = admin_users.list_users(session, cursor=cursor, page_size=2)
+            seen.extend(u['id'] for u in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['0', '1', '2', '3', '4'])
+        self.assertIn('u.email_key > $after_key', session.queries[-1][0])
+
+    def test_filters_and_bad_cursors(self):
+        session = FakeSession([])
+        admin_users.list_users(session, role='client', status='verified', q='Pe')
+        query, params = session.queries[-1]
+        self.assertIn('u.role = $role AND u.verification_status = $status', query)
+        self.assertIn('STARTS WITH $q', query)
+        self.assertEqual(params['q'], 'pe')
+
+        cursor = admin_users.encode_cursor('name', 'pena', '1')
+        with self.assertRaises(ValueError):
+            admin_users.list_users(session, sort='email', cursor=cursor)
+        with self.assertRaises(ValueError):
+            admin_users.list_users(session, cursor='not-a-cursor')
+
+
+if __name__ == '__main__':
+    unittest.main()
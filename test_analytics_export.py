@@ -0,0 +1,103 @@
+import math
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+import analytics_export
+
+
+class FakeResult(list):
+    def data(self):
+        return list(self)
+
+    def single(self):
+        return self[0]
+
+
+class FakeSession:
+    """Serves each label's rows in keyset batches, like the export queries."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def run(self, query, limit, after=None):
+        self.calls += 1
+        label = query.split('(n:')[1].split(')')[0]
+        if 'SET n.id' in query:
+            missing = [r for r in self.rows.get(label, []) if 'id' not in r][:limit]
+            for n, row in enumerate(missing):
+                row['id'] = f'{label.lower()}-new-{n}'
+            return FakeResult([{'updated': len(missing)}])
+        rows = sorted((r for r in self.rows.get(label, []) if r['id'] > after), key=lambda r: r['id'])
+        return FakeResult(rows[:limit])
+
+
+class FakeDriver:
+    def __init__(self, session):
+        self._session = session
+
+    def session(self, database=None):
+        driver = self
+
+        class Context:
+            def __enter__(self):
+                return driver._session
+
+            def __exit__(self, *exc):
+                return False
+        return Context()
+
+
+NOW = datetime(2025, 9, 10, tzinfo=timezone.utc).timestamp()
+
+
+class TestAnalyticsExport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_to_epoch_handles_every_stored_form(self):
+        expected = datetime(2025, 9, 1, tzinfo=timezone.utc).timestamp()
+        self.assertEqual(analytics_export.to_epoch('2025-09-01T00:00:00'), expected)
+        self.assertEqual(analytics_export.to_epoch('2025-09-01T00:00:00Z'), expected)
+        self.assertEqual(analytics_export.to_epoch(int(expected * 1000)), expected)
+        self.assertEqual(analytics_export.to_epoch(datetime(2025, 9, 1)), expected)
+        self.assertTrue(math.isnan(analytics_export.to_epoch('yesterday')))
+        self.assertTrue(math.isnan(analytics_export.to_epoch(None)))
+
+    def test_export_and_report(self):
+        rows = {
+            'User': [
+                {'id': 'u1', 'role': 'job_seeker', 'verification_status': 'verified', 'created_at': '2025-09-08T10:00:00'},
+                {'id': 'u2', 'role': 'client', 'verification_status': 'pending_verification', 'created_at': '2025-09-01T10:00:00'},
+                {'id': 'u3', 'role': 'job_seeker', 'verification_status': 'verified'},
+            ],
+            'Job': [{'id': f'j{n}', 'municipality_id': 'virac' if n < 2 else ''} for n in range(3)],
+            'Application': [{'id': 'a1', 'status': 'rejected'}, {'id': 'a2', 'status': 'pending'},
+                            {'id': 'a3', 'status': 'pending'}],
+            'Review': [{'id': 'r1', 'rating': 4}, {'id': 'r2', 'rating': '5'}, {'id': 'r3', 'rating': None}],
+            # Created by an older writer without an id
+            'ServiceRequest': [{'status': 'open'}, {'status': 'open'}],
+        }
+        session = FakeSession(rows)
+        manifest = analytics_export.export_all(FakeDriver(session), None, self.tmpdir, fmt='npz', batch_size=2)
+        self.assertEqual(manifest['rows']['users'], 3)
+        self.assertEqual(manifest['rows']['service_requests'], 2)
+
+        report = analytics_export.compute_report(self.tmpdir, now=NOW)
+        self.assertEqual(report['verified_users'], 2)
+        self.assertEqual(report['pending_users'], 1)
+        self.assertEqual(report['users_by_role'], [('job_seeker', 2), ('client', 1)])
+        self.assertEqual(report['jobs_per_municipality'], [('Virac', 2)])
+        self.assertEqual(report['application_funnel'], [('pending', 2), ('rejected', 1)])
+        self.assertEqual(report['average_rating'], 4.5)
+        self.assertEqual(report['signups_per_week'][-2:], [('2025-09-01', 1), ('2025-09-08', 1)])
+        self.assertEqual(report['users_without_signup_date'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
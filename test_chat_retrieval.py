@@ -0,0 +1,55 @@
+import unittest
+
+from chat_retrieval import format_context, retrieve
+
+
+class ListRetriever:
+    name = 'list'
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = 0
+
+    def retrieve(self, query, limit):
+        self.calls += 1
+        return self.documents[:limit]
+
+
+class BrokenRetriever:
+    name = 'broken'
+
+    def retrieve(self, query, limit):
+        raise RuntimeError('index missing')
+
+
+DOCUMENTS = [
+    ({'type': 'job', 'id': 'j1', 'title': 'Carpenter', 'business_name': 'Virac Furniture',
+      'location': 'Virac', 'salary': 500, 'description': 'Build cabinets'}, 0.81),
+    ({'type': 'business', 'id': 'b1', 'title': 'Bato Seafood Grill', 'location': 'Bato',
+      'category': 'Restaurant'}, 0.42),
+]
+
+
+class TestChatRetrieval(unittest.TestCase):
+    def test_single_pass_with_trace(self):
+        retriever = ListRetriever(DOCUMENTS)
+        retrieval = retrieve('carpenter jobs', retriever=retriever)
+        self.assertEqual(retriever.calls, 1)
+        self.assertEqual(retrieval.trace['retriever'], 'list')
+        self.assertGreaterEqual(retrieval.trace['ms'], 0)
+        self.assertEqual([(d['type'], d['id'], d['score']) for d in retrieval.trace['documents']],
+                         [('job', 'j1', 0.81), ('business', 'b1', 0.42)])
+        self.assertIn('- Carpenter at Virac Furniture', retrieval.context)
+        self.assertIn('Relevant Businesses:', retrieval.context)
+        self.assertNotIn('Relevant Services:', retrieval.context)
+
+    def test_failed_retrieval_means_no_context(self):
+        retrieval = retrieve('anything', retriever=BrokenRetriever())
+        self.assertEqual(retrieval.documents, [])
+        self.assertIsNone(retrieval.context)
+        self.assertEqual(retrieval.trace['error'], 'index missing')
+        self.assertIsNone(format_context([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
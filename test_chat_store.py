@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from chat_store import ChatStore
+
+
+class TestChatStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = ChatStore(os.path.join(self.tmpdir, 'chat.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_append_and_recent_messages(self):
+        cid = self.store.create_conversation()
+        for i in range(6):
+            self.store.append(cid, {'role': 'user', 'content': f'q{i}'},
+                              {'role': 'assistant', 'content': f'a{i}'})
+        recent = self.store.recent_messages(cid, 4)
+        self.assertEqual([m['content'] for m in recent], ['q4', 'a4', 'q5', 'a5'])
+        self.assertEqual(set(recent[0]), {'role', 'content'})
+
+    def test_pages_backwards_with_cursor(self):
+        cid = self.store.create_conversation()
+        self.store.append(cid, *[{'role': 'user', 'content': str(i)} for i in range(5)])
+        page, cursor = self.store.get_messages(cid, limit=2)
+        self.assertEqual([m['content'] for m in page], ['3', '4'])
+        page, cursor = self.store.get_messages(cid, limit=2, before=cursor)
+        self.assertEqual([m['content'] for m in page], ['1', '2'])
+        page, cursor = self.store.get_messages(cid, limit=2, before=cursor)
+        self.assertEqual([m['content'] for m in page], ['0'])
+        self.assertIsNone(cursor)
+
+    def test_clear_claim_and_prune(self):
+        cid = self.store.create_conversation()
+        self.store.append(cid, {'role': 'user', 'content': 'hello'})
+        self.store.claim(cid, 'user-1')
+        self.store.claim(cid, 'user-2')
+        self.assertEqual(self.store.get_conversation(cid)['user_id'], 'user-1')
+
+        self.store.clear(cid)
+        self.assertEqual(self.store.recent_messages(cid), [])
+        self.assertIsNotNone(self.store.get_conversation(cid))
+
+        self.assertEqual(self.store.prune(older_than_days=1), 0)
+        self.assertEqual(self.store.prune(older_than_days=-1), 1)
+        self.assertIsNone(self.store.get_conversation(cid))
+
+    def test_prunes_on_create_at_most_once_per_interval(self):
+        now = [1000.0]
+        store = ChatStore(os.path.join(self.tmpdir, 'retention.db'), retention_days=1, clock=lambda: now[0])
+        old = store.create_conversation()
+        conn = store._connection()
+        with conn:
+            conn.execute("UPDATE conversations SET updated_at = '2000-01-01T00:00:00' WHERE id = ?", (old,))
+        # Within the interval the prune does not run again
+        store.create_conversation()
+        self.assertIsNotNone(store.get_conversation(old))
+        now[0] += 3601
+        recent = store.create_conversation()
+        self.assertIsNone(store.get_conversation(old))
+        self.assertIsNotNone(store.get_conversation(recent))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from chatbot_pipeline import Pipeline, Tier, answer_from_listings, answer_from_rules
+from geo.spatial_index import SpatialIndex
+
+
+class TestChatbotPipeline(unittest.TestCase):
+    def setUp(self):
+        self.index = SpatialIndex()
+        self.index.upsert('job', 'j1', 13.58, 124.23, title='Carpenter', category='Construction',
+                          municipality_id='virac', business_name='Virac Builders')
+        self.index.upsert('job', 'j2', 13.58, 124.23, title='Cashier', category='Retail',
+                          municipality_id='virac')
+        self.index.upsert('job', 'j3', 13.80, 124.30, title='Carpenter helper', category='Construction',
+                          municipality_id='bato')
+        self.index.upsert('business', 'b1', 13.58, 124.23, title='Virac Bakery', category='Food',
+                          municipality_id='virac')
+
+    def test_rules(self):
+        answer, confidence = answer_from_rules('Where can I find jobs?')
+        self.assertIn('Job Portal', answer)
+        self.assertEqual(confidence, 1.0)
+        answer, _ = answer_from_rules('How do I apply for a job?')
+        self.assertIn('Apply', answer)
+        # Only part of the message is explained by the rule
+        _, confidence = answer_from_rules('carpenter jobs in Virac')
+        self.assertLess(confidence, 0.5)
+        self.assertIsNone(answer_from_rules('the'))
+
+    def test_retrieval(self):
+        answer, confidence = answer_from_listings('carpenter jobs in Virac', index=self.index)
+        self.assertEqual(confidence, 1.0)
+        self.assertIn('Carpenter at Virac Builders', answer)
+        self.assertNotIn('Cashier', answer)
+        self.assertNotIn('helper', answer)
+
+        answer, _ = answer_from_listings('businesses in Virac', index=self.index)
+        self.assertIn('Virac Bakery', answer)
+        self.assertNotIn('Carpenter', answer)
+
+        self.assertIsNone(answer_from_listings('plumber jobs in Virac', index=self.index))
+        self.assertIsNone(answer_from_listings('tell me a joke', index=self.index))
+
+    def test_pipeline_order_fallback_and_stats(self):
+        calls = []
+
+        def model(text):
+            calls.append(text)
+            return None
+
+        pipeline = Pipeline([
+            Tier('rules', answer_from_rules, 0.6),
+            Tier('retrieval', lambda text: answer_from_listings(text, index=self.index), 0.6),
+            Tier('model', model, 0.0),
+        ])
+        self.assertEqual(pipeline.answer('jobs')[1], 'rules')
+        self.assertEqual(pipeline.answer('jobs in Virac')[1], 'retrieval')
+        self.assertEqual(calls, [])
+
+        # No tier is confident and the model is unavailable: best low-confidence answer wins
+        answer, tier = pipeline.answer('jobs for a plumber with a license')
+        self.assertEqual(tier, 'rules')
+        self.assertIn('Job Portal', answer)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(pipeline.answer('qwerty'), (None, None))
+
+        stats = pipeline.stats()
+        self.assertEqual(stats['rules']['attempts'], 4)
+        self.assertEqual(stats['rules']['hits'], 1)
+        self.assertEqual(stats['rules']['fallbacks'], 1)
+        self.assertEqual(stats['retrieval']['hits'], 1)
+        self.assertEqual(stats['model']['attempts'], 2)
+
+    def test_tier_errors_are_counted(self):
+        def broken(text):
+            raise RuntimeError('boom')
+
+        pipeline = Pipeline([Tier('broken', broken, 0.5), Tier('rules', answer_from_rules, 0.6)])
+        self.assertEqual(pipeline.answer('hello')[1], 'rules')
+        self.assertEqual(pipeline.stats()['broken']['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
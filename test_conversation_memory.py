@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from chat_store import ChatStore
+from conversation_memory import SUMMARY_PREFIX, ConversationMemory
+
+
+class TestConversationMemory(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = ChatStore(os.path.join(self.tmpdir, 'chat.db'))
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def summarize(self, messages, previous):
+        self.calls.append((len(messages), previous))
+        return f"talked about {len(messages)} messages"
+
+    def add_turns(self, cid, count, words=30):
+        for i in range(count):
+            self.store.append(cid, {'role': 'user', 'content': f'question {i} ' + 'word ' * words},
+                              {'role': 'assistant', 'content': f'answer {i} ' + 'word ' * words})
+
+    def test_compacts_older_turns_and_keeps_recent(self):
+        memory = ConversationMemory(self.summarize, store=self.store, threshold=200, keep_turns=2)
+        cid = self.store.create_conversation()
+        self.add_turns(cid, 2)
+        self.assertIsNone(memory.maybe_compact(cid))
+
+        self.add_turns(cid, 4)
+        self.assertTrue(memory.maybe_compact(cid).result(timeout=5))
+        history = memory.history(cid)
+        self.assertEqual(history[0]['content'], SUMMARY_PREFIX + 'talked about 8 messages')
+        self.assertEqual(len(history), 5)
+        self.assertTrue(history[-1]['content'].startswith('answer 3'))
+        self.assertGreater(memory.stats()['tokens_saved_per_turn'], 0)
+
+        # The next compaction folds the previous summary in
+        self.add_turns(cid, 4)
+        memory.maybe_compact(cid).result(timeout=5)
+        self.assertEqual(self.calls[-1], (8, 'talked about 8 messages'))
+
+    def test_failed_summary_keeps_full_history(self):
+        memory = ConversationMemory(lambda messages, previous: None, store=self.store,
+                                    threshold=100, keep_turns=1)
+        cid = self.store.create_conversation()
+        self.add_turns(cid, 3)
+        self.assertFalse(memory.maybe_compact(cid).result(timeout=5))
+        self.assertEqual(len(memory.history(cid)), 6)
+        self.assertEqual(memory.stats()['failures'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
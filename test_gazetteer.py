@@ -0,0 +1,44 @@
+import unittest
+
+from geo.gazetteer import geocode, load_gazetteer, location_condition, municipalities, needs_coordinates
+
+
+class TestGazetteer(unittest.TestCase):
+    def test_all_municipalities_present(self):
+        self.assertEqual(len(municipalities()), 11)
+        by_id = load_gazetteer()[0]
+        for municipality in by_id.values():
+            self.assertTrue(13.4 < municipality['latitude'] < 14.2)
+            self.assertTrue(123.9 < municipality['longitude'] < 124.5)
+
+    def test_municipality_names_and_aliases(self):
+        self.assertEqual(geocode('Virac, Catanduanes').municipality_id, 'virac')
+        self.assertEqual(geocode('Brgy. Poblacion, Calolbon').municipality_id, 'san_andres')
+        self.assertEqual(geocode('PAYO').municipality_id, 'panganiban')
+        self.assertEqual(geocode('Rawis', 'Virac').barangay, 'rawis')
+
+    def test_barangay_only_and_unknown(self):
+        self.assertEqual(geocode('Sitio 2, Putsan').municipality_id, 'baras')
+        # Barangay names shared by several municipalities are ambiguous
+        self.assertIsNone(geocode('Salvacion'))
+        self.assertIsNone(geocode('Manila'))
+        self.assertIsNone(geocode(None, ''))
+
+    def test_location_condition(self):
+        params = {}
+        self.assertEqual(location_condition('j', 'Bato', params),
+                         '(j.municipality_id = $municipality_id OR '
+                         '(j.municipality_id IS NULL AND j.location = $location))')
+        self.assertEqual(params, {'municipality_id': 'bato', 'location': 'Bato'})
+        params = {}
+        self.assertEqual(location_condition('j', 'Remote', params), 'j.location = $location')
+        self.assertEqual(params, {'location': 'Remote'})
+
+    def test_needs_coordinates(self):
+        self.assertTrue(needs_coordinates(None, 124.2))
+        self.assertTrue(needs_coordinates(13.5, 124.3))
+        self.assertFalse(needs_coordinates(13.58, 124.23))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import threading
+import time
+import unittest
+
+from fake_gemini import FakeGeminiServer
+from gemini_transport import (
+    CircuitBreaker, GeminiDeadlineExceeded, GeminiError, GeminiRateLimited, GeminiTransport,
+    GeminiUnavailable,
+)
+
+BODY = {'contents': [{'role': 'user', 'parts': [{'text': 'hello'}]}]}
+MODEL = 'models/gemini-pro-latest'
+
+
+class TestGeminiTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeGeminiServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def transport(self, **kwargs):
+        return GeminiTransport('test-key', base_url=self.server.url, **kwargs)
+
+    def test_generate_and_stream(self):
+        transport = self.transport()
+        self.assertEqual(transport.generate(MODEL, BODY), 'echo: hello')
+        self.server.script('one two three')
+        self.assertEqual(list(transport.stream(MODEL, BODY)), ['one ', 'two ', 'three'])
+        self.assertEqual(self.server.requests[0]['api_key'], 'test-key')
+        self.assertIn('/v1beta/models/gemini-pro-latest:generateContent', self.server.requests[0]['path'])
+
+    def test_retries_transient_errors_within_deadline(self):
+        self.server.script(503, {'status': 429, 'retry_after': 0}, 'recovered')
+        self.assertEqual(self.transport().generate(MODEL, BODY, deadline=10), 'recovered')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_backoff_never_exceeds_deadline(self):
+        self.server.script(*[{'status': 429, 'retry_after': 5}] * 3)
+        start = time.monotonic()
+        with self.assertRaises(GeminiRateLimited):
+            self.transport().generate(MODEL, BODY, deadline=1)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_client_errors_are_not_retried(self):
+        self.server.script(400)
+        transport = self.transport()
+        with self.assertRaises(GeminiError) as ctx:
+            transport.generate(MODEL, BODY)
+        self.assertEqual(ctx.exception.status, 400)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(transport.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_reply_hits_deadline(self):
+        self.server.script({'delay': 1.0, 'text': 'late'})
+        with self.assertRaises(GeminiDeadlineExceeded):
+            self.transport().generate(MODEL, BODY, deadline=0.3)
+
+    def test_circuit_breaker_fails_fast_then_recovers(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+        transport = self.transport(breaker=breaker)
+        for _ in range(2):
+            self.server.script(*[500] * 10)
+            with self.assertRaises(GeminiError):
+                transport.generate(MODEL, BODY, deadline=0.2)
+            self.server._steps.clear()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        sent = len(self.server.requests)
+        with self.assertRaises(GeminiUnavailable):
+            transport.generate(MODEL, BODY)
+        self.assertEqual(len(self.server.requests), sent)
+
+        # After the reset timeout one trial call goes through and closes the circuit
+        now[0] += 31
+        self.assertEqual(transport.generate(MODEL, BODY), 'echo: hello')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_semaphore_limits_concurrency(self):
+        transport = self.transport(max_concurrency=1)
+        self.server.script({'delay': 0.5, 'text': 'slow'})
+        worker = threading.Thread(target=transport.generate, args=(MODEL, BODY))
+        worker.start()
+        time.sleep(0.1)
+        with self.assertRaises(GeminiUnavailable):
+            transport.generate(MODEL, BODY, deadline=0.1)
+        worker.join(2)
+        self.assertEqual(transport.generate(MODEL, BODY), 'echo: hello')
+
+    def test_closing_stream_releases_slot(self):
+        transport = self.transport(max_concurrency=1)
+        self.server.script({'text': ' '.join(['word'] * 50), 'chunk_delay': 0.02})
+        chunks = transport.stream(MODEL, BODY)
+        self.assertEqual(next(chunks), 'word ')
+        chunks.close()
+        self.assertEqual(transport.generate(MODEL, BODY, deadline=1), 'echo: hello')
+
+
+if __name__ == '__main__':
+    unittest.main()
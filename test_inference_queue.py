@@ -0,0 +1,80 @@
+import threading
+import time
+import unittest
+
+from inference_queue import InferenceQueue, QueueFull, QueueTimeout
+
+
+class TestInferenceQueue(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def generate(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(0.05)
+        return [text.upper() for text in texts]
+
+    def test_single_request_does_not_wait_for_window(self):
+        queue = InferenceQueue(self.generate, max_batch=4, window_ms=500)
+        start = time.monotonic()
+        self.assertEqual(queue.submit('hello'), 'HELLO')
+        self.assertLess(time.monotonic() - start, 0.4)
+
+    def test_concurrent_requests_are_batched(self):
+        queue = InferenceQueue(self.generate, max_batch=4, window_ms=100)
+        results = {}
+
+        def ask(text):
+            results[text] = queue.submit(text)
+
+        threads = [threading.Thread(target=ask, args=(f'q{i}',)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, {f'q{i}': f'Q{i}' for i in range(6)})
+        self.assertLess(len(self.calls), 6)
+        self.assertTrue(all(len(batch) <= 4 for batch in self.calls))
+        stats = queue.stats()
+        self.assertEqual(stats['requests'], 6)
+        self.assertGreater(stats['max_batch_seen'], 1)
+        self.assertEqual(stats['depth'], 0)
+
+    def test_deadline_and_depth(self):
+        release = threading.Event()
+
+        def slow(texts):
+            release.wait(2)
+            return texts
+
+        queue = InferenceQueue(slow, max_batch=1, window_ms=0, max_depth=1)
+        first = threading.Thread(target=lambda: queue.submit('first', timeout=2))
+        first.start()
+        time.sleep(0.05)  # 'first' is now running, not queued
+
+        with self.assertRaises(QueueTimeout):
+            queue.submit('late', timeout=0.05)
+        # 'late' is still queued (it expired), so the queue is at max_depth
+        with self.assertRaises(QueueFull):
+            queue.submit('rejected', timeout=0.05)
+
+        release.set()
+        first.join(2)
+        self.assertEqual(queue.submit('after', timeout=2), 'after')
+        stats = queue.stats()
+        self.assertEqual(stats['expired'], 1)
+        self.assertEqual(stats['rejected'], 1)
+
+    def test_errors_reach_callers(self):
+        def broken(texts):
+            raise RuntimeError('boom')
+
+        queue = InferenceQueue(broken, max_batch=2, window_ms=0)
+        with self.assertRaises(RuntimeError):
+            queue.submit('x', timeout=1)
+        self.assertEqual(queue.stats()['failed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from listing_embeddings import EmbeddingIndex, HashingEncoder
+
+LISTINGS = [
+    ('job', 'j1', {'title': 'Woodworking shop assistant', 'category': 'Furniture', 'location': 'Virac'}),
+    ('job', 'j2', {'title': 'Cashier', 'category': 'Retail', 'location': 'San Andres'}),
+    ('business', 'b1', {'title': 'Bato Seafood Grill', 'category': 'Restaurant', 'location': 'Bato'}),
+    ('service', 's1', {'title': 'Tricycle delivery', 'category': 'Transport', 'location': 'Virac'}),
+]
+
+
+class CountingEncoder(HashingEncoder):
+    def __init__(self):
+        super().__init__()
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        return super().encode(texts)
+
+
+class TestEmbeddingIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = EmbeddingIndex(CountingEncoder())
+        self.index.upsert_many(LISTINGS)
+
+    def test_paraphrase_retrieval(self):
+        top, score = self.index.search('any carpenter jobs?', k=1)[0]
+        self.assertEqual(top['id'], 'j1')
+        self.assertEqual(self.index.search('fresh fish', k=1, kinds=('business',))[0][0]['id'], 'b1')
+        self.assertEqual(self.index.search('courier', k=1)[0][0]['id'], 's1')
+
+    def test_incremental_updates(self):
+        encoded = self.index.encoder.encoded
+        self.assertEqual(self.index.upsert_many(LISTINGS), 0)
+        self.assertEqual(self.index.encoder.encoded, encoded)
+
+        self.index.upsert('job', 'j2', {'title': 'Carpenter helper', 'location': 'Virac'})
+        self.assertEqual(self.index.encoder.encoded, encoded + 1)
+        self.assertTrue(self.index.remove('job', 'j1'))
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.search('carpentry work', k=1)[0][0]['id'], 'j2')
+        self.assertEqual(self.index.search('delivery', k=1)[0][0]['id'], 's1')
+
+    def test_save_and_load(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'listings.npz')
+            self.index.save(path)
+            loaded = EmbeddingIndex(HashingEncoder())
+            self.assertEqual(loaded.load(path), 4)
+            self.assertEqual(loaded._vectors.dtype.name, 'float16')
+            self.assertEqual(loaded.search('carpenter', k=1)[0][0]['id'], 'j1')
+            with self.assertRaises(ValueError):
+                EmbeddingIndex(HashingEncoder(dim=256)).load(path)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
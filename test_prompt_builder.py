@@ -0,0 +1,72 @@
+import unittest
+
+from prompt_builder import ApproxTokenizer, PromptBuilder
+
+
+class WordTokenizer:
+    """Stand-in for a Hugging Face tokenizer: one id per word."""
+    eos_token_id = 1
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=False):
+        self.calls += 1
+        return [self.vocab.setdefault(word, len(self.vocab) + 2) for word in text.split()]
+
+    def decode(self, ids, skip_special_tokens=True):
+        words = {i: w for w, i in self.vocab.items()}
+        return ' '.join(words[i] for i in ids if i in words)
+
+
+SYSTEM = ' '.join(f'rule{i}' for i in range(20))
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_fits_without_trimming(self):
+        builder = PromptBuilder.approximate(100)
+        prompt = builder.build('Where can I work?', system='Be helpful.', context='Jobs: cashier',
+                               history=[{'role': 'user', 'content': 'hi'}],
+                               system_format='{}', context_format='{}', turn_format='{content}',
+                               question_format='{}')
+        self.assertEqual(prompt.trimmed, [])
+        self.assertEqual(prompt.question, 'Where can I work?')
+        self.assertEqual(prompt.counts['total'], sum(v for k, v in prompt.counts.items() if k != 'total'))
+        self.assertEqual(len(ApproxTokenizer().encode('Where can I work?')), 5)
+
+    def test_trimming_priority(self):
+        builder = PromptBuilder.approximate(30)
+        history = [{'role': 'user', 'content': 'old ' * 10}, {'role': 'assistant', 'content': 'newer reply'}]
+        prompt = builder.build('what jobs are open', system='short system', context='ctx ' * 30,
+                               history=history, system_format='{}', context_format='{}',
+                               turn_format='{content}', question_format='{}')
+        self.assertEqual(prompt.trimmed, ['history', 'context'])
+        # All history goes before any context is cut
+        self.assertEqual(prompt.history, [])
+        self.assertEqual(prompt.counts['context'], 24)
+        self.assertEqual(prompt.question, 'what jobs are open')
+        self.assertEqual(prompt.system, 'short system')
+        self.assertLessEqual(prompt.counts['total'], 30)
+
+    def test_input_ids_and_cached_system_prompt(self):
+        tokenizer = WordTokenizer()
+        builder = PromptBuilder.for_tokenizer(tokenizer, budget=16)
+        question = 'where are the carpenter jobs'
+        first = builder.build(question, system=SYSTEM, system_format='{}', question_format='{}')
+        # The question is kept whole, the system prompt is cut to make room
+        self.assertEqual(first.trimmed, ['system'])
+        self.assertEqual(len(first.input_ids), 16)
+        self.assertEqual(first.input_ids[-1], tokenizer.eos_token_id)
+        self.assertEqual(tokenizer.decode(first.input_ids[-6:-1]), question)
+
+        calls = tokenizer.calls
+        second = builder.build(question, system=SYSTEM, system_format='{}', question_format='{}')
+        # Only the question was encoded again, and trimming did not corrupt the cache
+        self.assertEqual(tokenizer.calls, calls + 1)
+        self.assertEqual(second.input_ids, first.input_ids)
+        self.assertEqual(len(builder.cached_encode(SYSTEM)), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
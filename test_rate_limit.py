@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from flask import Flask, Response, jsonify
+from flask_login import LoginManager
+
+import rate_limit
+from rate_limit import FairLimiter, TokenBuckets, chat_rate_limited
+
+
+class TestTokenBuckets(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.now = [1000.0]
+        self.buckets = TokenBuckets(os.path.join(self.tmpdir, 'limits.db'), clock=lambda: self.now[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_burst_refill_and_retry_after(self):
+        for _ in range(3):
+            self.assertTrue(self.buckets.take('ip:1', per_minute=6, burst=3)[0])
+        allowed, retry_after = self.buckets.take('ip:1', per_minute=6, burst=3)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 10.0)
+        # Other clients have their own bucket
+        self.assertTrue(self.buckets.take('ip:2', per_minute=6, burst=3)[0])
+
+        self.now[0] += 10
+        self.assertTrue(self.buckets.take('ip:1', per_minute=6, burst=3)[0])
+        self.assertFalse(self.buckets.take('ip:1', per_minute=6, burst=3)[0])
+
+    def test_state_is_shared_through_the_file(self):
+        other = TokenBuckets(self.buckets.path, clock=lambda: self.now[0])
+        self.assertTrue(self.buckets.take('user:1', per_minute=1, burst=1)[0])
+        self.assertFalse(other.take('user:1', per_minute=1, burst=1)[0])
+
+
+class TestFairLimiter(unittest.TestCase):
+    def test_waiters_are_served_in_order(self):
+        limiter = FairLimiter(limit=1, max_waiting=2)
+        self.assertTrue(limiter.acquire())
+        served = []
+
+        def wait(name):
+            if limiter.acquire(timeout=2):
+                served.append(name)
+                limiter.release()
+
+        threads = [threading.Thread(target=wait, args=(name,)) for name in ('first', 'second')]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        # Queue is full: the third request is turned away immediately
+        self.assertFalse(limiter.acquire(timeout=2))
+        limiter.release()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(served, ['first', 'second'])
+        self.assertEqual(limiter.stats(), {'active': 0, 'waiting': 0, 'rejected': 1})
+
+    def test_wait_times_out(self):
+        limiter = FairLimiter(limit=1, max_waiting=5)
+        limiter.acquire()
+        self.assertFalse(limiter.acquire(timeout=0.05))
+        self.assertEqual(limiter.stats()['waiting'], 0)
+
+
+class TestChatRateLimited(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rate_limit._buckets = TokenBuckets(os.path.join(self.tmpdir, 'limits.db'))
+        rate_limit.chat_limiter = FairLimiter(limit=1, max_waiting=0)
+        app = Flask(__name__)
+        LoginManager(app).user_loader(lambda user_id: None)
+
+        @app.route('/chat', methods=['POST'])
+        @chat_rate_limited
+        def chat():
+            return jsonify({'status': 'success'})
+
+        @app.route('/stream', methods=['POST'])
+        @chat_rate_limited
+        def stream():
+            return Response(iter(['a', 'b']), mimetype='text/event-stream')
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        rate_limit._buckets = None
+        rate_limit.chat_limiter = FairLimiter()
+        shutil.rmtree(self.tmpdir)
+
+    def test_over_limit_gets_429_with_retry_after(self):
+        statuses = [self.client.post('/chat').status_code for _ in range(int(rate_limit.CHAT_IP_BURST))]
+        self.assertEqual(set(statuses), {200})
+        response = self.client.post('/chat')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(response.get_json()['error'], rate_limit.ERROR_RATE_LIMITED)
+
+    def test_stream_holds_its_slot_until_closed(self):
+        response = self.client.post('/stream', buffered=False)
+        self.assertEqual(rate_limit.chat_limiter.stats()['active'], 1)
+        self.assertEqual(self.client.post('/chat').status_code, 429)
+        response.close()
+        self.assertEqual(rate_limit.chat_limiter.stats()['active'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
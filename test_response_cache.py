@@ -0,0 +1,74 @@
+import unittest
+
+from response_cache import ResponseCache, context_version, is_cacheable, normalize_question
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.cache = ResponseCache(maxsize=2, ttl=60, clock=lambda: self.now[0])
+
+    def test_normalized_key(self):
+        self.assertEqual(normalize_question('How do I apply for a job?'),
+                         normalize_question('apply job, how?'))
+        self.cache.set('How do I apply for a job?', 'Open the Jobs page.', version='v1')
+        self.assertEqual(self.cache.get('how to APPLY for jobs', version='v1'), 'Open the Jobs page.')
+        # A different retrieved context is a different entry
+        self.assertIsNone(self.cache.get('how to apply for jobs', version='v2'))
+
+    def test_personalized_and_follow_up_bypass(self):
+        self.assertFalse(is_cacheable('What is the status of my application?'))
+        self.assertFalse(is_cacheable('Email me at juan@example.com'))
+        self.assertFalse(is_cacheable('what about there?'))
+        self.assertTrue(is_cacheable('where is the map'))
+        self.cache.set('show my applications', 'You have 2 applications.')
+        self.assertIsNone(self.cache.get('show my applications'))
+        self.assertEqual(self.cache.stats()['bypassed'], 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_ttl_and_lru(self):
+        self.cache.set('where is the map', 'Open the Map page.')
+        self.cache.set('how to register', 'Click Register.')
+        self.cache.get('where is the map')
+        self.cache.set('forgot password', 'Use Forgot Password.')
+        # The least recently used entry was evicted
+        self.assertIsNone(self.cache.get('how to register'))
+        self.assertEqual(self.cache.get('map where'), 'Open the Map page.')
+        self.now[0] += 61
+        self.assertIsNone(self.cache.get('where is the map'))
+
+    def test_similarity_lookup(self):
+        cache = ResponseCache(similarity=0.6)
+        version = context_version('Relevant Jobs: Carpenter')
+        cache.set('carpenter jobs in Virac', 'Try Virac Woodcraft.', version=version)
+        self.assertEqual(cache.get('carpentry jobs Virac', version=version), 'Try Virac Woodcraft.')
+        self.assertEqual(cache.stats()['similar_hits'], 1)
+        self.assertIsNone(cache.get('bakery in Bato', version=version))
+
+
+class TestAnswerCaching(unittest.TestCase):
+    def test_fallback_answers_are_not_cached(self):
+        import chatbot
+        from chatbot_pipeline import Pipeline, Tier
+
+        model = {'available': False}
+        pipeline = Pipeline([
+            Tier('rules', lambda text: ('See the Job Portal.', 0.33), 0.6),
+            Tier('model', lambda text: ('Try Virac Woodcraft.', 1.0) if model['available'] else None, 0.0),
+        ])
+        saved = chatbot.pipeline, chatbot.response_cache, chatbot._listings_version
+        chatbot.pipeline, chatbot.response_cache = pipeline, ResponseCache()
+        chatbot._listings_version = lambda: 'v1'
+        try:
+            # Model tier unavailable (warming up, queue full): the fallback is served...
+            self.assertEqual(chatbot.answer_prompt('carpenter jobs'), ('See the Job Portal.', 'rules'))
+            # ...but not cached, so the recovered model answers the next time
+            model['available'] = True
+            self.assertEqual(chatbot.answer_prompt('carpenter jobs'), ('Try Virac Woodcraft.', 'model'))
+            self.assertEqual(chatbot.answer_prompt('carpenter jobs'), ('Try Virac Woodcraft.', 'cache'))
+        finally:
+            chatbot.pipeline, chatbot.response_cache, chatbot._listings_version = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
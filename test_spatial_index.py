@@ -0,0 +1,153 @@
+import math
+import random
+import unittest
+
+from geo.clustering import CLUSTER_MAX_ZOOM, cluster_points
+from geo.mercator import snap_bbox, tile_bounds, tile_for
+from geo.spatial_index import SpatialIndex, haversine_km
+
+
+def brute_distance(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(a))
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        """Fill an index with random listings around Catanduanes."""
+        rng = random.Random(7)
+        self.index = SpatialIndex()
+        self.points = {}
+        for i in range(2000):
+            lat, lng = rng.uniform(13.5, 14.1), rng.uniform(124.0, 124.45)
+            kind = ('job', 'business', 'service')[i % 3]
+            self.index.upsert(kind, str(i), lat, lng, title=f'Listing {i}', category='c%d' % (i % 4))
+            self.points[(kind, str(i))] = (lat, lng)
+
+    def test_haversine_matches_scalar(self):
+        import numpy as np
+        dist = haversine_km(13.58, 124.23, np.radians([13.7]), np.radians([124.3]))
+        self.assertAlmostEqual(dist[0], brute_distance(13.58, 124.23, 13.7, 124.3), places=6)
+
+    def test_within_radius_matches_brute_force(self):
+        found = self.index.within_radius(13.8, 124.2, 4.0)
+        expected = {key for key, (lat, lng) in self.points.items()
+                    if brute_distance(13.8, 124.2, lat, lng) <= 4.0}
+        self.assertEqual({(r['type'], r['id']) for r, _ in found}, expected)
+        distances = [d for _, d in found]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_nearest(self):
+        found = self.index.nearest(13.65, 124.35, k=5, kinds=('job',))
+        expected = sorted((brute_distance(13.65, 124.35, lat, lng), key[1])
+                          for key, (lat, lng) in self.points.items() if key[0] == 'job')[:5]
+        self.assertEqual([r['id'] for r, _ in found], [key for _, key in expected])
+
+    def test_within_bbox_and_predicate(self):
+        found = self.index.within_bbox(13.6, 124.1, 13.7, 124.2,
+                                       predicate=lambda r: r['category'] == 'c1')
+        expected = {key for key, (lat, lng) in self.points.items()
+                    if 13.6 <= lat <= 13.7 and 124.1 <= lng <= 124.2 and int(key[1]) % 4 == 1}
+        self.assertEqual({(r['type'], r['id']) for r in found}, expected)
+
+    def test_write_hooks_update_queries(self):
+        self.index.upsert('job', 'new', 13.9, 124.0, title='New job')
+        self.assertEqual(self.index.nearest(13.9, 124.0, k=1)[0][0]['id'], 'new')
+        self.index.upsert('job', 'new', 13.9, 124.0, title='New job', status='closed')
+        self.assertIsNone(self.index.get('job', 'new'))
+        self.index.remove('business', '1')
+        self.assertIsNone(self.index.get('business', '1'))
+
+
+class TestClustering(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        self.index = SpatialIndex()
+        for i in range(500):
+            self.index.upsert('job', str(i), rng.uniform(13.5, 14.1), rng.uniform(124.0, 124.45))
+
+    def test_clusters_cover_every_point(self):
+        records, lats, lngs = self.index.bbox_arrays(13.5, 124.0, 14.1, 124.45)
+        items = cluster_points(records, lats, lngs, zoom=10)
+        self.assertLess(len(items), len(records))
+        self.assertEqual(sum(item.get('count', 1) for item in items), len(records))
+        for item in items:
+            if item.get('cluster'):
+                west, south, east, north = item['bbox']
+                self.assertTrue(south <= item['latitude'] <= north)
+                self.assertTrue(west <= item['longitude'] <= east)
+
+    def test_no_clustering_at_max_zoom(self):
+        records, lats, lngs = self.index.bbox_arrays(13.5, 124.0, 14.1, 124.45)
+        items = cluster_points(records, lats, lngs, zoom=CLUSTER_MAX_ZOOM)
+        self.assertEqual(len(items), len(records))
+
+    def test_snap_bbox_is_stable_and_covers_viewport(self):
+        tiles, (south, west, north, east) = snap_bbox(13.62, 124.12, 13.68, 124.18, 12)
+        self.assertEqual(snap_bbox(13.63, 124.13, 13.67, 124.17, 12)[0], tiles)
+        self.assertTrue(south <= 13.62 and north >= 13.68 and west <= 124.12 and east >= 124.18)
+        x, y = tile_for(13.65, 124.15, 12)
+        min_lat, min_lng, max_lat, max_lng = tile_bounds(x, y, 12)
+        self.assertTrue(min_lat <= 13.65 <= max_lat and min_lng <= 124.15 <= max_lng)
+
+
+class TestTiles(unittest.TestCase):
+    def setUp(self):
+        import geo.spatial_index
+        self.index = geo.spatial_index._index
+        self.index.mark_fresh()
+        self.index.upsert('business', 'tile-a', 13.58, 124.23, title='A')
+
+    def tearDown(self):
+        self.index.remove('business', 'tile-a')
+        self.index.remove('business', 'tile-b')
+
+    def test_tile_is_invalidated_when_listing_changes(self):
+        from geo.listings import listing_saved
+        from geo.tiles import get_tile
+        x, y = tile_for(13.58, 124.23, 17)
+        body, etag = get_tile('businesses', 17, x, y)
+        self.assertIn('tile-a', body)
+        self.assertEqual(get_tile('businesses', 17, x, y)[1], etag)
+        listing_saved('business', {'id': 'tile-b', 'latitude': 13.58, 'longitude': 124.23, 'name': 'B'})
+        body, new_etag = get_tile('businesses', 17, x, y)
+        self.assertNotEqual(new_etag, etag)
+        self.assertIn('tile-b', body)
+
+
+class TestNearbyJobsFeed(unittest.TestCase):
+    def setUp(self):
+        import geo.spatial_index
+        self.index = geo.spatial_index._index
+        self.index.mark_fresh()
+        rng = random.Random(3)
+        self.ids = ['feed-%d' % i for i in range(45)]
+        for listing_id in self.ids:
+            self.index.upsert('job', listing_id, rng.uniform(13.5, 14.1), rng.uniform(124.0, 124.45))
+        self.index.upsert('job', 'feed-closed', 13.58, 124.23, status='in_progress')
+
+    def tearDown(self):
+        for listing_id in self.ids:
+            self.index.remove('job', listing_id)
+
+    def test_cursor_pages_cover_all_jobs_in_distance_order(self):
+        from geo.nearby_jobs import jobs_near
+        seen, cursor = [], None
+        while True:
+            jobs, cursor = jobs_near(13.58, 124.23, cursor=cursor, page_size=10)
+            seen.extend(jobs)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(job['id'] for job in seen), sorted(self.ids))
+        distances = [job['distance_km'] for job in seen]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_bad_cursor(self):
+        from geo.nearby_jobs import jobs_near
+        with self.assertRaises(ValueError):
+            jobs_near(13.58, 124.23, cursor='not-a-cursor')
+
+
+if __name__ == '__main__':
+    unittest.main()
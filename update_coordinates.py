@@ -1,33 +1,36 @@
-from neo4j import GraphDatabase
 from database import driver, DATABASE, get_neo4j_driver
+from geo.points import position_cypher
+from scripts.geocode_locations import geocode_locations
 
 # Ensure we have a driver
 if driver is None:
     driver = get_neo4j_driver()
 
 def update_coordinates():
-    with driver.session() as session:
-        # Update businesses with default coordinates
-        session.run("""
-            MATCH (b:Business)
-            WHERE b.latitude IS NULL OR b.longitude IS NULL
-            SET b.latitude = 13.5, b.longitude = 124.3
-        """)
-        
-        # Update jobs with their business coordinates
-        session.run("""
+    # Resolve free-text locations to a municipality (and its centroid when the
+    # node has no coordinates) instead of assigning one hardcoded point
+    geocode_locations()
+
+    with driver.session(database=DATABASE) as session:
+        # Jobs whose location could not be geocoded take their business coordinates
+        session.run(f"""
             MATCH (j:Job)<-[:POSTED]-(b:Business)
-            WHERE j.latitude IS NULL OR j.longitude IS NULL
-            SET j.latitude = b.latitude, j.longitude = b.longitude
-        """)
-        
-        # Update any remaining jobs with default coordinates
-        session.run("""
-            MATCH (j:Job)
-            WHERE j.latitude IS NULL OR j.longitude IS NULL
-            SET j.latitude = 13.5, j.longitude = 124.3
+            WHERE (j.latitude IS NULL OR j.longitude IS NULL)
+              AND b.latitude IS NOT NULL AND b.longitude IS NOT NULL
+            SET j.latitude = b.latitude,
+                j.longitude = b.longitude,
+                j.position = {position_cypher('b.latitude', 'b.longitude')},
+                j.municipality_id = coalesce(j.municipality_id, b.municipality_id)
         """)
 
+        # Keep the point property in sync with the coordinates
+        for label in ('Business', 'Job'):
+            session.run(f"""
+                MATCH (n:{label})
+                WHERE n.position IS NULL AND n.latitude IS NOT NULL AND n.longitude IS NOT NULL
+                SET n.position = {position_cypher('n.latitude', 'n.longitude')}
+            """)
+
 if __name__ == "__main__":
     try:
         update_coordinates()
@@ -35,4 +38,4 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error updating coordinates: {str(e)}")
     finally:
-        driver.close() 
\ No newline at end of file
+        driver.close()